@@ -0,0 +1,70 @@
+import json
+import logging
+import zlib
+
+from models import Case
+from sqlite_worker import SqliteWorker
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_PATH = "archive.db"
+
+# Seconds a case stays closed in the hot store before it moves to the archive.
+ARCHIVE_AFTER = 7 * 24 * 3600
+
+# Seconds between sweeps for closed cases that are due for the archive.
+ARCHIVE_INTERVAL = 3600
+
+
+class CaseArchive(SqliteWorker):
+    """Cold storage for cases that have been closed for a while.
+
+    Each case is kept whole, logs included, as one zlib-compressed JSON blob in its own SQLite
+    database, so archived cases take no memory and little disk until one is read back.
+
+    Callers move a case by awaiting `put` before removing it from the hot store; if the bot
+    stops in between, the case is in both places and the next sweep archives it again.
+    """
+
+    thread_name = "case-archive"
+
+    def connect(self, db_path: str = ARCHIVE_PATH) -> None:
+        super().connect(db_path)
+
+    def _setup(self) -> None:
+        assert self.conn is not None
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS archived_cases (case_id INTEGER PRIMARY KEY, guild_id INTEGER, case_type TEXT, closed_at REAL, data BLOB NOT NULL)")
+
+    async def put(self, case: Case) -> None:
+        """Stores a full copy of the case; returns once it is on disk."""
+        data = zlib.compress(json.dumps(case.to_dict(), separators=(",", ":")).encode())
+        await self._call(self._put, case.case_id, case.guild_id, str(case.case_type), case.closed_at, data)
+
+    def _put(self, case_id: int, guild_id: int | None, case_type: str, closed_at: float | None, data: bytes) -> None:
+        assert self.conn is not None
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO archived_cases (case_id, guild_id, case_type, closed_at, data) VALUES (?, ?, ?, ?, ?)", (case_id, guild_id, case_type, closed_at, data))
+
+    async def get(self, case_id: int) -> Case | None:
+        """The archived case, or None if it was never archived."""
+        data = await self._call(self._get, case_id)
+        if data is None:
+            return None
+        return Case.from_dict(case_id, json.loads(zlib.decompress(data)))
+
+    def _get(self, case_id: int) -> bytes | None:
+        assert self.conn is not None
+        row = self.conn.execute("SELECT data FROM archived_cases WHERE case_id = ?", (case_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    async def case_types(self, case_ids: list[int]) -> dict[int, str]:
+        """The case type of each of the given cases that is archived, without decompressing them."""
+        return await self._call(self._case_types, case_ids)
+
+    def _case_types(self, case_ids: list[int]) -> dict[int, str]:
+        assert self.conn is not None
+        if not case_ids:
+            return {}
+        placeholders = ", ".join("?" * len(case_ids))
+        return dict(self.conn.execute(f"SELECT case_id, case_type FROM archived_cases WHERE case_id IN ({placeholders})", case_ids).fetchall())
@@ -0,0 +1,125 @@
+"""Generates synthetic cases.json/courts.json datasets for the storage benchmarks.
+
+The data follows the shape of a real deployment rather than being uniform: guild activity is
+Zipf-like (a few busy servers, many quiet ones), log lengths have a long tail, most cases are
+closed, and some cases carry evidence, summaries and counter-cases.
+
+    python benchmarks/dataset.py --cases 100000 --out data/
+"""
+import argparse
+import json
+import os
+import random
+
+import discord
+
+CASE_TYPES = ("Civil", "Criminal", "Community", "Counter-case", "Other")
+CASE_TYPE_WEIGHTS = (30, 35, 20, 5, 10)
+
+WORDS = (
+    "order court accused cookie stole objection evidence witness honour guilty innocent screenshot "
+    "kitchen server moderator timeout ban meme emoji reaction ping spam channel voice late night "
+    "promise apology contempt verdict appeal jury sentence respectful message praise"
+).split()
+
+# Long tail of log lengths: most cases are a handful of messages, a few run for thousands.
+LOG_LENGTH_ALPHA = 1.3
+LOG_LENGTH_SCALE = 4
+LOG_LENGTH_MAX = 20000
+
+CLOSED_FRACTION = 0.7
+EVIDENCE_FRACTION = 0.15
+SUMMARY_EVERY = 6
+
+
+def sentence(rng: random.Random, low: int = 4, high: int = 30) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize() + "."
+
+
+def generate(case_count: int, *, guild_count: int | None = None, seed: int = 0) -> tuple[dict[int, dict], dict[int, int]]:
+    """Returns `(cases, courts)` in the shape of cases.json and courts.json."""
+    rng = random.Random(seed)
+    ids = iter(range(discord.utils.time_snowflake(discord.utils.utcnow()) - case_count * 100_000, 2**63, 7))
+
+    guild_count = guild_count or max(1, case_count // 40)
+    guilds = [next(ids) for _ in range(guild_count)]
+    courts = {guild_id: next(ids) for guild_id in guilds}
+    guild_weights = [1 / (rank + 1) for rank in range(guild_count)]
+    members = {guild_id: [next(ids) for _ in range(rng.randint(3, 60))] for guild_id in guilds}
+
+    cases: dict[int, dict] = {}
+    case_ids_by_guild: dict[int, list[int]] = {guild_id: [] for guild_id in guilds}
+    for _ in range(case_count):
+        guild_id = rng.choices(guilds, guild_weights)[0]
+        people = members[guild_id]
+        accuser = rng.choice(people)
+        accused = rng.sample(people, k=min(len(people), rng.choice((1, 1, 1, 2, 3))))
+        case_type = rng.choices(CASE_TYPES, CASE_TYPE_WEIGHTS)[0]
+        case_id = next(ids)
+
+        associated = []
+        if case_type == "Counter-case" and case_ids_by_guild[guild_id]:
+            associated = [rng.choice(case_ids_by_guild[guild_id])]
+
+        speakers = [str(user_id) for user_id in [accuser, *accused]]
+        logs = []
+        length = min(LOG_LENGTH_MAX, int(LOG_LENGTH_SCALE * (rng.paretovariate(LOG_LENGTH_ALPHA) - 1) * 2))
+        for index in range(length):
+            message_id = next(ids)
+            judge = index % 2 == 1
+            logs.append({
+                "message_id": message_id,
+                "message_reference_id": message_id - 7 if judge else None,
+                "speaker": "JudgeBot" if judge else f"user{rng.choice(speakers)[-4:]}",
+                "message": sentence(rng, 15, 80) if judge else sentence(rng),
+            })
+
+        closed = rng.random() < CLOSED_FRACTION
+        case = {
+            "associated_case_ids": associated,
+            "accuser": accuser,
+            "accused": accused,
+            "reason": sentence(rng, 5, 60),
+            "case_type": case_type,
+            "status": "closed" if closed else "open",
+            "logs": logs,
+            "og_message_id": next(ids),
+            "verdict": sentence(rng, 3, 12) if closed else None,
+            "guild_id": guild_id,
+        }
+        if length >= SUMMARY_EVERY:
+            case["summary"] = sentence(rng, 40, 200)
+        if rng.random() < EVIDENCE_FRACTION:
+            case["evidences"] = [
+                {"file_name": f"evidence_{next(ids)}.png", "summary": sentence(rng, 20, 80), "url": f"https://cdn.discordapp.com/attachments/{case_id}/{next(ids)}/evidence.png"}
+                for _ in range(rng.randint(1, 2))
+            ]
+
+        cases[case_id] = case
+        case_ids_by_guild[guild_id].append(case_id)
+    return cases, courts
+
+
+def write(cases: dict[int, dict], courts: dict[int, int], directory: str) -> None:
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "cases.json"), "w") as f:
+        json.dump(cases, f)
+    with open(os.path.join(directory, "courts.json"), "w") as f:
+        json.dump(courts, f, indent=4)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=10000, help="number of cases to generate")
+    parser.add_argument("--guilds", type=int, help="number of guilds (default: one per 40 cases)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=".", help="directory to write cases.json and courts.json to")
+    args = parser.parse_args()
+
+    cases, courts = generate(args.cases, guild_count=args.guilds, seed=args.seed)
+    write(cases, courts, args.out)
+    print(f"Wrote {len(cases)} cases ({sum(len(case['logs']) for case in cases.values())} log entries) across {len(courts)} guilds to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
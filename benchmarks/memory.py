@@ -0,0 +1,74 @@
+"""Memory benchmark: bytes held per case log entry, as plain dicts versus the `LogEntry` model.
+
+Log entries are decoded from JSON, the way they come out of cases.json or the journal, and the
+heap growth for each representation is measured with tracemalloc:
+
+    python benchmarks/memory.py --entries 100000
+
+The message texts are shared by both representations and left out of the comparison, since they
+take the same space either way.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from models import LogEntry  # noqa: E402
+
+
+def payload(count: int, speakers: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    names = [f"user{rng.randrange(10000):04d}" for _ in range(speakers)]
+    message_id = 1_300_000_000_000_000_000
+    entries = []
+    for index in range(count):
+        message_id += rng.randrange(1, 1 << 22)
+        judge = index % 2 == 1
+        entries.append({
+            "message_id": message_id,
+            "message_reference_id": message_id - 1 if judge else None,
+            "speaker": "JudgeBot" if judge else rng.choice(names),
+            "message": "",
+        })
+    return json.dumps(entries)
+
+
+def measure(data: str, build) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build(json.loads(data))
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000, help="number of log entries")
+    parser.add_argument("--speakers", type=int, default=50, help="distinct non-judge speaker names")
+    args = parser.parse_args()
+
+    data = payload(args.entries, args.speakers)
+    as_dicts = measure(data, lambda entries: entries)
+    as_models = measure(data, lambda entries: [LogEntry.from_dict(entry) for entry in entries])
+
+    result = {
+        "entries": args.entries,
+        "dict_mb": round(as_dicts / 2**20, 2),
+        "log_entry_mb": round(as_models / 2**20, 2),
+        "saved_mb": round((as_dicts - as_models) / 2**20, 2),
+        "dict_bytes_per_entry": round(as_dicts / args.entries),
+        "log_entry_bytes_per_entry": round(as_models / args.entries),
+    }
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""Offline end-to-end benchmark of JudgeBot's handlers.
+
+Imports main.py without connecting and drives the real handlers: the File a Case, Update Case
+and Close Case modals, the Summarize context menu and `on_message`. Discord is replaced at the
+REST layer (`dbot.http.request`), so discord.py still builds real Message/Thread objects, and
+Gemini is replaced by a fake client. Both fakes answer after a configurable latency.
+
+For every combination of pre-existing case log length and number of concurrently active case
+threads it reports throughput and p50/p95/p99 latency per operation:
+
+    python benchmarks/replay.py --threads 1,8,32 --log-lengths 0,500,5000 --turns 10
+    python benchmarks/replay.py --transcript cases.json --json results.json
+
+`--transcript` replays the user messages of an existing cases.json instead of synthetic lines.
+Message latency is measured from `on_message` until the judge reply has been handled.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import typing as t
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+import discord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SYNTHETIC_LINES = (
+    "Your honour, the accused took my cookie without asking.",
+    "Objection! I was merely holding it for safekeeping.",
+    "I have a screenshot of the whole thing.",
+    "That screenshot is clearly edited.",
+    "I plead not guilty and demand a jury of my peers.",
+    "The witness saw everything from the kitchen.",
+)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class FakeGemini:
+    """Stands in for `google.genai.Client`; every call answers after `latency` seconds."""
+
+    def __init__(self, latency: float, reply_words: int, chunks: int = 8):
+        self.latency = latency
+        self.reply = " ".join(itertools.islice(itertools.cycle("Order! The court has heard the argument and will weigh it carefully.".split()), reply_words))
+        self.chunks = chunks
+        self.calls = Counter()
+        self.aio = SimpleNamespace(models=self)
+
+    def _response(self, text: str, contents) -> SimpleNamespace:
+        usage = SimpleNamespace(prompt_token_count=len(str(contents)) // 4, candidates_token_count=len(text) // 4)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    async def generate_content(self, model: str, contents) -> SimpleNamespace:
+        self.calls["generate_content"] += 1
+        await asyncio.sleep(self.latency)
+        return self._response(self.reply, contents)
+
+    async def generate_content_stream(self, model: str, contents) -> t.AsyncIterator[SimpleNamespace]:
+        self.calls["generate_content_stream"] += 1
+        words = self.reply.split(" ")
+        size = max(1, len(words) // self.chunks)
+
+        async def stream():
+            for start in range(0, len(words), size):
+                await asyncio.sleep(self.latency / self.chunks)
+                yield self._response(" ".join(words[start:start + size]) + " ", contents)
+
+        return stream()
+
+
+class FakeDiscord:
+    """Answers discord.py's REST requests with plausible payloads after `latency` seconds."""
+
+    def __init__(self, state, latency: float):
+        self.state = state
+        self.latency = latency
+        self.calls = Counter()
+        self.threads: dict[int, dict] = {}
+        self._ids = itertools.count(discord.utils.time_snowflake(discord.utils.utcnow()))
+
+    def snowflake(self) -> int:
+        return next(self._ids)
+
+    def user_payload(self, user_id: int, bot: bool = False) -> dict:
+        return {"id": str(user_id), "username": f"user{user_id % 10000}", "discriminator": "0", "global_name": None, "avatar": None, "bot": bot}
+
+    def message_payload(self, channel_id: int, author: dict, content: str, message_id: int | None = None, reference: dict | None = None) -> dict:
+        payload = {
+            "id": str(message_id or self.snowflake()),
+            "channel_id": str(channel_id),
+            "author": author,
+            "content": content,
+            "timestamp": discord.utils.utcnow().isoformat(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+        }
+        if reference:
+            payload["type"] = 19
+            payload["message_reference"] = reference
+        return payload
+
+    def thread_payload(self, thread_id: int, guild_id: int, parent_id: int, name: str) -> dict:
+        return {
+            "id": str(thread_id),
+            "guild_id": str(guild_id),
+            "parent_id": str(parent_id),
+            "owner_id": str(self.state.user.id),
+            "name": name,
+            "type": 11,
+            "last_message_id": None,
+            "rate_limit_per_user": 0,
+            "message_count": 0,
+            "member_count": 0,
+            "thread_metadata": {"archived": False, "auto_archive_duration": 1440, "archive_timestamp": discord.utils.utcnow().isoformat(), "locked": False},
+        }
+
+    async def request(self, route, **kwargs):
+        self.calls[f"{route.method} {route.path}"] += 1
+        await asyncio.sleep(self.latency)
+        payload = kwargs.get("json") or {}
+        bot = self.user_payload(self.state.user.id, bot=True)
+
+        if route.path == "/channels/{channel_id}/messages" and route.method == "POST":
+            return self.message_payload(int(route.channel_id), bot, payload.get("content") or "", reference=payload.get("message_reference"))
+        if route.path == "/channels/{channel_id}/messages/{message_id}" and route.method == "PATCH":
+            message_id = int(route.url.rsplit("/", 1)[1])
+            return self.message_payload(int(route.channel_id), bot, payload.get("content") or "", message_id=message_id)
+        if route.path == "/channels/{channel_id}/threads":
+            parent = self.state.get_channel(int(route.channel_id))
+            thread_id = self.snowflake()
+            self.threads[thread_id] = self.thread_payload(thread_id, parent.guild.id, parent.id, payload["name"])
+            return self.threads[thread_id]
+        if route.path == "/channels/{channel_id}" and route.method == "PATCH":
+            data = self.threads[int(route.channel_id)]
+            for key in ("archived", "locked"):
+                if key in payload:
+                    data["thread_metadata"][key] = payload[key]
+            return data
+        if route.path == "/users/{user_id}":
+            return self.user_payload(int(route.url.rsplit("/", 1)[1]))
+        # typing indicators and anything else the handlers do not read
+        return None
+
+
+class FakeInteraction:
+    """Just enough of `discord.Interaction` for the modals and context menus."""
+
+    def __init__(self, bench: "Bench", user: discord.User, guild: discord.Guild, channel):
+        self.bench = bench
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = channel
+        self.response = SimpleNamespace(send_message=self._reply, defer=self._reply, send_modal=self._reply)
+        self.followup = SimpleNamespace(send=self._reply)
+
+    async def _reply(self, *args, **kwargs) -> None:
+        self.bench.discord.calls["interaction response"] += 1
+        await asyncio.sleep(self.bench.discord.latency)
+
+    async def edit_original_response(self, **kwargs) -> None:
+        await self._reply()
+
+
+class Bench:
+    def __init__(self, main, args: argparse.Namespace, lines: list[str]):
+        self.main = main
+        self.args = args
+        self.lines = itertools.cycle(lines)
+        state = main.dbot._connection
+        self.state = state
+        # normally set on login; typing indicators schedule their task on it
+        state.loop = asyncio.get_running_loop()
+        self.discord = FakeDiscord(state, args.discord_latency)
+        self.gemini = FakeGemini(args.gemini_latency, args.reply_words)
+
+        main.dbot.http.request = self.discord.request
+        main.count_discord_requests(main.dbot.http, main.discord_requests)
+        main.google_client = self.gemini
+        main.evidence_pipeline.google_client = self.gemini
+
+        state.user = discord.ClientUser(state=state, data=self.discord.user_payload(self.discord.snowflake(), bot=True))
+        guild_id = self.discord.snowflake()
+        self.guild = discord.Guild(data={"id": str(guild_id), "name": "Benchmark Court"}, state=state)
+        state._add_guild(self.guild)
+        self.court = discord.TextChannel(state=state, guild=self.guild, data={
+            "id": str(self.discord.snowflake()), "name": "court", "type": 0, "position": 0, "guild_id": str(guild_id),
+            "permission_overwrites": [], "nsfw": False, "parent_id": None,
+        })
+        self.guild._add_channel(self.court)
+        main.courts[guild_id] = self.court.id
+
+        handler = main.case_actors.handler
+        self.pending: dict[int, asyncio.Future] = {}
+
+        async def handled(case_id: int, messages: list[discord.Message]):
+            try:
+                await handler(case_id, messages)
+            finally:
+                for message in messages:
+                    if (future := self.pending.pop(message.id, None)) is not None and not future.done():
+                        future.set_result(None)
+
+        main.case_actors.handler = handled
+
+    def user(self) -> discord.User:
+        return self.state.store_user(self.discord.user_payload(self.discord.snowflake()))
+
+    def message(self, thread: discord.Thread, author: discord.User, content: str) -> discord.Message:
+        payload = self.discord.message_payload(thread.id, self.discord.user_payload(author.id), content)
+        return discord.Message(state=self.state, channel=thread, data=payload)
+
+    async def timed(self, samples: list[float], coro: t.Awaitable) -> None:
+        started = time.perf_counter()
+        await coro
+        samples.append(time.perf_counter() - started)
+
+    async def file_case(self, accuser: discord.User, accused: discord.User) -> discord.Thread:
+        modal = self.main.FileACaseModal()
+        modal.case_type.component._values = ["Civil"]
+        modal.reason._value = next(self.lines)
+        modal.accused.component._values = [accused]
+        modal.associated_cases.component._values = []
+        await modal.on_submit(FakeInteraction(self, accuser, self.guild, self.court))
+        # every case in a run has its own accuser
+        thread_id = next(case_id for case_id, case in self.main.cases.items() if case.accuser == accuser.id)
+        thread = discord.Thread(guild=self.guild, state=self.state, data=self.discord.threads[thread_id])
+        self.guild._add_thread(thread)
+        return thread
+
+    async def prefill(self, thread: discord.Thread, speakers: list[discord.User], length: int) -> None:
+        case = self.main.cases[thread.id]
+        logs = await case.load_logs()
+        for index in range(length):
+            speaker = speakers[index % len(speakers)].name if index % 3 != 2 else "JudgeBot"
+            logs.append(self.main.LogEntry(self.discord.snowflake(), None, speaker, next(self.lines)))
+
+    async def say(self, thread: discord.Thread, author: discord.User) -> None:
+        message = self.message(thread, author, next(self.lines))
+        done = self.pending[message.id] = asyncio.get_running_loop().create_future()
+        await self.main.on_message(message)
+        await done
+
+    async def conversation(self, thread: discord.Thread, speakers: list[discord.User], samples: dict[str, list[float]]) -> None:
+        # participants take turns and wait for the judge before speaking again, like a real hearing
+        for turn in range(self.args.turns):
+            await self.timed(samples["message"], self.say(thread, speakers[turn % len(speakers)]))
+
+        interaction = FakeInteraction(self, speakers[0], self.guild, thread)
+        update = self.main.UpdateCaseModal(case_id=thread.id)
+        update.case_type.component._values = ["Criminal"]
+        update.reason._value = next(self.lines)
+        update.accused.component._values = [speakers[1]]
+        await self.timed(samples["update_case"], update.on_submit(interaction))
+
+        anchor = self.message(thread, speakers[0], "summarize")
+        await self.timed(samples["summarize"], self.main.summarize_case.callback(interaction, anchor))
+
+        close = self.main.CloseCaseModal()
+        close.reason._value = "Settled out of court."
+        await self.timed(samples["close_case"], close.on_submit(interaction))
+
+    async def run(self, threads: int, log_length: int) -> list[dict]:
+        samples: dict[str, list[float]] = defaultdict(list)
+        self.discord.calls.clear()
+        self.gemini.calls.clear()
+
+        parties = [(self.user(), self.user()) for _ in range(threads)]
+        started = time.perf_counter()
+        opened = await asyncio.gather(*(self._file_timed(samples, accuser, accused) for accuser, accused in parties))
+        for thread, speakers in zip(opened, parties):
+            await self.prefill(thread, list(speakers), log_length)
+
+        conversation_started = time.perf_counter()
+        await asyncio.gather(*(self.conversation(thread, list(speakers), samples) for thread, speakers in zip(opened, parties)))
+        conversation_seconds = time.perf_counter() - conversation_started
+        total_seconds = time.perf_counter() - started
+        await self.main.save_cases()
+
+        messages = len(samples["message"])
+        results = []
+        for operation, values in samples.items():
+            results.append({
+                "threads": threads,
+                "log_length": log_length,
+                "operation": operation,
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+                "throughput_per_s": round(len(values) / (conversation_seconds if operation == "message" else total_seconds), 2),
+            })
+        results.append({
+            "threads": threads,
+            "log_length": log_length,
+            "operation": "totals",
+            "count": messages,
+            "discord_requests_per_message": round(sum(self.discord.calls.values()) / max(messages, 1), 2),
+            "gemini_calls": sum(self.gemini.calls.values()),
+            "seconds": round(total_seconds, 3),
+        })
+        return results
+
+    async def _file_timed(self, samples: dict[str, list[float]], accuser: discord.User, accused: discord.User) -> discord.Thread:
+        started = time.perf_counter()
+        thread = await self.file_case(accuser, accused)
+        samples["file_case"].append(time.perf_counter() - started)
+        return thread
+
+
+def load_transcript(path: str) -> list[str]:
+    with open(path, "r") as f:
+        data = json.load(f)
+    lines = [entry["message"] for case in data.values() for entry in case.get("logs", []) if entry.get("speaker") != "JudgeBot" and entry.get("message")]
+    if not lines:
+        raise SystemExit(f"{path} has no user messages to replay")
+    return lines
+
+
+def int_list(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def print_results(results: list[dict]) -> None:
+    header = f"{'threads':>7} {'log_len':>7} {'operation':<12} {'count':>6} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'ops/s':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        if row["operation"] == "totals":
+            print(f"{row['threads']:>7} {row['log_length']:>7} {'totals':<12} {row['count']:>6}  {row['discord_requests_per_message']} Discord requests/message, {row['gemini_calls']} Gemini calls, {row['seconds']}s")
+            continue
+        print(f"{row['threads']:>7} {row['log_length']:>7} {row['operation']:<12} {row['count']:>6} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['throughput_per_s']:>8}")
+
+
+async def run_all(args: argparse.Namespace, lines: list[str]) -> list[dict]:
+    import main
+
+    main.load_cases()
+    main.store.start()
+    bench = Bench(main, args, lines)
+    results = []
+    for log_length in args.log_lengths:
+        for threads in args.threads:
+            results.extend(await bench.run(threads, log_length))
+    await main.save_cases()
+    main.store.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int_list, default=[1, 8, 32], help="comma separated numbers of concurrently active case threads")
+    parser.add_argument("--log-lengths", type=int_list, default=[0, 500, 5000], help="comma separated numbers of log entries each case starts with")
+    parser.add_argument("--turns", type=int, default=10, help="messages posted in each case thread")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="seconds each fake Discord request takes")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="seconds each fake Gemini call takes")
+    parser.add_argument("--reply-words", type=int, default=120, help="length of each fake judge reply")
+    parser.add_argument("--batch-window", type=float, default=0.0, help="BATCH_WINDOW for the run; the bot's default of 1.5s would dominate message latency")
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json", help="STORAGE_BACKEND for the run")
+    parser.add_argument("--transcript", help="cases.json whose user messages are replayed instead of synthetic lines")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file as JSON")
+    args = parser.parse_args()
+
+    lines = load_transcript(os.path.abspath(args.transcript)) if args.transcript else list(SYNTHETIC_LINES)
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+
+    # main.py reads its settings at import time and keeps its files in the working directory
+    os.environ["BATCH_WINDOW"] = str(args.batch_window)
+    os.environ["STORAGE_BACKEND"] = args.storage
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    # the fake Gemini has no provider limits; set these to see the scheduler's effect on latency
+    for limit in ("LLM_REQUESTS_PER_MINUTE", "LLM_TOKENS_PER_MINUTE", "LLM_MAX_CONCURRENT"):
+        os.environ.setdefault(limit, "0")
+    os.environ.pop("METRICS_PORT", None)
+    sys.path.insert(0, ROOT)
+
+    with tempfile.TemporaryDirectory(prefix="judgebot-bench-") as workdir:
+        os.chdir(workdir)
+        results = asyncio.run(run_all(args, lines))
+
+    print_results(results)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"settings": {key: value for key, value in vars(args).items() if key != "json_path"}, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Sharding benchmark: message throughput as the shards are split over more worker processes.
+
+Every run seeds one SQLite case store with cases spread over many guilds, then starts N worker
+processes that each own a contiguous range of SHARD_COUNT fake shards, the way launcher.py
+splits them. A worker loads only its own guilds through `ShardOwnership`, and handles its share
+of a fixed stream of case messages: append the exchange, build the judge prompt and queue the
+store write. Gemini is replaced by an optional fixed delay (`--llm-ms`).
+
+    python benchmarks/shards.py --workers 1,2,4 --shards 4 --messages 20000
+
+Reported per worker count: messages per second over the slowest worker, the speedup over one
+worker, and each worker's load time and number of cases.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from db import CourtDatabaseSqlite  # noqa: E402
+from models import Case, CaseParticipant, CaseRole, CaseStatus, LogEntry  # noqa: E402
+from prompt_builder import PromptBuilder  # noqa: E402
+from sharding import ShardOwnership, split_shards  # noqa: E402
+
+DISCORD_EPOCH = 1420070400000
+STATIC_PROMPT = "You are JudgeBot, presiding over a roleplay courtroom. " * 60
+
+
+def snowflake(rng: random.Random) -> int:
+    return (int(time.time() * 1000) - DISCORD_EPOCH - rng.randrange(10**10)) << 22 | rng.randrange(1 << 22)
+
+
+def seed(db_path: str, guilds: int, cases_per_guild: int, logs: int) -> list[int]:
+    rng = random.Random(0)
+    cases: dict[int, Case] = {}
+    store = CourtDatabaseSqlite(cases, {})
+    store.connect(db_path)
+    for _ in range(guilds):
+        guild_id = snowflake(rng)
+        for _ in range(cases_per_guild):
+            case_id = snowflake(rng)
+            entries = [LogEntry(case_id + index + 1, None, f"user{index % 7}", "I object to this. " * 8) for index in range(logs)]
+            cases[case_id] = Case(
+                case_id, "Civil", CaseStatus.OPEN, "Stole the last cookie",
+                [CaseParticipant(rng.randrange(1 << 60), CaseRole.PROSECUTOR), CaseParticipant(rng.randrange(1 << 60), CaseRole.DEFENSE)],
+                logs=entries, guild_id=guild_id,
+            )
+            store.case_filed(case_id, cases[case_id])
+    store.close()
+    return list(cases)
+
+
+async def handle(store: CourtDatabaseSqlite, builder: PromptBuilder, workload: list[int], llm_seconds: float) -> None:
+    next_id = 1 << 62
+    for case_id in workload:
+        case = store.cases[case_id]
+        logs = await case.load_logs()
+        message = "Your honour, the cookie was already half eaten when I got there."
+        builder.build(case_id, case, f"user1: {message}")
+        if llm_seconds:
+            await asyncio.sleep(llm_seconds)
+        entries = [LogEntry(next_id, None, "user1", message), LogEntry(next_id + 1, next_id, "JudgeBot", "Overruled. " * 40)]
+        next_id += 2
+        logs.extend(entries)
+        store.logs_appended(case_id, entries)
+    await store.flush()
+
+
+def worker(args: argparse.Namespace) -> None:
+    """Runs one fake-shard worker; prints one JSON result line."""
+    ownership = ShardOwnership(args.shards, [int(shard_id) for shard_id in args.shard_ids.split(",")])
+    started = time.perf_counter()
+    store = CourtDatabaseSqlite({}, {}, owns_guild=ownership.owns_guild)
+    store.connect(args.db)
+    store.load()
+    load_seconds = time.perf_counter() - started
+
+    # every worker draws the same stream and keeps the messages for its own cases, as the gateway would route them
+    rng = random.Random(1)
+    with open(args.case_ids) as f:
+        all_cases = sorted(json.load(f))
+    workload = [case_id for case_id in (rng.choice(all_cases) for _ in range(args.messages)) if case_id in store.cases]
+
+    builder = PromptBuilder(STATIC_PROMPT)
+    started = time.perf_counter()
+    asyncio.run(handle(store, builder, workload, args.llm_ms / 1000))
+    seconds = time.perf_counter() - started
+    store.close()
+    print(json.dumps({"shards": args.shard_ids, "cases": len(store.cases), "messages": len(workload), "load_seconds": round(load_seconds, 3), "seconds": round(seconds, 3)}))
+
+
+def run(workers: int, args: argparse.Namespace, db_path: str, case_ids: str) -> dict:
+    processes = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--db", db_path, "--case-ids", case_ids, "--shards", str(args.shards),
+             "--shard-ids", ",".join(map(str, shard_ids)), "--messages", str(args.messages), "--llm-ms", str(args.llm_ms)],
+            stdout=subprocess.PIPE, text=True,
+        )
+        for shard_ids in split_shards(args.shards, workers)
+    ]
+    results = []
+    for process in processes:
+        stdout, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"worker exited with {process.returncode}")
+        results.append(json.loads(stdout.strip().splitlines()[-1]))
+    messages = sum(result["messages"] for result in results)
+    slowest = max(result["seconds"] for result in results)
+    return {"workers": workers, "messages": messages, "messages_per_second": round(messages / slowest, 1), "per_worker": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma separated worker process counts")
+    parser.add_argument("--shards", type=int, default=4, help="total fake shards, split between the workers")
+    parser.add_argument("--guilds", type=int, default=200)
+    parser.add_argument("--cases-per-guild", type=int, default=10)
+    parser.add_argument("--logs", type=int, default=50, help="log entries per seeded case")
+    parser.add_argument("--messages", type=int, default=20000, help="case messages across all workers")
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="simulated Gemini latency per message")
+    parser.add_argument("--json", dest="json_path", help="write the results to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--case-ids", help=argparse.SUPPRESS)
+    parser.add_argument("--shard-ids", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="judgebot-shards-") as workdir:
+        db_path = os.path.join(workdir, "court.db")
+        case_ids = os.path.join(workdir, "case_ids.json")
+        with open(case_ids, "w") as f:
+            json.dump(seed(db_path, args.guilds, args.cases_per_guild, args.logs), f)
+
+        for workers in (int(count) for count in args.workers.split(",") if count):
+            result = run(workers, args, db_path, case_ids)
+            if results:
+                result["speedup"] = round(result["messages_per_second"] / results[0]["messages_per_second"], 2)
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
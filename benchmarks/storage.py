@@ -0,0 +1,198 @@
+"""Storage scaling benchmark: how load, save, listing and per-message persistence grow with case count.
+
+For every dataset size and storage backend a fresh worker process imports main.py in a copy of
+a generated dataset (see dataset.py) and measures:
+
+- `load_seconds`: `load_cases()` (for SQLite, after the one-off cases.json import, reported as `import_seconds`)
+- `message_save_ms`: appending a judge exchange to an open case and flushing it, as the message path does
+- `full_save_seconds`: `save_cases()` forced to write a complete snapshot
+- `list_cases_ms`: the `/list_cases` handler
+- `log_cache`: hits, misses and evictions of the case log cache, and how many cases hold their logs
+- `peak_rss_mb`: the worker's peak resident set size
+
+    python benchmarks/storage.py --sizes 1000,10000,100000 --json storage.json
+
+Generated datasets are cached in `--data-dir`, so repeated runs only pay for generation once.
+Results are written as JSON together with the commit they were measured on.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, int(fraction * len(ordered) + 0.999999) - 1)]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class FakeInteraction:
+    def __init__(self, guild_id: int, user_id: int):
+        self.guild_id = guild_id
+        self.user = SimpleNamespace(id=user_id, mention=f"<@{user_id}>")
+        self.sent: list[dict] = []
+        self.response = SimpleNamespace(send_message=self._send, defer=self._send)
+        self.followup = SimpleNamespace(send=self._send)
+
+    async def _send(self, content: str | None = None, **kwargs) -> None:
+        self.sent.append({"content": content, **kwargs})
+
+
+async def measure(main, args: argparse.Namespace, result: dict) -> None:
+    rng = random.Random(0)
+    main.store.start()
+
+    guild_id = next(iter(main.courts), 0)
+    user_id = next((case.accuser for case in main.cases.values()), 0)
+    list_times = []
+    for _ in range(args.list_repeats):
+        started = time.perf_counter()
+        await main.list_cases.callback(FakeInteraction(guild_id, user_id))
+        list_times.append(time.perf_counter() - started)
+    result["list_cases_ms"] = round(percentile(list_times, 0.5) * 1000, 3)
+
+    open_cases = [case_id for case_id, case in main.cases.items() if not case.closed] or list(main.cases)
+    save_times = []
+    # dataset ids are snowflakes from before it was generated; reading them all back would load every case's logs
+    next_id = main.discord.utils.time_snowflake(main.discord.utils.utcnow())
+    for _ in range(args.saves):
+        case_id = rng.choice(open_cases)
+        entries = [
+            main.LogEntry(next_id, None, "user1234", "Objection, your honour!"),
+            main.LogEntry(next_id + 1, next_id, "JudgeBot", "Overruled. " * 40),
+        ]
+        next_id += 2
+        started = time.perf_counter()
+        (await main.cases[case_id].load_logs()).extend(entries)
+        main.store.logs_appended(case_id, entries)
+        await main.store.flush()
+        save_times.append(time.perf_counter() - started)
+    result["message_save_ms"] = {
+        "p50": round(percentile(save_times, 0.5) * 1000, 3),
+        "p95": round(percentile(save_times, 0.95) * 1000, 3),
+        "p99": round(percentile(save_times, 0.99) * 1000, 3),
+    }
+
+    started = time.perf_counter()
+    await main.store.flush(compact=True)
+    result["full_save_seconds"] = round(time.perf_counter() - started, 3)
+
+
+def worker(args: argparse.Namespace) -> None:
+    """Runs inside a copy of the dataset; prints one JSON result line."""
+    os.environ["STORAGE_BACKEND"] = args.backend
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    os.environ.pop("METRICS_PORT", None)
+    sys.path.insert(0, ROOT)
+    result: dict = {"backend": args.backend}
+
+    started = time.perf_counter()
+    import main
+    result["import_main_seconds"] = round(time.perf_counter() - started, 3)
+
+    if args.backend == "sqlite":
+        started = time.perf_counter()
+        main.load_cases()
+        result["import_seconds"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    main.load_cases()
+    result["load_seconds"] = round(time.perf_counter() - started, 3)
+    result["cases"] = len(main.cases)
+    result["resident_log_entries_after_load"] = main.store.log_cache.entries()
+    result["rss_after_load_mb"] = peak_rss_mb()
+
+    asyncio.run(measure(main, args, result))
+    result["log_cache"] = main.store.log_cache.stats()
+    main.store.close()
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def dataset_dir(data_dir: str, size: int) -> str:
+    directory = os.path.join(data_dir, str(size))
+    if not os.path.exists(os.path.join(directory, "cases.json")):
+        sys.path.insert(0, HERE)
+        import dataset
+
+        print(f"Generating {size} cases...", file=sys.stderr)
+        dataset.write(*dataset.generate(size), directory)
+    return directory
+
+
+def run(size: int, backend: str, args: argparse.Namespace) -> dict:
+    source = dataset_dir(args.data_dir, size)
+    with tempfile.TemporaryDirectory(prefix="judgebot-storage-") as workdir:
+        for name in ("cases.json", "courts.json"):
+            shutil.copy(os.path.join(source, name), workdir)
+        command = [sys.executable, os.path.abspath(__file__), "--worker", "--backend", backend, "--saves", str(args.saves), "--list-repeats", str(args.list_repeats)]
+        completed = subprocess.run(command, cwd=workdir, capture_output=True, text=True)
+    if completed.returncode != 0:
+        print(completed.stderr, file=sys.stderr)
+        return {"size": size, "backend": backend, "error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit {completed.returncode}"}
+    return {"size": size, **json.loads(completed.stdout.strip().splitlines()[-1])}
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated case counts")
+    parser.add_argument("--backends", default="json,sqlite", help="comma separated storage backends")
+    parser.add_argument("--saves", type=int, default=200, help="message saves measured per run")
+    parser.add_argument("--list-repeats", type=int, default=5, help="times /list_cases is measured per run")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "judgebot-datasets"), help="where generated datasets are cached")
+    parser.add_argument("--json", dest="json_path", help="write the results to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", default="json", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(",") if size):
+        for backend in (backend for backend in args.backends.split(",") if backend):
+            result = run(size, backend, args)
+            results.append(result)
+            print(json.dumps(result))
+
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "measured_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "results": results,
+    }
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
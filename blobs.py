@@ -0,0 +1,134 @@
+import logging
+import os
+import time
+import uuid
+
+from sqlite_worker import SqliteWorker
+
+log = logging.getLogger(__name__)
+
+BLOB_ROOT = "blobs"
+
+# Bytes of evidence kept on disk before files no case refers to are evicted, least recently used first. 0 turns the quota off.
+BLOB_QUOTA = 1024 ** 3
+
+# Partial downloads older than this are left over from a crash and removed on connect.
+STALE_TEMP_AFTER = 24 * 3600.0
+
+
+class BlobStore(SqliteWorker):
+    """Evidence files on local disk, stored once per distinct content.
+
+    A file lives at `root/ab/cd/<sha256>`, under directories named after the first bytes of its
+    hash so no directory grows too large. Downloads go to a temp file under `root/tmp` and are
+    renamed into place once their hash is known, so a blob is either complete or absent, and
+    content that is already stored is not written twice.
+
+    An index in `root/index.db` records each blob's size and last use, and which cases refer
+    to it. A case drops its references when it is archived; blobs without references are then
+    evicted, least recently used first, once the store is over `quota` bytes. Blobs that are
+    still referenced are never evicted, even over the quota.
+
+    Sharded workers share the root. Renames and evictions happen under the index's write lock,
+    so one worker never removes a file another has just referenced.
+    """
+
+    thread_name = "blob-store"
+
+    def __init__(self, root: str = BLOB_ROOT, *, quota: int = BLOB_QUOTA):
+        super().__init__()
+        self.root = root
+        self.quota = quota
+        self.bytes = 0
+        self.evictions = 0
+
+    def connect(self) -> None:
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+        super().connect(os.path.join(self.root, "index.db"))
+
+    def _setup(self) -> None:
+        assert self.conn is not None
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS blob_refs (digest TEXT NOT NULL, case_id INTEGER NOT NULL, PRIMARY KEY (digest, case_id))")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS blob_refs_case ON blob_refs (case_id)")
+        # other workers may be downloading into tmp right now, so only old files are removed
+        cutoff = time.time() - STALE_TEMP_AFTER
+        for entry in os.scandir(os.path.join(self.root, "tmp")):
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        self.bytes = self._total()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def temp_path(self) -> str:
+        """A fresh path to download into before the content's hash is known."""
+        return os.path.join(self.root, "tmp", f"{uuid.uuid4().hex}.part")
+
+    async def put(self, temp_path: str, digest: str, case_id: int) -> str:
+        """Moves a finished download into the store as a blob referenced by the case; returns the blob's path."""
+        return await self._call(self._put, temp_path, digest, case_id)
+
+    def _put(self, temp_path: str, digest: str, case_id: int) -> str:
+        assert self.conn is not None
+        path = self.path(digest)
+        size = os.path.getsize(temp_path)
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            if os.path.exists(path):
+                os.unlink(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+            self.conn.execute(
+                "INSERT INTO blobs (digest, size, last_used) VALUES (?, ?, ?) ON CONFLICT (digest) DO UPDATE SET last_used = excluded.last_used",
+                (digest, size, time.time()),
+            )
+            self.conn.execute("INSERT OR IGNORE INTO blob_refs (digest, case_id) VALUES (?, ?)", (digest, case_id))
+        self._evict()
+        return path
+
+    async def release_case(self, case_id: int) -> int:
+        """Drops the case's references to its blobs, making those no other case uses evictable; returns how many it held."""
+        return await self._call(self._release_case, case_id)
+
+    def _release_case(self, case_id: int) -> int:
+        assert self.conn is not None
+        with self.conn:
+            released = self.conn.execute("DELETE FROM blob_refs WHERE case_id = ?", (case_id,)).rowcount
+        self._evict()
+        return released
+
+    def _total(self) -> int:
+        assert self.conn is not None
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _evict(self) -> None:
+        assert self.conn is not None
+        self.bytes = self._total()
+        if not self.quota or self.bytes <= self.quota:
+            return
+        evicted = 0
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            # read again under the lock, another worker may have evicted already
+            self.bytes = self._total()
+            unreferenced = self.conn.execute(
+                "SELECT digest, size FROM blobs WHERE digest NOT IN (SELECT digest FROM blob_refs) ORDER BY last_used"
+            ).fetchall()
+            for digest, size in unreferenced:
+                if self.bytes <= self.quota:
+                    break
+                try:
+                    os.unlink(self.path(digest))
+                except FileNotFoundError:
+                    pass
+                self.conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                self.bytes -= size
+                evicted += 1
+        self.evictions += evicted
+        if self.bytes > self.quota:
+            log.warning("Evidence blobs over quota, the rest are referenced by cases", extra={"fields": {"bytes": self.bytes, "quota": self.quota}})
+        elif evicted:
+            log.info("Evicted evidence blobs", extra={"fields": {"blobs": evicted, "bytes": self.bytes}})
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import typing as t
+
+import discord
+
+log = logging.getLogger(__name__)
+
+# Seconds a thread's worker lingers with an empty queue before it is torn down.
+IDLE_TIMEOUT = 60.0
+
+BatchHandler = t.Callable[[int, list[discord.Message]], t.Awaitable[None]]
+
+
+class CaseActor:
+    """Serializes the handling of one case thread.
+
+    Messages are queued and handled strictly one batch at a time. After the first message of
+    a batch arrives the worker waits `batch_window` seconds, and everything that arrived by
+    then (including anything posted while the previous reply was being generated) is handed
+    to the handler together, so a burst gets a single judge reply.
+    """
+
+    def __init__(self, case_id: int, handler: BatchHandler, batch_window: float, on_idle: t.Callable[[int], None]):
+        self.case_id = case_id
+        self.handler = handler
+        self.batch_window = batch_window
+        self.on_idle = on_idle
+        self.queue: asyncio.Queue[discord.Message] = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    def submit(self, message: discord.Message) -> None:
+        self.queue.put_nowait(message)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=IDLE_TIMEOUT)
+            except TimeoutError:
+                if self.queue.empty():
+                    self.on_idle(self.case_id)
+                    return
+                continue
+
+            await asyncio.sleep(self.batch_window)
+            batch = [first]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            try:
+                await self.handler(self.case_id, batch)
+            except Exception:
+                log.exception("Failed to handle case messages", extra={"fields": {"case_id": self.case_id, "messages": len(batch)}})
+
+
+class CaseActors:
+    """One `CaseActor` per active case thread, created on demand."""
+
+    def __init__(self, handler: BatchHandler, batch_window: float):
+        self.handler = handler
+        self.batch_window = batch_window
+        self.actors: dict[int, CaseActor] = {}
+
+    def submit(self, case_id: int, message: discord.Message) -> None:
+        actor = self.actors.get(case_id)
+        if actor is None:
+            actor = self.actors[case_id] = CaseActor(case_id, self.handler, self.batch_window, self._forget)
+        actor.submit(message)
+
+    def _forget(self, case_id: int) -> None:
+        self.actors.pop(case_id, None)
+
+    def queued(self) -> int:
+        return sum(actor.queue.qsize() for actor in self.actors.values())
@@ -0,0 +1,81 @@
+import typing as t
+
+from models import Case
+
+
+class CaseIndex:
+    """Secondary indexes over the in-memory cases, by guild, status, case type and participant.
+
+    `refresh(case)` has to be called whenever a case is filed or one of the indexed fields
+    changes; it moves the case between buckets using the keys it was indexed under last time.
+    Queries intersect the buckets they filter on, so their cost follows the number of matching
+    cases rather than the total number of cases.
+    """
+
+    def __init__(self) -> None:
+        self.by_guild: dict[int | None, set[int]] = {}
+        self.by_status: dict[str, set[int]] = {}
+        self.by_type: dict[str, set[int]] = {}
+        self.by_participant: dict[int, set[int]] = {}
+        self._keys: dict[int, tuple[int | None, str, str, frozenset[int]]] = {}
+
+    def rebuild(self, cases: t.Iterable[Case]) -> None:
+        self.by_guild.clear()
+        self.by_status.clear()
+        self.by_type.clear()
+        self.by_participant.clear()
+        self._keys.clear()
+        for case in cases:
+            self.refresh(case)
+
+    def refresh(self, case: Case) -> None:
+        keys = (case.guild_id, str(case.status), str(case.case_type), frozenset(participant.user_id for participant in case.participants))
+        old = self._keys.get(case.case_id)
+        if old == keys:
+            return
+        if old is not None:
+            self._remove(case.case_id, old)
+        self._keys[case.case_id] = keys
+
+        guild_id, status, case_type, participants = keys
+        self.by_guild.setdefault(guild_id, set()).add(case.case_id)
+        self.by_status.setdefault(status, set()).add(case.case_id)
+        self.by_type.setdefault(case_type, set()).add(case.case_id)
+        for user_id in participants:
+            self.by_participant.setdefault(user_id, set()).add(case.case_id)
+
+    def remove(self, case_id: int) -> None:
+        keys = self._keys.pop(case_id, None)
+        if keys is not None:
+            self._remove(case_id, keys)
+
+    def _remove(self, case_id: int, keys: tuple[int | None, str, str, frozenset[int]]) -> None:
+        guild_id, status, case_type, participants = keys
+        _discard(self.by_guild, guild_id, case_id)
+        _discard(self.by_status, status, case_id)
+        _discard(self.by_type, case_type, case_id)
+        for user_id in participants:
+            _discard(self.by_participant, user_id, case_id)
+
+    def query(self, guild_id: int, *, status: str | None = None, case_type: str | None = None, participant: int | None = None) -> list[int]:
+        """Ids of the guild's cases that match every given filter, newest first."""
+        buckets = [self.by_guild.get(guild_id, set())]
+        if status is not None:
+            buckets.append(self.by_status.get(status, set()))
+        if case_type is not None:
+            buckets.append(self.by_type.get(case_type, set()))
+        if participant is not None:
+            buckets.append(self.by_participant.get(participant, set()))
+        smallest = min(buckets, key=len)
+        others = [bucket for bucket in buckets if bucket is not smallest]
+        # thread ids are snowflakes, so sorting by id sorts by filing time
+        return sorted((case_id for case_id in smallest if all(case_id in bucket for bucket in others)), reverse=True)
+
+
+def _discard(index: dict, key: t.Any, case_id: int) -> None:
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    bucket.discard(case_id)
+    if not bucket:
+        del index[key]
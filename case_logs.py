@@ -0,0 +1,103 @@
+import asyncio
+import typing as t
+from collections import OrderedDict
+
+from models import Case, LogEntry
+
+# Number of cases whose log history is kept in memory after it has been read.
+RESIDENT_CASES = 256
+
+
+class CaseLogCache:
+    """Keeps the log history of recently active cases in memory.
+
+    Case headers are always loaded, but a case's logs are only fetched from the store when
+    `ensure` is awaited for it; `fetch` reads them without blocking the event loop, and cases
+    asked for again while they load share the one read. Once more than `max_resident` cases
+    hold their logs, the least recently used ones drop them again. `can_evict` lets the store
+    keep logs that it could not fetch back yet, such as entries that have not reached its
+    snapshot.
+    """
+
+    def __init__(self, fetch: t.Callable[[int], t.Awaitable[list[LogEntry]]], can_evict: t.Callable[[int], bool], *, max_resident: int = RESIDENT_CASES):
+        self.fetch = fetch
+        self.can_evict = can_evict
+        self.max_resident = max_resident
+        self.on_evict: t.Callable[[int], None] | None = None  # called with the id of each case whose logs were dropped
+        self._resident: OrderedDict[int, Case] = OrderedDict()
+        self._loading: dict[int, asyncio.Future[list[LogEntry]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "resident": len(self._resident)}
+
+    def entries(self) -> int:
+        return sum(len(case.logs_if_loaded or ()) for case in self._resident.values())
+
+    def adopt(self, case: Case) -> None:
+        """Puts a case's logs under this cache; logs it already holds count as just used."""
+        case.log_cache = self
+        if case.logs_if_loaded is not None:
+            self._resident[case.case_id] = case
+            self._resident.move_to_end(case.case_id)
+            self._evict()
+
+    def touch(self, case: Case) -> None:
+        """Marks logs that are in memory as just used."""
+        self.hits += 1
+        self._resident[case.case_id] = case
+        self._resident.move_to_end(case.case_id)
+
+    async def ensure(self, case: Case) -> list[LogEntry]:
+        """The case's logs, read from the store first if they are not in memory."""
+        if case.logs_if_loaded is None:
+            self.misses += 1
+            logs = await self._read(case.case_id)
+            # another caller may have loaded them while this one waited
+            if case.logs_if_loaded is None:
+                case.logs = logs
+        else:
+            self.hits += 1
+        self._resident[case.case_id] = case
+        self._resident.move_to_end(case.case_id)
+        self._evict()
+        return case.logs_if_loaded
+
+    async def snapshot(self, case: Case) -> Case:
+        """A copy of the case with its logs, without making cold logs resident."""
+        if case.logs_if_loaded is not None:
+            return case.copy()
+        return Case(
+            case.case_id, case.case_type, case.status, case.reason, list(case.participants),
+            associated_case_ids=list(case.associated_case_ids), og_message_id=case.og_message_id,
+            verdict=case.verdict, summary=case.summary, logs=list(await self._read(case.case_id)), evidences=list(case.evidences),
+            guild_id=case.guild_id, closed_at=case.closed_at, summary_checkpoint=case.summary_checkpoint,
+        )
+
+    async def _read(self, case_id: int) -> list[LogEntry]:
+        loading = self._loading.get(case_id)
+        if loading is None:
+            loading = self._loading[case_id] = asyncio.ensure_future(self.fetch(case_id))
+            loading.add_done_callback(lambda _: self._loading.pop(case_id, None))
+        # one caller giving up must not cancel the read for the others
+        return await asyncio.shield(loading)
+
+    def forget(self, case_id: int) -> None:
+        self._resident.pop(case_id, None)
+
+    def clear(self) -> None:
+        self._resident.clear()
+
+    def _evict(self) -> None:
+        excess = len(self._resident) - self.max_resident
+        if excess <= 0:
+            return
+        # the newest entry is the case being read right now, never drop that one
+        victims = [case_id for case_id in list(self._resident)[:-1] if self.can_evict(case_id)][:excess]
+        for case_id in victims:
+            self._resident.pop(case_id).unload_logs()
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(case_id)
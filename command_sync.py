@@ -0,0 +1,45 @@
+import hashlib
+import json
+import logging
+
+import discord
+from discord import app_commands
+
+from data_access import atomic_write
+
+log = logging.getLogger(__name__)
+
+COMMAND_FINGERPRINT_FILE = "commands.sha256"
+
+
+def fingerprint(tree: app_commands.CommandTree, application_id: int | None) -> str:
+    """Hash of the global command payloads Discord would receive from a sync."""
+    payloads = sorted((command.to_dict(tree) for command in tree.get_commands()), key=lambda payload: (payload["type"], payload["name"]))
+    # the application is part of it, so a different bot token syncs again
+    data = json.dumps({"application_id": application_id, "commands": payloads}, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+async def sync_if_changed(tree: app_commands.CommandTree, application_id: int | None, path: str = COMMAND_FINGERPRINT_FILE) -> bool:
+    """Syncs the global command tree unless it matches the last one synced; returns whether it synced.
+
+    A global sync is a rate-limited REST call, so it is only made when a command was added,
+    removed or changed since the fingerprint stored at `path` was written.
+    """
+    current = fingerprint(tree, application_id)
+    try:
+        with open(path, "r") as f:
+            if f.read().strip() == current:
+                return False
+    except FileNotFoundError:
+        pass
+
+    try:
+        synced = await tree.sync()
+    except discord.HTTPException:
+        # keep the old fingerprint so the next start tries again
+        log.exception("Syncing commands failed")
+        return False
+    atomic_write(path, current)
+    log.info("Synced commands", extra={"fields": {"commands": len(synced)}})
+    return True
@@ -0,0 +1,400 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import typing as t
+
+from case_logs import RESIDENT_CASES, CaseLogCache
+from models import Case, LogEntry
+
+log = logging.getLogger(__name__)
+
+CASES_FILE = "cases.json"
+COURTS_FILE = "courts.json"
+JOURNAL_FILE = "cases.journal"
+
+# Number of journal records after which the journal is folded into a fresh snapshot.
+COMPACT_EVERY = 1000
+
+# Seconds to wait after the first unsaved change so that a burst of changes is flushed together.
+FLUSH_INTERVAL = 2.0
+
+
+def apply_record(cases: dict[int, Case], courts: dict[int, int], record: dict, seen: dict[int, set[int]] | None = None) -> None:
+    """Applies a single journal record to the in-memory state.
+
+    Replay has to be idempotent: if the process dies after a snapshot was written
+    but before the journal was truncated, the same records are replayed on top of
+    a snapshot that already contains them. `seen` keeps the message ids of each case's
+    logs between calls, so replaying a whole journal does not collect them for every record.
+    """
+    op = record["op"]
+
+    if op == "court_set":
+        courts[int(record["guild_id"])] = record["channel_id"]
+        return
+    if op == "court_removed":
+        courts.pop(int(record["guild_id"]), None)
+        return
+
+    case_id = int(record["case_id"])
+    if op == "case_filed":
+        if case_id not in cases:
+            cases[case_id] = Case.from_dict(case_id, record["case"])
+        return
+    if op == "case_removed":
+        cases.pop(case_id, None)
+        if seen is not None:
+            seen.pop(case_id, None)
+        return
+
+    case = cases.get(case_id)
+    if case is None:
+        return
+
+    if op == "case_updated":
+        case.update(**record["fields"])
+    elif op == "logs_appended":
+        logs = case.logs
+        # entries are not always appended in message id order, so an entry is only known once its id is
+        message_ids = seen.get(case_id) if seen is not None else None
+        if message_ids is None:
+            message_ids = {entry.message_id for entry in logs if entry.message_id is not None}
+            if seen is not None:
+                seen[case_id] = message_ids
+        for entry in record["entries"]:
+            message_id = entry.get("message_id")
+            if message_id is not None and message_id in message_ids:
+                continue
+            logs.append(LogEntry.from_dict(entry))
+            if message_id is not None:
+                message_ids.add(message_id)
+    elif op == "evidence_added":
+        if record["evidence"] not in case.evidences:
+            case.evidences.append(record["evidence"])
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+def scan_object(text: str) -> t.Iterator[tuple[str, int, int, t.Any]]:
+    """Yields `(key, start, end, value)` for each member of the JSON object in `text`.
+
+    `text[start:end]` is the member's encoded value, so it can be found again without
+    decoding the rest of the document.
+    """
+    pos = _whitespace.match(text, 0).end()
+    if text[pos:pos + 1] != "{":
+        raise ValueError("Expected a JSON object")
+    pos = _whitespace.match(text, pos + 1).end()
+    if text[pos:pos + 1] == "}":
+        return
+    while True:
+        key, pos = _decoder.raw_decode(text, pos)
+        pos = _whitespace.match(text, pos).end()
+        if text[pos:pos + 1] != ":":
+            raise ValueError(f"Expected ':' at {pos}")
+        start = _whitespace.match(text, pos + 1).end()
+        value, end = _decoder.raw_decode(text, start)
+        yield key, start, end, value
+        pos = _whitespace.match(text, end).end()
+        if text[pos:pos + 1] == ",":
+            pos = _whitespace.match(text, pos + 1).end()
+        elif text[pos:pos + 1] == "}":
+            return
+        else:
+            raise ValueError(f"Expected ',' or '}}' at {pos}")
+
+
+def atomic_write(path: str, data: str) -> None:
+    """Writes `data` to a temp file next to `path` and renames it into place.
+
+    Readers (and a restart after a crash) only ever see the old file or the complete new one.
+    Each write has a temp file of its own, so writes that overlap do not trip over each other.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class CaseJournal:
+    """Append-only journal of case mutations on top of the cases.json/courts.json snapshot.
+
+    Mutations are buffered in memory and the ids of the touched cases are marked dirty. A
+    background task flushes the buffer every `flush_interval` seconds, so a burst of saves
+    becomes a single append; serialization and file I/O run in a worker thread. Once
+    `compact_every` records have accumulated, the journal is folded into a new snapshot in
+    which only the dirty cases are re-encoded, and the journal is truncated.
+
+    Case logs are left in cases.json until they are read. The store remembers where each
+    case sits in the snapshot, so one case can be read back and the other cases can be copied
+    into the next snapshot as they are. Logs of a case with changes that have not reached the
+    snapshot yet are never evicted.
+    """
+
+    def __init__(self, cases: dict[int, Case], courts: dict[int, int], *, cases_path: str = CASES_FILE, courts_path: str = COURTS_FILE, journal_path: str = JOURNAL_FILE, compact_every: int = COMPACT_EVERY, flush_interval: float = FLUSH_INTERVAL, resident_cases: int = RESIDENT_CASES):
+        self.cases = cases
+        self.courts = courts
+        self.cases_path = cases_path
+        self.courts_path = courts_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.flush_interval = flush_interval
+        self.pending = 0
+        self.dirty: set[int] = set()
+        self.log_cache = CaseLogCache(self._fetch_logs, self._can_evict, max_resident=resident_cases)
+        self._buffer: list[dict] = []
+        self._spans: dict[int, tuple[int, int]] = {}  # case_id -> byte range of the case in cases.json
+        self._snapshot_lock = threading.Lock()  # held while cases.json and `_spans` are swapped
+        self._writing: set[int] = set()  # dirty cases in the snapshot that is being written
+        self._file: t.TextIO | None = None
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.on_write: t.Callable[[float], None] | None = None  # called with the duration of each write
+
+    def load(self) -> None:
+        """Loads the snapshot into `cases`/`courts` in place and replays the journal tail."""
+        self.cases.clear()
+        self.courts.clear()
+        self.log_cache.clear()
+        self._spans.clear()
+        self.dirty = set()
+
+        try:
+            with open(self.cases_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        if data.isascii():
+            # json.dumps escapes everything else, so character offsets are byte offsets here
+            text = data.decode("ascii") or "{}"
+            del data
+            for key, start, end, case in scan_object(text):
+                case.pop("logs", None)
+                self.cases[int(key)] = Case.from_dict(int(key), case)
+                self.cases[int(key)].unload_logs()
+                self._spans[int(key)] = (start, end)
+        else:
+            # hand-edited snapshot; keep everything in memory until it has been rewritten
+            for key, case in json.loads(data).items():
+                self.cases[int(key)] = Case.from_dict(int(key), case)
+            self.dirty = set(self.cases)
+        for case in self.cases.values():
+            self.log_cache.adopt(case)
+
+        try:
+            with open(self.courts_path, "r") as f:
+                for key, channel_id in json.load(f).items():
+                    self.courts[int(key)] = channel_id
+        except FileNotFoundError:
+            pass
+
+        self.pending = 0
+        seen: dict[int, set[int]] = {}
+        try:
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a torn final line from a crash mid-write; everything before it is intact
+                        break
+                    if record["op"] == "logs_appended" and (case := self.cases.get(int(record["case_id"]))) is not None and case.logs_if_loaded is None:
+                        # load runs before the bot does, so the snapshot can be read in place
+                        case.logs = self.read_logs(case.case_id)
+                    apply_record(self.cases, self.courts, record, seen)
+                    self.pending += 1
+                    if "case_id" in record:
+                        self.dirty.add(int(record["case_id"]))
+        except FileNotFoundError:
+            pass
+
+        for case in self.cases.values():
+            if case.log_cache is None:
+                # filed after the snapshot was written
+                self.log_cache.adopt(case)
+
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def start(self) -> None:
+        """Starts the background flush task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            # let the rest of the burst land before writing
+            await asyncio.sleep(self.flush_interval)
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Failed to flush the case journal")
+
+    async def _fetch_logs(self, case_id: int) -> list[LogEntry]:
+        return await asyncio.to_thread(self.read_logs, case_id)
+
+    def read_logs(self, case_id: int) -> list[LogEntry]:
+        """Reads a case's logs from the snapshot; blocks, so only for startup and worker threads."""
+        with self._snapshot_lock:
+            start, end = self._spans[case_id]
+            with open(self.cases_path, "rb") as f:
+                f.seek(start)
+                data = f.read(end - start)
+        return [LogEntry.from_dict(entry) for entry in json.loads(data).get("logs", [])]
+
+    def _can_evict(self, case_id: int) -> bool:
+        return case_id in self._spans and case_id not in self.dirty and case_id not in self._writing
+
+    def _record(self, case_id: int | None, record: dict) -> None:
+        self._buffer.append(record)
+        if case_id is not None:
+            self.dirty.add(case_id)
+        self._wake.set()
+
+    def case_filed(self, case_id: int, case: Case) -> None:
+        self.log_cache.adopt(case)
+        self._record(case_id, {"op": "case_filed", "case_id": case_id, "case": copy.deepcopy(case.to_dict())})
+
+    def case_updated(self, case_id: int, **fields) -> None:
+        self._record(case_id, {"op": "case_updated", "case_id": case_id, "fields": copy.deepcopy(fields)})
+
+    def case_removed(self, case_id: int) -> None:
+        self.log_cache.forget(case_id)
+        self._record(case_id, {"op": "case_removed", "case_id": case_id})
+
+    def logs_appended(self, case_id: int, entries: list[LogEntry]) -> None:
+        self._record(case_id, {"op": "logs_appended", "case_id": case_id, "entries": [entry.to_dict() for entry in entries]})
+
+    def evidence_added(self, case_id: int, evidence: dict) -> None:
+        self._record(case_id, {"op": "evidence_added", "case_id": case_id, "evidence": dict(evidence)})
+
+    def court_set(self, guild_id: int, channel_id: int) -> None:
+        self._record(None, {"op": "court_set", "guild_id": guild_id, "channel_id": channel_id})
+
+    def court_removed(self, guild_id: int) -> None:
+        self._record(None, {"op": "court_removed", "guild_id": guild_id})
+
+    def _take(self, compact: bool) -> tuple[list[dict], tuple[list[int], dict[int, Case], dict[int, int]] | None]:
+        records, self._buffer = self._buffer, []
+        self.pending += len(records)
+        if not compact and self.pending < self.compact_every:
+            return records, None
+
+        snapshot = (list(self.cases), {case_id: self.cases[case_id].copy() for case_id in self.dirty if case_id in self.cases}, dict(self.courts))
+        self._writing = set(self.dirty)
+        self.dirty.clear()
+        self.pending = 0
+        return records, snapshot
+
+    async def flush(self, compact: bool = False) -> None:
+        """Writes buffered records (and a snapshot if one is due) from a worker thread."""
+        async with self._flush_lock:
+            records, snapshot = self._take(compact)
+            if records or snapshot:
+                await asyncio.to_thread(self._write, records, snapshot)
+
+    def compact(self) -> None:
+        """Synchronously writes everything buffered plus a full snapshot. Used at startup and shutdown."""
+        self._write(*self._take(compact=True))
+
+    def _write(self, records: list[dict], snapshot: tuple[list[int], dict[int, Case], dict[int, int]] | None) -> None:
+        started = time.perf_counter()
+        try:
+            self._write_files(records, snapshot)
+        except BaseException:
+            # the changes never reached the snapshot, so their logs must stay in memory
+            self.dirty |= self._writing
+            raise
+        finally:
+            self._writing = set()
+            if self.on_write is not None:
+                self.on_write(time.perf_counter() - started)
+
+    def _write_files(self, records: list[dict], snapshot: tuple[list[int], dict[int, Case], dict[int, int]] | None) -> None:
+        if records:
+            if self._file is None:
+                self._file = open(self.journal_path, "a")
+            self._file.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+            self._file.flush()
+
+        if snapshot is None:
+            return
+
+        case_ids, changed, courts = snapshot
+        self._write_cases(case_ids, changed)
+        atomic_write(self.courts_path, json.dumps(courts, indent=4))
+
+        # only truncate once both snapshots are durable; replaying on top of them is idempotent
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with open(self.journal_path, "w"):
+            pass
+
+    def _write_cases(self, case_ids: list[int], changed: dict[int, Case]) -> None:
+        """Writes a new cases.json like `atomic_write`, copying unchanged cases from the old one."""
+        spans: dict[int, tuple[int, int]] = {}
+        tmp_path = f"{self.cases_path}.tmp"
+        old = open(self.cases_path, "rb") if self._spans else None
+        try:
+            with open(tmp_path, "wb") as f:
+                pos = f.write(b"{")
+                for case_id in case_ids:
+                    if case_id in changed:
+                        case = changed[case_id]
+                        if case.logs_if_loaded is None:
+                            assert old is not None
+                            # changed without its logs being read; they are still the ones in the old snapshot
+                            start, end = self._spans[case_id]
+                            old.seek(start)
+                            case.logs = [LogEntry.from_dict(entry) for entry in json.loads(old.read(end - start)).get("logs", [])]
+                        encoded = json.dumps(case.to_dict(), separators=(",", ":")).encode("ascii")
+                    elif old is not None and case_id in self._spans:
+                        start, end = self._spans[case_id]
+                        old.seek(start)
+                        encoded = old.read(end - start)
+                    else:
+                        continue
+                    pos += f.write(f'{"," if spans else ""}"{case_id}":'.encode("ascii"))
+                    spans[case_id] = (pos, pos + len(encoded))
+                    pos += f.write(encoded)
+                f.write(b"}")
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            if old is not None:
+                old.close()
+        with self._snapshot_lock:
+            os.replace(tmp_path, self.cases_path)
+            self._spans = spans
+
+    def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self.compact()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,125 +1,24 @@
-from enum import StrEnum
-
-class CaseType(StrEnum):
-    CRIMINAL = "Criminal"
-    CIVIL = "Civil"
-    FAMILY = "Family"
-    TRAFFIC = "Traffic"
-    SMALL_CLAIMS = "Small Claims"
-    COUNTER_CASE = "Counter-case"
-
-class CaseStatus(StrEnum):
-    OPEN = "Open"
-    CLOSED = "Closed"
-    APPEALED = "Appealed"
-
-class Case:
-    def __init__(self, case_id: int, case_type: CaseType, status: CaseStatus, reason: str, participants: list[CaseParticipant], created_at: str = "", updated_at: str = "", court_id: int = 0, logs: list['LogEntry'] | None = None, verdict: str = "", summary: str = "", ):
-        self.case_id = case_id
-        self.case_type = case_type
-        self.status = status
-        self.reason = reason
-        self.participants = participants
-        self.verdict = verdict
-        self.summary = summary
-        self.logs: list[LogEntry] = logs if logs is not None else []
-        self.created_at = created_at
-        self.updated_at = updated_at
-        self.court_id = court_id
-
-    def to_dict(self, include_logs=False, include_participants=False) -> dict:
-        return {
-            "case_id": self.case_id,
-            "case_type": self.case_type.value,
-            "status": self.status.value,
-            "reason": self.reason,
-            "verdict": self.verdict,
-            "summary": self.summary,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
-            "court_id": self.court_id,
-            } | ({
-                "participants": [p.to_dict() for p in self.participants],
-            } if include_participants else {}) | ({
-                "logs": [log.to_dict() for log in self.logs],
-            } if include_logs else {})
-    
-    @staticmethod
-    def from_dict(data: dict) -> 'Case':
-        return Case(
-            case_id=data["case_id"],
-            case_type=CaseType(data["case_type"]),
-            status=CaseStatus(data["status"]),
-            reason=data["reason"],
-            participants=[CaseParticipant.from_dict(p) for p in data.get("participants", [])],
-            verdict=data.get("verdict", ""),
-            summary=data.get("summary", ""),
-            created_at=data.get("created_at", ""),
-            updated_at=data.get("updated_at", ""),
-            court_id=data.get("court_id", 0),
-            logs=[LogEntry.from_dict(log) for log in data.get("logs", [])],
-        )
-    
+import copy
+import json
+import logging
+import os
+import time
+import typing as t
+from concurrent.futures import Future
 
-    def add_log_entry(self, log_entry: 'LogEntry'):
-        self.logs.append(log_entry)
-    
-class CaseRole(StrEnum):
-    JUDGE = "Judge"
-    PROSECUTOR = "Prosecutor"
-    DEFENSE = "Defense"
-    WITNESS = "Witness"
-
-class CaseParticipant:
-    def __init__(self, user_id: int, role: CaseRole):
-        self.user_id = user_id
-        self.role = role
-    
-    def to_dict(self) -> dict:
-        return {
-            "user_id": self.user_id,
-            "role": self.role.value
-        }
-    
-    @staticmethod
-    def from_dict(data: dict) -> 'CaseParticipant':
-        return CaseParticipant(
-            user_id=data["user_id"],
-            role=CaseRole(data["role"])
-        )
+from case_logs import RESIDENT_CASES, CaseLogCache
+from data_access import CASES_FILE, CaseJournal
+# the models used to live here; keep them importable from db
+from models import Case, CaseParticipant, CaseRole, CaseStatus, CaseType, LogEntry
+from sqlite_worker import SqliteWorker
 
-class LogEntry:
-    def __init__(self, timestamp: str, author_id: int, content: str, message_id: int = 0, message_reference_id: int = 0, summary: str = ""):
-        self.timestamp = timestamp
-        self.author_id = author_id
-        self.content = content
-        self.message_id = message_id
-        self.message_reference_id = message_reference_id
-        self.summary = summary
-
-    def to_dict(self) -> dict:
-        return {
-            "timestamp": self.timestamp,
-            "author_id": self.author_id,
-            "content": self.content,
-            "message_id": self.message_id,
-            "message_reference_id": self.message_reference_id,
-            "summary": self.summary
-        }
-    
-    @staticmethod
-    def from_dict(data: dict) -> 'LogEntry':
-        return LogEntry(
-            timestamp=data["timestamp"],
-            author_id=data["author_id"],
-            content=data["content"],
-            message_id=data.get("message_id", 0),
-            message_reference_id=data.get("message_reference_id", 0),
-            summary=data.get("summary", "")
-        )
-    
-    def summarize(self):
-        raise NotImplementedError("LogEntry.summarize method is not implemented yet.")
+__all__ = [
+    "CASE_COLUMNS", "JSON_COLUMNS", "CourtDatabase", "CourtDatabaseSqlite", "initialize_database",
+    # re-exported from models
+    "Case", "CaseParticipant", "CaseRole", "CaseStatus", "CaseType", "LogEntry",
+]
+
+log = logging.getLogger(__name__)
 
 class CourtDatabase:
     def __init__(self):
@@ -142,24 +41,42 @@ class CourtDatabase:
         return [case for case in self.cases.values() if case.status == CaseStatus.OPEN]
     
 
-def initialize_database() -> CourtDatabaseSqlite:
-    court_db = CourtDatabase()
-    db = CourtDatabaseSqlite(court_db=court_db)
-    # Here you could load existing cases from a file or database
+def initialize_database(cases: dict[int, Case], courts: dict[int, int], db_path: str = "court.db", resident_cases: int = RESIDENT_CASES, owns_guild: t.Callable[[int | None], bool] | None = None) -> 'CourtDatabaseSqlite':
+    db = CourtDatabaseSqlite(cases, courts, resident_cases=resident_cases, owns_guild=owns_guild)
+    db.connect(db_path)
     return db
 
-class CourtDatabaseSqlite:
-    def __init__(self, court_db: CourtDatabase) -> None:
-        self.court_db = court_db
-        # Initialize SQLite connection here
-        self.conn = None  # Placeholder for SQLite connection
-    
-    def connect(self, db_path: str) -> None:
-        import sqlite3
-        self.conn = sqlite3.connect(db_path)
-        self._create_tables()
-    
-    def _create_tables(self) -> None:
+# fields of the in-memory cases that map straight onto columns of the cases table
+CASE_COLUMNS = ("case_type", "status", "reason", "verdict", "summary", "og_message_id", "guild_id", "closed_at", "summary_checkpoint")
+# the ones among them that hold structured values, stored as JSON text
+JSON_COLUMNS = ("summary_checkpoint",)
+
+class CourtDatabaseSqlite(SqliteWorker):
+    """SQLite store behind the in-memory `cases`/`courts` dicts.
+
+    Exposes the same mutation methods as `data_access.CaseJournal`, each queued on the store's
+    worker thread.
+
+    Case logs are read from the database when a case is first used. A read is queued behind
+    the writes issued before it, so logs can be evicted at any time and read back complete.
+
+    Sharded workers share one database file. Each loads only the guilds it owns, so every case
+    is written by a single process, and SQLite's file locks order the transactions between them.
+    """
+
+    thread_name = "court-db"
+    failure_message = "Database write failed"
+    synchronous = "NORMAL"
+
+    def __init__(self, cases: dict[int, Case], courts: dict[int, int], *, resident_cases: int = RESIDENT_CASES, owns_guild: t.Callable[[int | None], bool] | None = None) -> None:
+        super().__init__()
+        self.cases = cases
+        self.courts = courts
+        self.owns_guild = owns_guild  # loads only the cases and courts of these guilds when set
+        self.log_cache = CaseLogCache(self._fetch_logs, lambda case_id: True, max_resident=resident_cases)
+        self.on_write: t.Callable[[float], None] | None = None  # called with the duration of each transaction
+
+    def _setup(self) -> None:
         if self.conn is None:
             raise ValueError("Database connection is not established.")
         cursor = self.conn.cursor()
@@ -171,6 +88,11 @@ class CourtDatabaseSqlite:
                 reason TEXT,
                 verdict TEXT,
                 summary TEXT,
+                og_message_id INTEGER,
+                associated_case_ids TEXT,
+                guild_id INTEGER,
+                closed_at REAL,
+                summary_checkpoint TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
@@ -181,6 +103,7 @@ class CourtDatabaseSqlite:
                 case_id INTEGER,
                 timestamp TEXT,
                 author_id INTEGER,
+                speaker TEXT,
                 is_judge INTEGER DEFAULT 0,
                 content TEXT,
                 message_id INTEGER,
@@ -201,6 +124,227 @@ class CourtDatabaseSqlite:
             );
         ''')
 
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS evidences (
+                evidence_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                case_id INTEGER,
+                file_name TEXT,
+                summary TEXT,
+                url TEXT,
+                sha256 TEXT,
+                FOREIGN KEY(case_id) REFERENCES cases(case_id)
+            );
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS courts (
+                guild_id INTEGER PRIMARY KEY,
+                channel_id INTEGER
+            );
+        ''')
+
+        # databases created before cases recorded their guild, closing time and summary checkpoint
+        existing = {row[1] for row in cursor.execute("PRAGMA table_info(cases)")}
+        for column, column_type in (("guild_id", "INTEGER"), ("closed_at", "REAL"), ("summary_checkpoint", "TEXT")):
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE cases ADD COLUMN {column} {column_type}")
+        # and before evidence was stored by content hash
+        if "sha256" not in {row[1] for row in cursor.execute("PRAGMA table_info(evidences)")}:
+            cursor.execute("ALTER TABLE evidences ADD COLUMN sha256 TEXT")
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_log_entries_case ON log_entries(case_id, log_id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_participants_user ON participants(user_id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_evidences_case ON evidences(case_id);")
+
+        self.conn.commit()
+
+    def load(self) -> None:
+        """Fills `cases`/`courts` in place from the database, importing cases.json on first run."""
+        self._executor.submit(self._load).result()
+
+    def _load(self) -> None:
+        assert self.conn is not None
+        self.cases.clear()
+        self.courts.clear()
+        self.log_cache.clear()
+
+        with self.conn:
+            # workers starting together all find the database empty; the write lock lets one of them import
+            self.conn.execute("BEGIN IMMEDIATE")
+            if self.conn.execute("SELECT 1 FROM cases LIMIT 1").fetchone() is None and os.path.exists(CASES_FILE):
+                log.info("Importing cases.json into the SQLite database")
+                journal = CaseJournal(self.cases, self.courts)
+                journal.load()
+                for case_id, case in self.cases.items():
+                    if case.logs_if_loaded is None:
+                        case.logs = journal.read_logs(case_id)
+                    self._insert_case(case_id, case)
+                for guild_id, channel_id in self.courts.items():
+                    self._set_court(guild_id, channel_id)
+        # load again below so that the cases read their logs from the database
+        self.cases.clear()
+        self.courts.clear()
+
+        for case_id, case_type, status, reason, verdict, summary, og_message_id, associated_case_ids, guild_id, closed_at, summary_checkpoint in self.conn.execute(
+            "SELECT case_id, case_type, status, reason, verdict, summary, og_message_id, associated_case_ids, guild_id, closed_at, summary_checkpoint FROM cases"
+        ):
+            if self.owns_guild is not None and not self.owns_guild(guild_id):
+                continue
+            self.cases[case_id] = Case(
+                case_id, case_type, status, reason, [],
+                associated_case_ids=json.loads(associated_case_ids) if associated_case_ids else [],
+                og_message_id=og_message_id, verdict=verdict, summary=summary, guild_id=guild_id, closed_at=closed_at,
+                summary_checkpoint=json.loads(summary_checkpoint) if summary_checkpoint else None,
+            )
+
+        for case_id, user_id, role in self.conn.execute("SELECT case_id, user_id, role FROM participants ORDER BY rowid"):
+            case = self.cases.get(case_id)
+            if case is None:
+                continue
+            if role in (CaseRole.PROSECUTOR, CaseRole.DEFENSE):
+                case.participants.append(CaseParticipant(user_id, CaseRole(role)))
+
+        for case_id, file_name, summary, url, sha256 in self.conn.execute("SELECT case_id, file_name, summary, url, sha256 FROM evidences ORDER BY evidence_id"):
+            case = self.cases.get(case_id)
+            if case is None:
+                continue
+            evidence = {"file_name": file_name, "summary": summary, "url": url}
+            if sha256 is not None:
+                evidence["sha256"] = sha256
+            case.evidences.append(evidence)
+
+        for guild_id, channel_id in self.conn.execute("SELECT guild_id, channel_id FROM courts"):
+            if self.owns_guild is None or self.owns_guild(guild_id):
+                self.courts[guild_id] = channel_id
+
+        for case in self.cases.values():
+            case.unload_logs()
+            self.log_cache.adopt(case)
+
+    async def _fetch_logs(self, case_id: int) -> list[LogEntry]:
+        return await self._call(self._select_logs, case_id)
+
+    def _select_logs(self, case_id: int) -> list[LogEntry]:
+        assert self.conn is not None
+        return [
+            LogEntry(message_id, message_reference_id, speaker, content)
+            for message_id, message_reference_id, speaker, content in self.conn.execute(
+                "SELECT message_id, message_reference_id, speaker, content FROM log_entries WHERE case_id = ? ORDER BY log_id", (case_id,)
+            )
+        ]
+
+    def _insert_case(self, case_id: int, case: Case) -> None:
+        assert self.conn is not None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cases (case_id, case_type, status, reason, verdict, summary, og_message_id, associated_case_ids, guild_id, closed_at, summary_checkpoint) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (case_id, case.case_type, case.status, case.reason, case.verdict, case.summary, case.og_message_id, json.dumps(case.associated_case_ids), case.guild_id, case.closed_at,
+             json.dumps(case.summary_checkpoint) if case.summary_checkpoint is not None else None),
+        )
+        self._replace_participants(case_id, case.accuser, case.accused)
+        self._insert_logs(case_id, case.logs)
+        for evidence in case.evidences:
+            self._insert_evidence(case_id, evidence)
+
+    def _replace_participants(self, case_id: int, accuser: int | None, accused: list[int]) -> None:
+        assert self.conn is not None
+        if accuser is not None:
+            self.conn.execute("DELETE FROM participants WHERE case_id = ? AND role = ?", (case_id, CaseRole.PROSECUTOR.value))
+            self.conn.execute("INSERT OR IGNORE INTO participants (case_id, user_id, role) VALUES (?, ?, ?)", (case_id, accuser, CaseRole.PROSECUTOR.value))
+        self.conn.execute("DELETE FROM participants WHERE case_id = ? AND role = ?", (case_id, CaseRole.DEFENSE.value))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO participants (case_id, user_id, role) VALUES (?, ?, ?)",
+            [(case_id, user_id, CaseRole.DEFENSE.value) for user_id in accused],
+        )
+
+    def _insert_logs(self, case_id: int, entries: list[LogEntry]) -> None:
+        assert self.conn is not None
+        self.conn.executemany(
+            "INSERT INTO log_entries (case_id, speaker, is_judge, content, message_id, message_reference_id) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (case_id, entry.speaker, int(entry.is_judge), entry.message, entry.message_id, entry.message_reference_id)
+                for entry in entries
+            ],
+        )
+
+    def _insert_evidence(self, case_id: int, evidence: dict) -> None:
+        assert self.conn is not None
+        self.conn.execute(
+            "INSERT INTO evidences (case_id, file_name, summary, url, sha256) VALUES (?, ?, ?, ?, ?)",
+            (case_id, evidence.get("file_name"), evidence.get("summary"), evidence.get("url"), evidence.get("sha256")),
+        )
+
+    def _set_court(self, guild_id: int, channel_id: int) -> None:
+        assert self.conn is not None
+        self.conn.execute("INSERT OR REPLACE INTO courts (guild_id, channel_id) VALUES (?, ?)", (guild_id, channel_id))
+
+    def _in_transaction(self, fn: t.Callable[..., None], *args) -> None:
+        assert self.conn is not None
+        started = time.perf_counter()
+        with self.conn:
+            fn(*args)
+        if self.on_write is not None:
+            self.on_write(time.perf_counter() - started)
+
+    def case_filed(self, case_id: int, case: Case) -> Future:
+        self.log_cache.adopt(case)
+        # snapshot the case now; the worker thread may run after the event loop has mutated it again
+        return self._submit(self._in_transaction, self._insert_case, case_id, case.copy())
+
+    def case_updated(self, case_id: int, **fields) -> Future:
+        return self._submit(self._in_transaction, self._update_case, case_id, copy.deepcopy(fields))
+
+    def _update_case(self, case_id: int, fields: dict) -> None:
+        assert self.conn is not None
+        columns = [column for column in CASE_COLUMNS if column in fields]
+        if columns:
+            self.conn.execute(
+                f"UPDATE cases SET {', '.join(f'{column} = ?' for column in columns)}, updated_at = CURRENT_TIMESTAMP WHERE case_id = ?",
+                [json.dumps(fields[column]) if column in JSON_COLUMNS and fields[column] is not None else fields[column] for column in columns] + [case_id],
+            )
+        if "accused" in fields:
+            self._replace_participants(case_id, None, list(fields["accused"]))
+
+    def case_removed(self, case_id: int) -> Future:
+        self.log_cache.forget(case_id)
+        return self._submit(self._in_transaction, self._delete_case, case_id)
+
+    def _delete_case(self, case_id: int) -> None:
+        assert self.conn is not None
+        for table in ("log_entries", "participants", "evidences", "cases"):
+            self.conn.execute(f"DELETE FROM {table} WHERE case_id = ?", (case_id,))
+
+    def logs_appended(self, case_id: int, entries: list[LogEntry]) -> Future:
+        # the user message and the JudgeBot reply land in one transaction
+        return self._submit(self._in_transaction, self._insert_logs, case_id, list(entries))
+
+    def evidence_added(self, case_id: int, evidence: dict) -> Future:
+        return self._submit(self._in_transaction, self._insert_evidence, case_id, dict(evidence))
+
+    def court_set(self, guild_id: int, channel_id: int) -> Future:
+        return self._submit(self._in_transaction, self._set_court, guild_id, channel_id)
+
+    def court_removed(self, guild_id: int) -> Future:
+        return self._submit(self._in_transaction, self._remove_court, guild_id)
+
+    def _remove_court(self, guild_id: int) -> None:
+        assert self.conn is not None
+        self.conn.execute("DELETE FROM courts WHERE guild_id = ?", (guild_id,))
+
+    def start(self) -> None:
+        # writes are handed to the worker thread as they happen; there is nothing to schedule
+        pass
+
+    async def flush(self, compact: bool = False) -> None:
+        """Waits until every write queued so far has been committed."""
+        await self._call(self._checkpoint if compact else _noop)
+
+    def compact(self) -> None:
+        """Waits for queued writes and checkpoints the WAL back into the main database file."""
+        self._executor.submit(self._checkpoint).result()
 
+    def _checkpoint(self) -> None:
+        assert self.conn is not None
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
-        self.conn.commit()
\ No newline at end of file
+def _noop() -> None:
+    pass
@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import typing as t
+
+import aiohttp
+import discord
+from google.genai import Client as GoogleClient
+
+from blobs import BlobStore
+from data_access import atomic_write
+from llm_scheduler import LLMScheduler
+from metrics import LLMCall
+
+log = logging.getLogger(__name__)
+
+# Polling of Gemini's file processing state: first wait, growth factor, cap, and overall deadline (seconds).
+POLL_INITIAL = 1.0
+POLL_FACTOR = 2.0
+POLL_MAX = 10.0
+PROCESSING_DEADLINE = 120.0
+
+CHUNK_SIZE = 64 * 1024
+
+EVIDENCE_CACHE_FILE = "evidence_cache.json"
+CACHE_MAX_ENTRIES = 5000
+CACHE_MAX_AGE = 30 * 24 * 3600.0  # entries unused for this long are dropped
+
+# Gemini deletes uploaded files after 48 hours; handles this close to expiry are treated as gone.
+HANDLE_EXPIRY_MARGIN = 3600.0
+HANDLE_DEFAULT_LIFETIME = 47 * 3600.0
+
+SUMMARY_FAILED = "Summary could not be generated."
+
+StatusCallback = t.Callable[[discord.Attachment, str], t.Awaitable[None]]
+
+
+async def download_attachment(session: aiohttp.ClientSession, file: discord.Attachment, path: str) -> str:
+    """Streams an attachment to `path` and returns the SHA-256 of its bytes.
+
+    Disk writes happen in a worker thread.
+    """
+    digest = hashlib.sha256()
+    async with session.get(file.url) as response:
+        response.raise_for_status()
+        f = await asyncio.to_thread(open, path, "wb")
+        try:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+    return digest.hexdigest()
+
+
+class EvidenceCache:
+    """Persistent cache of evidence summaries and Gemini file handles, keyed by content hash.
+
+    Entries are kept in least-recently-used order and evicted once there are more than
+    `max_entries` or they have not been used for `max_age` seconds.
+    """
+
+    def __init__(self, path: str = EVIDENCE_CACHE_FILE, *, max_entries: int = CACHE_MAX_ENTRIES, max_age: float = CACHE_MAX_AGE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._save_lock = asyncio.Lock()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def _touch(self, digest: str) -> dict:
+        entry = self.entries.pop(digest, None) or {"summary": None, "file_name": None, "expires_at": None}
+        entry["last_used"] = time.time()
+        self.entries[digest] = entry  # re-inserting keeps the dict in LRU order
+        self._dirty = True
+        return entry
+
+    def summary(self, digest: str) -> str | None:
+        entry = self.entries.get(digest)
+        if entry is None or not entry.get("summary"):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._touch(digest)["summary"]
+
+    def handle(self, digest: str) -> str | None:
+        """Returns the Gemini file name for this content if the upload has not expired yet."""
+        entry = self.entries.get(digest)
+        if entry is None or not entry.get("file_name"):
+            return None
+        if (entry.get("expires_at") or 0) - HANDLE_EXPIRY_MARGIN < time.time():
+            entry["file_name"] = None
+            return None
+        return self._touch(digest)["file_name"]
+
+    def put_handle(self, digest: str, file_name: str, expires_at: float) -> None:
+        entry = self._touch(digest)
+        entry["file_name"] = file_name
+        entry["expires_at"] = expires_at
+
+    def put_summary(self, digest: str, summary: str) -> None:
+        self._touch(digest)["summary"] = summary
+
+    def evict(self) -> None:
+        cutoff = time.time() - self.max_age
+        for digest in [digest for digest, entry in self.entries.items() if entry.get("last_used", 0) < cutoff]:
+            del self.entries[digest]
+            self._dirty = True
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+            self._dirty = True
+
+    async def save(self) -> None:
+        """Writes the cache if it changed. Saves run one at a time; a failed one is logged and retried by the next."""
+        async with self._save_lock:
+            self.evict()
+            if not self._dirty:
+                return
+            self._dirty = False
+            entries = {digest: dict(entry) for digest, entry in self.entries.items()}
+            try:
+                await asyncio.to_thread(lambda: atomic_write(self.path, json.dumps(entries)))
+            except Exception:
+                # the summaries are already known; losing them from disk only costs a later lookup
+                self._dirty = True
+                log.exception("Failed to save the evidence cache", extra={"fields": {"path": self.path}})
+
+
+async def wait_until_processed(get_file: t.Callable[[str], t.Awaitable], uploaded_file, deadline: float = PROCESSING_DEADLINE):
+    """Polls the uploaded file with exponential backoff until Gemini is done processing it."""
+    delay = POLL_INITIAL
+    async with asyncio.timeout(deadline):
+        while uploaded_file.state == "PROCESSING":
+            await asyncio.sleep(delay)
+            delay = min(delay * POLL_FACTOR, POLL_MAX)
+            uploaded_file = await get_file(uploaded_file.name)
+    if uploaded_file.state == "FAILED":
+        raise RuntimeError(f"Gemini failed to process {uploaded_file.name}")
+    return uploaded_file
+
+
+class EvidencePipeline:
+    """Downloads, uploads and summarizes evidence files, all files at once.
+
+    `on_status(file, status)` is awaited whenever a file moves to its next stage, so the
+    caller can report progress. Every Gemini call, file uploads included, goes through the
+    scheduler on behalf of the guild the evidence was attached in. Downloads are kept in the
+    blob store, referenced by the case they were attached to.
+    """
+
+    def __init__(self, google_client: GoogleClient, cache: EvidenceCache, llm: LLMScheduler, blobs: BlobStore):
+        self.google_client = google_client
+        self.cache = cache
+        self.llm = llm
+        self.blobs = blobs
+
+    async def summarize_all(self, files: list[discord.Attachment], on_status: StatusCallback, case_id: int, guild_id: int | None = None) -> list[tuple[str | None, str]]:
+        """The content hash and summary of each file, in order; the hash is None if the download failed."""
+        async with aiohttp.ClientSession() as session:
+            results = list(await asyncio.gather(*(self._summarize(session, file, on_status, case_id, guild_id) for file in files)))
+        await self.cache.save()
+        return results
+
+    async def _files[T](self, guild_id: int | None, operation: t.Callable[[], t.Awaitable[T]]) -> T:
+        # file operations are not model requests: queued with the evidence, but not rate limited
+        return await self.llm.run("files", guild_id, lambda call: operation(), requests=0)
+
+    async def _gemini_file(self, digest: str, path: str, on_status: t.Callable[[str], t.Awaitable[None]], guild_id: int | None):
+        if (file_name := self.cache.handle(digest)) is not None:
+            try:
+                return await self._files(guild_id, lambda: self.google_client.aio.files.get(name=file_name))
+            except Exception:
+                # deleted early or otherwise gone; fall through to a fresh upload
+                pass
+
+        await on_status("uploading")
+        uploaded_file = await self._files(guild_id, lambda: self.google_client.aio.files.upload(file=path))
+        await on_status("processing")
+        uploaded_file = await wait_until_processed(lambda name: self._files(guild_id, lambda: self.google_client.aio.files.get(name=name)), uploaded_file)
+        expires_at = uploaded_file.expiration_time.timestamp() if uploaded_file.expiration_time else time.time() + HANDLE_DEFAULT_LIFETIME
+        if uploaded_file.name:
+            self.cache.put_handle(digest, uploaded_file.name, expires_at)
+        return uploaded_file
+
+    async def _download(self, session: aiohttp.ClientSession, file: discord.Attachment, case_id: int) -> tuple[str, str]:
+        temp_path = self.blobs.temp_path()
+        try:
+            digest = await download_attachment(session, file, temp_path)
+        except BaseException:
+            # a partial download never becomes a blob
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return digest, await self.blobs.put(temp_path, digest, case_id)
+
+    async def _summarize(self, session: aiohttp.ClientSession, file: discord.Attachment, on_status: StatusCallback, case_id: int, guild_id: int | None) -> tuple[str | None, str]:
+        digest = None
+        try:
+            await on_status(file, "downloading")
+            digest, path = await self._download(session, file, case_id)
+
+            if (summary := self.cache.summary(digest)) is not None:
+                await on_status(file, "done (already known)")
+                return digest, summary
+
+            uploaded_file = await self._gemini_file(digest, path, lambda status: on_status(file, status), guild_id)
+
+            await on_status(file, "summarizing")
+
+            async def summarize(call: LLMCall):
+                response = await self.google_client.aio.models.generate_content(
+                    model="gemini-2.5-flash-lite",
+                    contents=["Summarize the contents of the following file:\n\n",
+                              uploaded_file]
+                )
+                call.record(response)
+                return response
+
+            # the file's own tokens are unknown until Gemini reports them; the charge is settled then
+            response = await self.llm.run("evidence", guild_id, summarize)
+        except Exception:
+            log.exception("Failed to summarize evidence", extra={"fields": {"file_name": file.filename}})
+            await on_status(file, "failed")
+            return digest, SUMMARY_FAILED
+
+        if response and response.text:
+            summary = response.text.strip()
+            self.cache.put_summary(digest, summary)
+            await on_status(file, "done")
+            return digest, summary
+        await on_status(file, "failed")
+        return digest, SUMMARY_FAILED
+
+
+class EvidenceProgress:
+    """Shows per-file pipeline progress in the interaction's original (ephemeral) response."""
+
+    def __init__(self, interaction: discord.Interaction, files: list[discord.Attachment]):
+        self.interaction = interaction
+        self.statuses = {file.id: "queued" for file in files}
+        self.names = {file.id: file.filename for file in files}
+        self._lock = asyncio.Lock()
+
+    def render(self) -> str:
+        lines = [f"- {self.names[file_id]}: {status}" for file_id, status in self.statuses.items()]
+        return "Uploading and summarizing evidence. Please wait...\n" + "\n".join(lines)
+
+    async def update(self, file: discord.Attachment, status: str) -> None:
+        self.statuses[file.id] = status
+        # progress is best effort; a failed edit must not fail the upload
+        async with self._lock:
+            try:
+                await self.interaction.edit_original_response(content=self.render())
+            except discord.HTTPException:
+                pass
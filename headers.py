@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import typing as t
+
+import discord
+
+from models import Case
+from users import UserResolver
+
+log = logging.getLogger(__name__)
+
+CASE_DETAILS_START = """
+## Case: {user.name} vs {accused_names}
+**Order!** A case has been filed by **{user.mention}** against **{accused}**.
+
+**Reason:** {reason}  
+**Case Type:** {case_type}  
+**Case Status:** {status}  
+
+Court is now in session. Accuser, please present your case.
+"""
+
+CASE_DETAILS = """
+## Case: {user.name} vs {accused_names}
+**Order!** A case has been filed by **{user.mention}** against **{accused}**.
+
+**Reason:** {reason}  
+**Case Type:** {case_type}  
+**Case Status:** {status}  
+
+**Summary of Proceedings So Far:**
+{summary}
+"""
+
+HEADER_LIMIT = 1950
+
+# Seconds to hold a header edit so that changes landing close together go out as one edit.
+COALESCE_WINDOW = 0.5
+
+
+class CaseHeaders:
+    """Renders and edits the header message at the top of each case thread.
+
+    Keeps the last rendered content and a handle to the header message per case, so an
+    edit that would not change anything is skipped and the message is never fetched just
+    to be edited. Requests within `coalesce_window` of each other become one edit that
+    renders the latest state of the case.
+    """
+
+    def __init__(self, client: discord.Client, cases: dict[int, Case], user_resolver: UserResolver, view_factory: t.Callable[[], discord.ui.View], *, coalesce_window: float = COALESCE_WINDOW):
+        self.client = client
+        self.cases = cases
+        self.user_resolver = user_resolver
+        self.view_factory = view_factory
+        self.coalesce_window = coalesce_window
+        self.messages: dict[int, discord.Message | discord.PartialMessage] = {}
+        self.rendered: dict[int, str] = {}
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+        self.edits = 0
+        self.skipped = 0
+
+    async def render(self, case: Case) -> str:
+        accuser, *accused = await self.user_resolver.resolve_many([case.accuser, *case.accused])
+        template = CASE_DETAILS if case.summary else CASE_DETAILS_START
+        content = template.format(
+            user=accuser,
+            accused=', '.join(user.mention for user in accused),
+            accused_names=', '.join(user.name for user in accused),
+            reason=case.reason,
+            case_type=case.case_type,
+            status=case.status,
+            summary=case.summary or '',
+        )
+        if case.closed and case.verdict:
+            content += "\n\n## VERDICT:\n" + case.verdict
+        if len(content) > HEADER_LIMIT:
+            content = content[:HEADER_LIMIT - 3] + "..."
+        return content
+
+    def track(self, case_id: int, message: discord.Message) -> None:
+        """Registers a freshly sent header so later edits neither fetch it nor repeat its content."""
+        self.messages[case_id] = message
+        self.rendered[case_id] = message.content
+
+    def forget(self, case_id: int) -> None:
+        self.messages.pop(case_id, None)
+        self.rendered.pop(case_id, None)
+        self._locks.pop(case_id, None)
+
+    def _message(self, case_id: int, case: Case) -> discord.Message | discord.PartialMessage:
+        message = self.messages.get(case_id)
+        if message is None or message.id != case.og_message_id:
+            # a partial message is enough to edit, no REST call needed to get a handle
+            message = self.client.get_partial_messageable(case_id).get_partial_message(case.og_message_id)
+            self.messages[case_id] = message
+        return message
+
+    def request(self, case_id: int) -> asyncio.Task[None]:
+        """Schedules a header refresh and returns the task that will perform it."""
+        task = self._tasks.get(case_id)
+        if task is None or task.done():
+            task = self._tasks[case_id] = asyncio.create_task(self._refresh(case_id))
+        return task
+
+    async def refresh(self, case_id: int) -> None:
+        """Requests a refresh and waits until the header shows the current state."""
+        await asyncio.shield(self.request(case_id))
+
+    async def _refresh(self, case_id: int) -> None:
+        await asyncio.sleep(self.coalesce_window)
+        # anything requested from here on needs a render of its own
+        if self._tasks.get(case_id) is asyncio.current_task():
+            del self._tasks[case_id]
+
+        async with self._locks.setdefault(case_id, asyncio.Lock()):
+            case = self.cases.get(case_id)
+            if case is None:
+                return
+            try:
+                content = await self.render(case)
+                if self.rendered.get(case_id) == content:
+                    self.skipped += 1
+                    return
+                await self._message(case_id, case).edit(content=content, view=self.view_factory())
+                self.rendered[case_id] = content
+                self.edits += 1
+            except Exception:
+                log.exception("Failed to update case header", extra={"fields": {"case_id": case_id}})
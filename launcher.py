@@ -0,0 +1,113 @@
+"""Runs JudgeBot as several worker processes that split the gateway shards between them.
+
+    python launcher.py --workers 4 --shards 16
+
+Each worker is `main.py` with SHARD_COUNT and SHARD_IDS set to its contiguous range of shards,
+so it only receives, loads and writes the cases of its own guilds. The workers share the case
+store, which therefore has to be the SQLite backend (STORAGE_BACKEND=sqlite). With METRICS_PORT
+set, worker n serves its metrics on METRICS_PORT + n.
+
+A worker that exits is started again, after a delay that doubles while it keeps failing.
+SIGINT or SIGTERM stops every worker the way Ctrl-C stops a single bot, so each one flushes its
+store before exiting.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+
+import dotenv
+
+from logging_setup import setup_logging
+from sharding import split_shards
+
+log = logging.getLogger("judgebot.launcher")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Delay before restarting a worker that exited; doubled after each quick failure up to the maximum.
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+# A worker that ran at least this long counts as healthy, and its next restart is not delayed further.
+HEALTHY_AFTER = 60.0
+
+
+def worker_env(base: dict[str, str], index: int, shard_ids: list[int], shard_count: int) -> dict[str, str]:
+    env = dict(base, SHARD_COUNT=str(shard_count), SHARD_IDS=",".join(map(str, shard_ids)), WORKER_INDEX=str(index))
+    if "METRICS_PORT" in base:
+        env["METRICS_PORT"] = str(int(base["METRICS_PORT"]) + index)
+    return env
+
+
+async def supervise(index: int, command: list[str], env: dict[str, str], stopping: asyncio.Event, processes: dict[int, asyncio.subprocess.Process]) -> None:
+    delay = RESTART_DELAY
+    while not stopping.is_set():
+        started = time.monotonic()
+        # a session of its own, so a Ctrl-C in the terminal reaches the workers only through `stop`
+        process = processes[index] = await asyncio.create_subprocess_exec(*command, env=env, cwd=HERE, start_new_session=True)
+        log.info("Started worker", extra={"fields": {"worker": index, "pid": process.pid, "shards": env["SHARD_IDS"]}})
+        code = await process.wait()
+        if stopping.is_set():
+            break
+
+        if time.monotonic() - started >= HEALTHY_AFTER:
+            delay = RESTART_DELAY
+        log.warning("Worker exited, restarting", extra={"fields": {"worker": index, "code": code, "delay": delay}})
+        try:
+            await asyncio.wait_for(stopping.wait(), delay)
+        except TimeoutError:
+            pass
+        delay = min(delay * 2, MAX_RESTART_DELAY)
+
+
+def stop(stopping: asyncio.Event, processes: dict[int, asyncio.subprocess.Process]) -> None:
+    if stopping.is_set():
+        return
+    log.info("Stopping workers")
+    stopping.set()
+    for process in processes.values():
+        if process.returncode is None:
+            process.send_signal(signal.SIGINT)
+
+
+async def run(workers: int, shard_count: int, command: list[str]) -> None:
+    stopping = asyncio.Event()
+    processes: dict[int, asyncio.subprocess.Process] = {}
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop, stopping, processes)
+
+    await asyncio.gather(*(
+        supervise(index, command, worker_env(dict(os.environ), index, shard_ids, shard_count), stopping, processes)
+        for index, shard_ids in enumerate(split_shards(shard_count, workers))
+    ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "1")), help="number of worker processes")
+    parser.add_argument("--shards", type=int, help="total gateway shards (default: one per worker)")
+    parser.add_argument("--script", default=os.path.join(HERE, "main.py"), help="worker entry point")
+    args = parser.parse_args()
+
+    dotenv.load_dotenv()
+    shard_count = args.shards or args.workers
+    if args.workers > 1 and os.getenv("STORAGE_BACKEND") != "sqlite":
+        parser.error("several workers share the case store, so STORAGE_BACKEND has to be sqlite")
+    try:
+        split_shards(shard_count, args.workers)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    log_listener = setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+    try:
+        asyncio.run(run(args.workers, shard_count, [sys.executable, args.script]))
+    finally:
+        log_listener.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+import typing as t
+from dataclasses import dataclass, field
+
+from metrics import LLMCall, LLMMetrics, Registry
+
+log = logging.getLogger(__name__)
+
+# Lower runs first. Judge replies have someone waiting on them; summaries can always wait.
+PRIORITIES = {"reply": 0, "evidence": 1, "files": 1, "summary": 2}
+
+# Default limits on Gemini calls: requests and tokens per minute, and calls at once. 0 turns a limit off.
+REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 250_000
+MAX_CONCURRENT = 8
+
+# Tokens budgeted for a response on top of the prompt, settled against the real count afterwards.
+RESPONSE_TOKENS = 1024
+
+MAX_RETRIES = 3
+RETRY_BASE = 1.0
+RETRY_MAX = 30.0
+# HTTP statuses worth another attempt: rate limited, or the service is having trouble.
+RETRY_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Per-guild virtual finish times are pruned once this many guilds have been seen.
+FAIRNESS_PRUNE_AT = 1024
+
+
+def is_retryable(exc: BaseException) -> bool:
+    # google.genai's APIError carries the HTTP status as `code`
+    return getattr(exc, "code", None) in RETRY_CODES or isinstance(exc, ConnectionError)
+
+
+def backoff(attempt: int, base: float = RETRY_BASE, cap: float = RETRY_MAX) -> float:
+    """Full-jitter exponential backoff, so clients that failed together do not retry together."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Refills `per_minute` units evenly over a minute, holding at most a minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken; 0 if it can be taken now."""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        # a request bigger than the whole bucket only has to wait for a full one
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        if self.capacity:
+            self.level -= amount
+
+    def refund(self, amount: float) -> None:
+        # negative for calls that used more than they were charged; the debt delays the next ones
+        if self.capacity:
+            self.level = min(self.capacity, self.level + amount)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    finish: float  # virtual finish time in the guild fair queue
+    seq: int
+    purpose: str = field(compare=False)
+    guild_id: int | None = field(compare=False)
+    requests: int = field(compare=False)
+    tokens: int = field(compare=False)
+    enqueued: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class LLMScheduler:
+    """The single gate every Gemini call goes through.
+
+    Calls wait in one queue ordered by priority class (`PRIORITIES`, by purpose) and, within a
+    class, by start-time fair queueing across guilds: each guild's calls are tagged with a
+    virtual finish time that grows with the tokens it has asked for, divided by its weight, so
+    a busy guild is interleaved with quiet ones instead of running ahead of them.
+
+    The head of the queue starts once a concurrency slot is free and both token buckets, one
+    for requests and one for tokens, can pay for it. Token charges are estimates up front and
+    are settled against the usage Gemini reports. Failed calls that are worth retrying go back
+    through the queue after a jittered backoff.
+    """
+
+    def __init__(
+        self, metrics: LLMMetrics, registry: Registry, *,
+        max_concurrent: int = MAX_CONCURRENT, requests_per_minute: float = REQUESTS_PER_MINUTE, tokens_per_minute: float = TOKENS_PER_MINUTE,
+        max_retries: int = MAX_RETRIES, weights: dict[int, float] | None = None,
+    ):
+        self.metrics = metrics
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.weights = weights or {}
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self.queued: dict[str, int] = {purpose: 0 for purpose in PRIORITIES}
+        self.retries = 0
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._finish: dict[int | None, float] = {}  # guild_id -> virtual finish time of its last queued call
+        self._wakeup: asyncio.TimerHandle | None = None
+
+        self.wait_seconds = registry.histogram("judgebot_llm_wait_seconds", "Time Gemini calls waited in the scheduler queue, by purpose.", ("purpose",))
+        self.retried = registry.counter("judgebot_llm_retries_total", "Gemini calls retried after a transient failure, by purpose.", ("purpose",))
+        registry.gauge("judgebot_llm_queued", "Gemini calls waiting in the scheduler queue.", lambda: sum(self.queued.values()))
+
+    def stats(self) -> dict:
+        return {"queued": dict(self.queued), "in_flight": self.in_flight, "retries": self.retries, "guilds": len(self._finish)}
+
+    async def run[T](
+        self, purpose: str, guild_id: int | None, attempt: t.Callable[[LLMCall], t.Awaitable[T]], *,
+        tokens: int = 0, requests: int = 1, retry_if: t.Callable[[], bool] | None = None,
+    ) -> T:
+        """Runs `attempt(call)` once the scheduler lets it, retrying transient failures.
+
+        `tokens` is the estimated prompt size; calls that are not model requests, such as file
+        uploads, pass `requests=0` and are only queued, not rate limited. `retry_if` can veto a
+        retry, for instance once part of a streamed reply has been shown.
+        """
+        charge = tokens + RESPONSE_TOKENS if requests else tokens
+        for retry in itertools.count():
+            await self._acquire(purpose, guild_id, requests, charge)
+            call: LLMCall | None = None
+            try:
+                async with self.metrics.call(purpose) as call:
+                    return await attempt(call)
+            except Exception as exc:
+                if retry >= self.max_retries or not is_retryable(exc) or (retry_if is not None and not retry_if()):
+                    raise
+                delay = backoff(retry)
+                self.retries += 1
+                self.retried.inc(purpose=purpose)
+                log.warning("Gemini call failed, retrying", extra={"fields": {"purpose": purpose, "guild_id": guild_id, "retry": retry + 1, "delay": round(delay, 2), "error": repr(exc)}})
+            finally:
+                used = (call.prompt_tokens or 0) + (call.response_tokens or 0) if call is not None else 0
+                self._release(charge - used if used else 0)
+            await asyncio.sleep(delay)
+
+    async def _acquire(self, purpose: str, guild_id: int | None, requests: int, tokens: int) -> None:
+        # start-time fair queueing: a call starts where the guild's previous one finishes, or now if it is idle
+        start = max(self._virtual_time, self._finish.get(guild_id, 0.0))
+        finish = start + max(tokens, 1) / self.weights.get(guild_id, 1.0)
+        self._finish[guild_id] = finish
+        waiter = _Waiter(PRIORITIES.get(purpose, max(PRIORITIES.values())), finish, next(self._seq), purpose, guild_id, requests, tokens, time.monotonic(), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        self.queued[purpose] = self.queued.get(purpose, 0) + 1
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # granted just as the caller gave up; the call never runs, so hand the slot on and pay both buckets back
+                self._release(tokens, requests)
+            else:
+                waiter.future.cancel()
+                self.queued[purpose] -= 1
+                self._dispatch()
+            raise
+
+    def _release(self, refund: int, requests: int = 0) -> None:
+        self.in_flight -= 1
+        self.tokens.refund(refund)
+        self.requests.refund(requests)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        while self._queue and (not self.max_concurrent or self.in_flight < self.max_concurrent):
+            waiter = self._queue[0]
+            if waiter.future.done():
+                # cancelled while waiting
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            wait = max(self.requests.wait_time(waiter.requests, now), self.tokens.wait_time(waiter.tokens, now))
+            if wait > 0:
+                self._wakeup = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            self.requests.take(waiter.requests)
+            self.tokens.take(waiter.tokens)
+            self.in_flight += 1
+            self.queued[waiter.purpose] -= 1
+            self._virtual_time = max(self._virtual_time, waiter.finish - max(waiter.tokens, 1) / self.weights.get(waiter.guild_id, 1.0))
+            self.wait_seconds.observe(now - waiter.enqueued, purpose=waiter.purpose)
+            waiter.future.set_result(None)
+        if len(self._finish) > FAIRNESS_PRUNE_AT:
+            # guilds whose calls have all started are idle again, and start from the virtual time anyway
+            self._finish = {guild_id: finish for guild_id, finish in self._finish.items() if finish > self._virtual_time}
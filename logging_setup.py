@@ -0,0 +1,75 @@
+import json
+import logging
+import logging.handlers
+import queue
+import time
+from contextlib import contextmanager
+
+# Prompt bodies go to this logger at DEBUG; it stays quiet unless prompt logging is switched on.
+PROMPT_LOGGER = "judgebot.prompt"
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line.
+
+    Anything passed as `extra={"fields": {...}}` is merged into the object, so records can
+    carry ids and timings that are easy to filter and aggregate.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+def setup_logging(level: str = "INFO", log_prompts: bool = False) -> logging.handlers.QueueListener:
+    """Routes all logging through a queue so that callers on the event loop never wait on stdout.
+
+    Returns the listener that does the actual writing; stop it on shutdown to drain the queue.
+    """
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter())
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(records)]
+    root.setLevel(level.upper())
+    logging.getLogger(PROMPT_LOGGER).setLevel(logging.DEBUG if log_prompts else logging.WARNING)
+    return listener
+
+
+class StageTimer:
+    """Collects how long each stage of handling one request took."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def fields(self) -> dict:
+        return {
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+            "total_ms": round(self.total() * 1000, 1),
+        }
@@ -1,4 +1,6 @@
 import asyncio
+import logging
+import time
 import dotenv
 import strip_markdown
 dotenv.load_dotenv()
@@ -10,12 +12,42 @@ from discord.ext import commands
 
 from google.genai import Client as GoogleClient
 
-token = os.getenv("DISCORD_TOKEN")
-if token is None:
-    raise ValueError("DISCORD_TOKEN environment variable not set")
+from archive import ARCHIVE_AFTER, ARCHIVE_INTERVAL, ARCHIVE_PATH, CaseArchive
+from blobs import BLOB_QUOTA, BLOB_ROOT, BlobStore
+from case_index import CaseIndex
+from case_logs import RESIDENT_CASES
+from command_sync import COMMAND_FINGERPRINT_FILE, sync_if_changed
+from data_access import CaseJournal
+from db import initialize_database
+from models import JUDGE_SPEAKER, Case, CaseParticipant, CaseRole, CaseStatus, LogEntry
+from prompt_builder import TOKEN_BUDGET, PromptBuilder, estimate_tokens
+from search import SEARCH_PATH, CaseSearch
+from sharding import ShardOwnership, parse_shard_ids
+from streaming import StreamingReply
+from case_actor import CaseActors
+from summarizer import CaseSummarizer, CaseSummary, SummaryJobs
+from users import UserResolver
+from headers import CASE_DETAILS_START, CaseHeaders
+from evidence import EVIDENCE_CACHE_FILE, EvidenceCache, EvidencePipeline, EvidenceProgress
+from llm_scheduler import MAX_CONCURRENT, REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, LLMScheduler
+from logging_setup import PROMPT_LOGGER, StageTimer, setup_logging
+from metrics import LLMCall, LLMMetrics, Registry, cache_gauges, count_discord_requests, start_metrics_server
+
+log_listener = setup_logging(os.getenv("LOG_LEVEL", "INFO"), log_prompts=os.getenv("LOG_PROMPTS", "0") == "1")
+log = logging.getLogger("judgebot")
+# startup phases, from here until the first on_ready
+startup = StageTimer()
+prompt_log = logging.getLogger(PROMPT_LOGGER)
 
 google_client = GoogleClient(api_key=os.getenv("GOOGLE_API_KEY"))
 
+# always collected; only served over HTTP when METRICS_PORT is set
+metrics = Registry()
+llm_metrics = LLMMetrics(metrics)
+message_latency = metrics.histogram("judgebot_message_latency_seconds", "Time from a case message being posted until JudgeBot has finished handling it.")
+persistence_latency = metrics.histogram("judgebot_persistence_seconds", "Duration of each write to the case store.")
+discord_requests = metrics.counter("judgebot_discord_requests_total", "Discord REST requests by route.", ("route",))
+
 # COURT_CHANNEL_NAME = "court"
 
 SUMMARIZE = """
@@ -24,82 +56,69 @@ You must not omit any important details related to the case proceedings.
 """
 
 
-CASE_DETAILS_START = """
-## Case: {user.name} vs {accused_names}
-**Order!** A case has been filed by **{user.mention}** against **{accused}**.
-
-**Reason:** {reason}  
-**Case Type:** {case_type}  
-**Case Status:** {status}  
-
-Court is now in session. Accuser, please present your case.
-"""
-
-CASE_DETAILS = """
-## Case: {user.name} vs {accused_names}
-**Order!** A case has been filed by **{user.mention}** against **{accused}**.
-
-**Reason:** {reason}  
-**Case Type:** {case_type}  
-**Case Status:** {status}  
-
-**Summary of Proceedings So Far:**
-{summary}
-"""
-
-async def google_summarize_file(file: discord.Attachment) -> str:
-    with open(f"attachments/{file.filename}", "wb") as f:
-        await file.save(f)
-    
-    uploaded_file = await google_client.aio.files.upload(file=f"attachments/{file.filename}")
-
-    while uploaded_file.state == "PROCESSING":
-        await asyncio.sleep(5)
-        uploaded_file = await google_client.aio.files.get(name=f"attachments/{file.filename}")
-
-    response = await google_client.aio.models.generate_content(
-        model="gemini-2.5-flash-lite",
-        contents=["Summarize the contents of the following file:\n\n", 
-                 uploaded_file]
-    )
-    if response and response.text:
-        return response.text.strip()
-    return "Summary could not be generated."
-
-cases = {}
+# this process connects SHARD_IDS out of SHARD_COUNT gateway shards and handles only their guilds; see launcher.py
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+ownership = ShardOwnership(SHARD_COUNT, parse_shard_ids(os.getenv("SHARD_IDS"), SHARD_COUNT))
+
+# a JSON file is rewritten whole, so sharded workers each keep their own instead of overwriting one another's
+evidence_cache = EvidenceCache(ownership.worker_path(os.getenv("EVIDENCE_CACHE_PATH", EVIDENCE_CACHE_FILE)))
+# every Gemini call waits its turn here: replies first, guilds served fairly, within the provider's limits
+llm = LLMScheduler(
+    llm_metrics, metrics,
+    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT", MAX_CONCURRENT)),
+    requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", REQUESTS_PER_MINUTE)),
+    tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", TOKENS_PER_MINUTE)),
+)
+# downloaded evidence, stored once per content and kept while a case refers to it
+blobs = BlobStore(os.getenv("BLOB_ROOT", BLOB_ROOT), quota=int(os.getenv("BLOB_QUOTA", BLOB_QUOTA)))
+blobs.connect()
+evidence_pipeline = EvidencePipeline(google_client, evidence_cache, llm, blobs)
+
+cases: dict[int, Case] = {}
 courts: dict[int, int] = {} # guild_id -> court_channel_id
-
-def save_cases():
-    with open("cases.json", "w") as f:
-        import json
-        json.dump(cases, f, indent=4)
-
-    with open("courts.json", "w") as f:
-        import json
-        json.dump(courts, f, indent=4)
+case_index = CaseIndex()
+
+# "json" keeps cases.json/courts.json plus the append-only journal, "sqlite" stores everything in DATABASE_PATH
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+resident_cases = int(os.getenv("RESIDENT_CASES", RESIDENT_CASES))
+if STORAGE_BACKEND == "sqlite":
+    store = initialize_database(cases, courts, os.getenv("DATABASE_PATH", "court.db"), resident_cases=resident_cases, owns_guild=ownership.owns_guild)
+elif ownership.sharded:
+    # the journal assumes it is the only writer of cases.json
+    raise ValueError("Running a subset of the shards needs STORAGE_BACKEND=sqlite to share the case store.")
+else:
+    store = CaseJournal(cases, courts, flush_interval=float(os.getenv("SAVE_INTERVAL", "2")), resident_cases=resident_cases)
+store.on_write = persistence_latency.observe
+
+# full-text index for /search_cases, kept next to either backend
+search = CaseSearch()
+search.connect(os.getenv("SEARCH_DATABASE_PATH", SEARCH_PATH))
+
+# cases closed for longer than ARCHIVE_AFTER seconds leave the store for this compressed archive
+archive = CaseArchive()
+archive.connect(os.getenv("ARCHIVE_DATABASE_PATH", ARCHIVE_PATH))
+archive_after = float(os.getenv("ARCHIVE_AFTER", ARCHIVE_AFTER))
+
+async def save_cases():
+    await store.flush()
     
 def load_cases():
-    global cases, courts
-    try:
-        with open("cases.json", "r") as f:
-            import json
-            str_cases = json.load(f)
-            cases = {}
-            for key in str_cases:
-                cases[int(key)] = str_cases[key]
-                
-    except FileNotFoundError:
-        cases = {}
-
-    try:
-        with open("courts.json", "r") as f:
-            import json
-            str_courts = json.load(f)
-            courts = {}
-            for key in str_courts:
-                courts[int(key)] = str_courts[key]
-    except FileNotFoundError:
-        courts = {}
+    store.load()
+    case_index.rebuild(cases.values())
+
+async def find_case(case_id: int) -> Case | None:
+    # live cases first, then the archive for cases that were closed a while ago
+    case = cases.get(case_id)
+    if case is not None:
+        return case
+    return await archive.get(case_id)
+
+def record_guild(case: Case, guild_id: int) -> None:
+    # cases filed before the guild was stored learn it the next time their thread is seen
+    case.guild_id = guild_id
+    store.case_updated(case.case_id, guild_id=guild_id)
+    search.case_updated(case.case_id, guild_id=guild_id)
+    case_index.refresh(case)
 
 class CaseView(discord.ui.View):
     def __init__(self):
@@ -159,18 +178,23 @@ class AttachEvidenceModal(discord.ui.Modal, title="Attach Evidence to Case"):
             
             await interaction.response.send_message("Uploading and summarizing evidence. Please wait...", ephemeral=True)
 
-            # Process each uploaded file
-            for uploaded_file in self.evidence_document.component.values:
-                print(f"Processing uploaded file: {uploaded_file.filename}")
-                summary = await google_summarize_file(uploaded_file)
-                case['evidences'] = case.get('evidences', []) + [{
+            # all files go through download, upload and summarization at the same time
+            uploaded_files = self.evidence_document.component.values
+            progress = EvidenceProgress(interaction, uploaded_files)
+            results = await evidence_pipeline.summarize_all(uploaded_files, progress.update, interaction.channel.id, interaction.guild_id)
+            for uploaded_file, (digest, summary) in zip(uploaded_files, results):
+                evidence = {
                     "file_name": uploaded_file.filename,
                     "summary": summary,
                     "url": uploaded_file.url,
-                }]
+                }
+                if digest is not None:
+                    evidence["sha256"] = digest
+                case.evidences.append(evidence)
+                store.evidence_added(interaction.channel.id, evidence)
+                search.evidence_added(interaction.channel.id, evidence)
             
             cases[interaction.channel.id] = case
-            save_cases()
             await interaction.followup.send(ephemeral=True, view=EvidenceMediaGallery(
                 "Evidence attached to the case.",
                 self.evidence_document.component.values
@@ -214,23 +238,18 @@ class CloseCaseModal(discord.ui.Modal, title="Request Case Closure"):
                 return
             await interaction.response.defer(ephemeral=True)
             
-            case['status'] = "closed"
-            case['verdict'] = self.reason.value
+            case.status = CaseStatus.CLOSED
+            case.verdict = self.reason.value
+            case.closed_at = time.time()
             cases[interaction.channel.id] = case
+            store.case_updated(interaction.channel.id, status=case.status, verdict=case.verdict, closed_at=case.closed_at)
+            search.case_updated(interaction.channel.id, verdict=case.verdict)
+            case_index.refresh(case)
+            prompt_builder.forget(interaction.channel.id)
 
-            accused = [await interaction.client.fetch_user(user_id) for user_id in case['accused']]
-            accused_mentions = ', '.join(user.mention for user in accused)
-            accused_names = ', '.join(user.name for user in accused)
-            accuser = await interaction.client.fetch_user(case['accuser'])
-            og_msg = await interaction.channel.fetch_message(case['og_message_id'])
-            if not og_msg:
-                await interaction.followup.send("Original case message not found.", ephemeral=True)
-                return
-            if not case.get('summary'):
-                await og_msg.edit(content=CASE_DETAILS_START.format(user=accuser, accused=accused_mentions, reason=case['reason'], case_type=case['case_type'], status=case['status'], summary=case.get('summary', ''), accused_names=accused_names)[:1950], view=CaseView())
-            else:
-                await og_msg.edit(content=CASE_DETAILS.format(user=accuser, accused=accused_mentions, reason=case['reason'], case_type=case['case_type'], status=case['status'], summary=case.get('summary', ''), accused_names=accused_names)[:1950], view=CaseView())
-            save_cases()
+            # the header has to show the closure before the thread is locked
+            await case_headers.refresh(interaction.channel.id)
+            case_headers.forget(interaction.channel.id)
 
             await interaction.channel.edit(archived=True, locked=True)
             await interaction.followup.send("The case has been closed. Court is adjourned!", ephemeral=True)
@@ -244,11 +263,11 @@ class UpdateCaseModal(discord.ui.Modal, title="Update Case Details"):
         assert isinstance(self.accused.component, discord.ui.UserSelect)
 
         self.case_type.component.options = [
-            discord.SelectOption(label=original_option.label, description=original_option.description, emoji=original_option.emoji, default=(original_option.label == cases[case_id]['case_type']))
+            discord.SelectOption(label=original_option.label, description=original_option.description, emoji=original_option.emoji, default=(original_option.label == cases[case_id].case_type))
             for original_option in self.case_type.component.options
         ]
-        self.reason.default = cases[case_id]['reason']
-        self.accused.component.default_values = [discord.Object(id=user_id) for user_id in cases[case_id]['accused']]
+        self.reason.default = cases[case_id].reason
+        self.accused.component.default_values = [discord.Object(id=user_id) for user_id in cases[case_id].accused]
 
     case_type = discord.ui.Label(
         text="Case Type",
@@ -299,25 +318,14 @@ class UpdateCaseModal(discord.ui.Modal, title="Update Case Details"):
         accused_user_select = t.cast(discord.ui.UserSelect, self.accused.component)
         case_type = case_type.values[0]
         accused_user_ids = [user.id for user in accused_user_select.values]
-        case['case_type'] = case_type
-        case['reason'] = self.reason.value
-        case['accused'] = accused_user_ids
+        case.update(case_type=case_type, reason=self.reason.value, accused=accused_user_ids)
 
         cases[self.case_id] = case
+        store.case_updated(self.case_id, case_type=case.case_type, reason=case.reason, accused=case.accused)
+        search.case_updated(self.case_id, reason=case.reason)
+        case_index.refresh(case)
 
-        accused = [await interaction.client.fetch_user(user_id) for user_id in case['accused']]
-        accused_mentions = ', '.join(user.mention for user in accused)
-        accused_names = ', '.join(user.name for user in accused)
-        accuser = await interaction.client.fetch_user(case['accuser'])
-        og_msg = await interaction.channel.fetch_message(case['og_message_id'])
-        if not og_msg:
-            await interaction.response.send_message("Original case message not found.", ephemeral=True)
-            return
-        if not case.get('summary'):
-            await og_msg.edit(content=CASE_DETAILS_START.format(user=accuser, accused=accused_mentions, reason=case['reason'], case_type=case['case_type'], status=case['status'], summary=case.get('summary', ''), accused_names=accused_names)[:1950], view=CaseView())
-        else:
-            await og_msg.edit(content=CASE_DETAILS.format(user=accuser, accused=accused_mentions, reason=case['reason'], case_type=case['case_type'], status=case['status'], summary=case.get('summary', ''), accused_names=accused_names)[:1950], view=CaseView())
-        save_cases()
+        case_headers.request(self.case_id)
         await interaction.response.send_message("The case details have been updated.", ephemeral=True)
 
 class FileACaseModal(discord.ui.Modal, title="File a Case"):
@@ -389,11 +397,11 @@ class FileACaseModal(discord.ui.Modal, title="File a Case"):
                 await interaction.response.send_message("You must select a case thread for a counter-case.", ephemeral=True)
                 return
             counter_case_thread = counter_case_select.values[0]
-            if counter_case_thread.id not in cases:
+            original_case = await find_case(counter_case_thread.id)
+            if original_case is None:
                 await interaction.response.send_message("The selected case thread does not correspond to an active case.", ephemeral=True)
                 return
-            original_case = cases[counter_case_thread.id]
-            accused_user_ids = original_case["accused"]
+            accused_user_ids = original_case.accused
             if interaction.user.id not in accused_user_ids:
                 await interaction.response.send_message("You can only file a counter-case against a case you are accused in.", ephemeral=True)
                 return
@@ -412,18 +420,17 @@ class FileACaseModal(discord.ui.Modal, title="File a Case"):
                     accused_names=accused_names
                     )}", view=CaseView())
                 
-                cases[thread.id] = {
-                    "associated_case_ids": [case.id for case in associated_cases.values] if (associated_cases := t.cast(discord.ui.ChannelSelect, self.associated_cases.component)).values else [],
-                    "accuser": interaction.user.id,
-                    "accused": [user.id for user in self.accused.component.values],
-                    "reason": self.reason.value,
-                    "case_type": case_type,
-                    "status": "open",
-                    "logs": [],
-                    "og_message_id": og_msg.id,
-                    "verdict": None,
-                }
-                save_cases()
+                cases[thread.id] = Case(
+                    thread.id, case_type, CaseStatus.OPEN, self.reason.value,
+                    [CaseParticipant(interaction.user.id, CaseRole.PROSECUTOR)] + [CaseParticipant(user.id, CaseRole.DEFENSE) for user in self.accused.component.values],
+                    associated_case_ids=[case.id for case in associated_cases.values] if (associated_cases := t.cast(discord.ui.ChannelSelect, self.associated_cases.component)).values else [],
+                    og_message_id=og_msg.id,
+                    guild_id=interaction.guild.id,
+                )
+                case_headers.track(thread.id, og_msg)
+                store.case_filed(thread.id, cases[thread.id])
+                search.case_filed(thread.id, cases[thread.id])
+                case_index.refresh(cases[thread.id])
 
         else:
             await interaction.followup.send(f"The courtroom channel does not exist. Please create it to proceed with the case.", ephemeral=True)
@@ -440,11 +447,35 @@ class FileACaseView(discord.ui.View):
 
 async def timeout_callable[T](callable: t.Awaitable[T], /, *, timeout: float) -> T | None:
     try:
-        print("Starting timeout callable...")
         return await asyncio.wait_for(callable, timeout=timeout)
     except asyncio.TimeoutError:
         return None
 
+async def stream_judge_reply(judge_message: discord.Message, prompt: str, timer: StageTimer, timeout: float = 30.0) -> str | None:
+    streamer = StreamingReply(judge_message)
+    started = time.perf_counter()
+
+    async def stream(call: LLMCall) -> None:
+        async for chunk in await google_client.aio.models.generate_content_stream(
+            model="gemini-2.5-flash-lite",
+            contents=prompt,
+        ):
+            call.record(chunk)
+            if chunk.text:
+                await streamer.feed(chunk.text)
+
+    try:
+        # the timeout includes waiting for the scheduler; once text is showing a retry would repeat it
+        async with asyncio.timeout(timeout):
+            await llm.run("reply", judge_message.guild.id if judge_message.guild else None, stream, tokens=estimate_tokens(prompt), retry_if=lambda: not streamer.text)
+    except TimeoutError:
+        log.warning("Reply stream timed out, keeping what was received so far", extra={"fields": {"message_id": judge_message.id}})
+    reply = await streamer.finish() or None
+    # edits happen while the stream is running; split the wall time between the model and Discord
+    timer.add("llm", time.perf_counter() - started - streamer.edit_seconds)
+    timer.add("edit", streamer.edit_seconds)
+    return reply
+
 PROMPT = """
 You are JudgeBot, the presiding Judge of a fictional courtroom operating inside a Discord server.
 Your discord id: 1447672099358511127
@@ -554,7 +585,20 @@ You are JudgeBot.
 Your purpose is to maintain order, deliver dramatic justice, and run a stable, entertaining courtroom roleplay wherever you are deployed.
 """
 
-dbot = commands.Bot(command_prefix="!", intents=discord.Intents.all())
+# edit the deliberation message as the reply streams in instead of waiting for the whole response
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "1") != "0"
+
+# seconds a case thread waits after a message for others to join the same judge reply
+BATCH_WINDOW = float(os.getenv("BATCH_WINDOW", "1.5"))
+
+prompt_builder = PromptBuilder(PROMPT, token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", TOKEN_BUDGET)))
+# a transcript would keep an evicted case's logs alive
+store.log_cache.on_evict = prompt_builder.forget
+
+dbot = commands.AutoShardedBot(command_prefix="!", intents=discord.Intents.all(), shard_count=ownership.shard_count, shard_ids=sorted(ownership.shard_ids))
+count_discord_requests(dbot.http, discord_requests)
+user_resolver = UserResolver(dbot)
+case_headers = CaseHeaders(dbot, cases, user_resolver, CaseView)
 
 @dbot.tree.command(name="start", description="Start JudgeBot in this server")
 async def start(interaction: discord.Interaction):
@@ -569,7 +613,7 @@ async def start(interaction: discord.Interaction):
     if channel is not None and isinstance(channel, discord.TextChannel):
         await channel.send("Order! Order in this court! JudgeBot is now presiding over this courtroom. Let the proceedings begin!", view=FileACaseView())
         courts[interaction.guild_id] = (channel.id)
-        save_cases()
+        store.court_set(interaction.guild_id, channel.id)
 
 @dbot.tree.command(name="stop", description="Stop JudgeBot in this server")
 async def stop(interaction: discord.Interaction):
@@ -580,20 +624,131 @@ async def stop(interaction: discord.Interaction):
         await interaction.response.send_message("JudgeBot is not active in this server.", ephemeral=True)
         return
     del courts[interaction.guild_id]
-    save_cases()
+    store.court_removed(interaction.guild_id)
     await interaction.response.send_message("JudgeBot has been deactivated in this server. All courtroom proceedings are now closed.", ephemeral=True)
 
-@dbot.tree.command(name="list_cases", description="List all active cases")
+# results per page of /list_cases and /search_cases, and characters of a case summary per page of /case_details
+CASES_PER_PAGE = 10
+SEARCH_RESULTS_PER_PAGE = 5
+SUMMARY_PAGE_LENGTH = 1800
+
+class PagedView(discord.ui.View):
+    """An ephemeral message with Previous/Next buttons; subclasses say how many pages there are and render them."""
+
+    def __init__(self):
+        super().__init__(timeout=600)
+        self.page = 0
+
+    def page_count(self) -> int:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        raise NotImplementedError
+
+    def content(self) -> str:
+        self.page = max(0, min(self.page, self.page_count() - 1))
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count() - 1
+        return trim_to_limit(self.render(), 2000)
+
+    async def show(self, interaction: discord.Interaction):
+        await interaction.response.edit_message(content=self.content(), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await self.show(interaction)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self.show(interaction)
+
+class CaseListView(PagedView):
+    """/list_cases for one guild, filtered through `case_index`. Starts with the open cases."""
+
+    def __init__(self, guild_id: int, user_id: int):
+        super().__init__()
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.open_only = True
+        self.mine = False
+        self.case_type: str | None = None
+        self.case_ids: list[int] = []
+        self.query()
+
+    def query(self):
+        self.case_ids = case_index.query(
+            self.guild_id,
+            status=CaseStatus.OPEN if self.open_only else None,
+            case_type=self.case_type,
+            participant=self.user_id if self.mine else None,
+        )
+        self.open_only_button.style = discord.ButtonStyle.success if self.open_only else discord.ButtonStyle.secondary
+        self.mine_button.style = discord.ButtonStyle.success if self.mine else discord.ButtonStyle.secondary
+
+    def page_count(self) -> int:
+        return max(1, -(-len(self.case_ids) // CASES_PER_PAGE))
+
+    def content(self) -> str:
+        # cases archived since the list was queried are no longer in memory; drop them before paging
+        self.case_ids = [case_id for case_id in self.case_ids if case_id in cases]
+        return super().content()
+
+    def render(self) -> str:
+        filters = ", ".join(name for name, on in (("open only", self.open_only), ("my cases", self.mine), (self.case_type, self.case_type is not None)) if on) or "all cases"
+        if not self.case_ids:
+            return f"No cases found ({filters})."
+        lines = [f"Cases ({filters}), page {self.page + 1}/{self.page_count()}, {len(self.case_ids)} in total:"]
+        for case_id in self.case_ids[self.page * CASES_PER_PAGE:(self.page + 1) * CASES_PER_PAGE]:
+            case = cases[case_id]
+            lines.append(f"<#{case_id}>, Accuser: <@{case.accuser}>, Accused: {', '.join(f'<@{user_id}>' for user_id in case.accused)}, Type: {case.case_type}, Status: {case.status}")
+        return "\n".join(lines)
+
+    @discord.ui.button(label="Open only", row=1)
+    async def open_only_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.open_only = not self.open_only
+        self.query()
+        await self.show(interaction)
+
+    @discord.ui.button(label="My cases", row=1)
+    async def mine_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.mine = not self.mine
+        self.query()
+        await self.show(interaction)
+
+    @discord.ui.select(placeholder="Any case type", row=2, options=[
+        discord.SelectOption(label="Any case type", value="any"),
+        discord.SelectOption(label="Civil", emoji="⚖️"),
+        discord.SelectOption(label="Criminal", emoji="🚨"),
+        discord.SelectOption(label="Community", emoji="👥"),
+        discord.SelectOption(label="Counter-case", emoji="🔄"),
+        discord.SelectOption(label="Other", emoji="❓"),
+    ])
+    async def case_type_select(self, interaction: discord.Interaction, select: discord.ui.Select):
+        self.case_type = select.values[0] if select.values[0] != "any" else None
+        self.query()
+        await self.show(interaction)
+
+class TextPagesView(PagedView):
+    def __init__(self, pages: list[str]):
+        super().__init__()
+        self.pages = pages
+
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    def render(self) -> str:
+        return self.pages[self.page]
+
+@dbot.tree.command(name="list_cases", description="List the cases in this server")
 async def list_cases(interaction: discord.Interaction):
-    if not cases:
-        await interaction.response.send_message("There are no active cases at the moment.", ephemeral=True)
+    if not interaction.guild_id:
+        await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
         return
 
-    case_list = "\n".join(
-        f"Case ID: <#{case_id}>, Accuser: <@{case_info['accuser']}>, Accused: {', '.join(f'<@{user_id}>' for user_id in case_info['accused'])}, Status: {case_info['status']}"
-        for case_id, case_info in cases.items()
-    )
-    await interaction.response.send_message(f"Active Cases:\n{case_list}", ephemeral=True)
+    view = CaseListView(interaction.guild_id, interaction.user.id)
+    await interaction.response.send_message(view.content(), view=view, ephemeral=True)
 
 @dbot.tree.command(name="case_details", description="Get details of a specific case by thread ID")
 @discord.app_commands.describe(thread="Attach the thread corresponding to the case")
@@ -604,62 +759,82 @@ async def case_details(interaction: discord.Interaction, thread: discord.Thread)
         await interaction.response.send_message("Invalid thread ID format. Please provide a numeric thread ID.", ephemeral=True)
         return
 
-    case = cases.get(thread_id_int)
+    case = await find_case(thread_id_int)
     if not case:
         await interaction.response.send_message(f"No case found with thread ID: {thread}", ephemeral=True)
         return
 
-    accused_mentions = ', '.join(f'<@{user_id}>' for user_id in case['accused'])
-    case_info = (
+    accused_mentions = ', '.join(f'<@{user_id}>' for user_id in case.accused)
+    case_info = "\n".join((
         f"Case Details for Case: <#{thread_id_int}>",
-        f"Accuser: <@{case['accuser']}>",
+        f"Accuser: <@{case.accuser}>",
         f"Accused: {accused_mentions}",
-        f"Reason: {case['reason']}",
-        f"Case Type: {case['case_type']}",
-        f"Status: {case['status']}",
-        f"Summary: {case['summary'][:1800]}{"..." if len(case['summary']) > 1800 else ""}" if 'summary' in case else "No summary available",
-        
-    )
-    await interaction.response.send_message("\n".join(case_info), ephemeral=True)
+        f"Reason: {case.reason}",
+        f"Case Type: {case.case_type}",
+        f"Status: {case.status}",
+    ))
+    if not case.summary:
+        await interaction.response.send_message(f"{case_info}\nNo summary available", ephemeral=True)
+        return
+
+    summary = [case.summary[start:start + SUMMARY_PAGE_LENGTH] for start in range(0, len(case.summary), SUMMARY_PAGE_LENGTH)]
+    pages = [f"{case_info}\nSummary: {summary[0]}"] + [f"Summary (continued):\n{part}" for part in summary[1:]]
+    if len(pages) == 1:
+        await interaction.response.send_message(trim_to_limit(pages[0], 2000), ephemeral=True)
+        return
+    view = TextPagesView(pages)
+    await interaction.response.send_message(view.content(), view=view, ephemeral=True)
+
+@dbot.tree.command(name="search_cases", description="Search this server's cases by what was said in them")
+@discord.app_commands.describe(query="Words to look for in transcripts, reasons, summaries, verdicts and evidence")
+async def search_cases(interaction: discord.Interaction, query: str):
+    if not interaction.guild_id:
+        await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    hits = await search.search(interaction.guild_id, query)
+    # archived cases are closed by definition, so only their type has to be looked up
+    labels = {hit.case_id: f"{cases[hit.case_id].case_type}, {cases[hit.case_id].status}" for hit in hits if hit.case_id in cases}
+    archived = await archive.case_types([hit.case_id for hit in hits if hit.case_id not in labels])
+    labels.update((case_id, f"{case_type}, {CaseStatus.CLOSED}") for case_id, case_type in archived.items())
+    hits = [hit for hit in hits if hit.case_id in labels]
+    if not hits:
+        await interaction.followup.send(f"No cases found for: {trim_to_limit(query, 100)}", ephemeral=True)
+        return
+
+    lines = [
+        f"<#{hit.case_id}> ({labels[hit.case_id]}): {trim_to_limit(' '.join(hit.snippet.split()), 300)}"
+        for hit in hits
+    ]
+    pages = [
+        f"Cases matching \"{trim_to_limit(query, 100)}\", best match first:\n" + "\n".join(lines[start:start + SEARCH_RESULTS_PER_PAGE])
+        for start in range(0, len(lines), SEARCH_RESULTS_PER_PAGE)
+    ]
+    if len(pages) == 1:
+        await interaction.followup.send(pages[0], ephemeral=True)
+        return
+    view = TextPagesView(pages)
+    await interaction.followup.send(view.content(), view=view, ephemeral=True)
 
 @dbot.tree.context_menu(name="Summarize")
 @discord.app_commands.describe(message="The message to summarize the case from")
 async def summarize_case(interaction: discord.Interaction, message: discord.Message):
     await interaction.response.defer(ephemeral=True)
     if not message.channel or not isinstance(message.channel, discord.Thread):
-        print("Summarize command used outside of a thread")
         await interaction.followup.send("This command can only be used in case threads.", ephemeral=True)
         return
     
 
     case = cases.get(message.channel.id)
     if not case:
-        print("No case found for this thread")
         await interaction.followup.send("No case found for this thread.", ephemeral=True)
         return
 
-    logs: list = case.get('logs', [])
-    conversation = "\n".join(f"{log['speaker']}: {log['message']}" for log in logs[-24:])
-
-    response = await google_client.aio.models.generate_content(
-        model="gemini-2.5-flash-lite",
-        contents=SUMMARIZE + f"\n\nLast 24 logs of Conversation:\n{conversation}\n\nCurrent Summary:\n{case.get('summary', 'No summary available')}\n\nUpdated Summary:",
-    )
-    if response and response.text:
-        case['summary'] = response.text.strip()
-        cases[message.channel.id] = case
-        save_cases()
-
-        await interaction.followup.send(f"Updated Summary:\n{case['summary']}", ephemeral=True)
-
-        accused = [await interaction.client.fetch_user(user_id) for user_id in case['accused']]
-        accused_mentions = ', '.join(user.mention for user in accused)
-        accused_names = ', '.join(user.name for user in accused)
-        accuser = await interaction.client.fetch_user(case['accuser'])
-
-
-        og_msg = await message.channel.fetch_message(case['og_message_id'])
-        await og_msg.edit(content=CASE_DETAILS.format(user=accuser, accused=accused_mentions, reason=case['reason'], case_type=case['case_type'], status=case['status'], summary=case['summary'], accused_names=accused_names)[:1950], view=CaseView())
+    # shares the background job, so this never races a summary that on_message already started
+    summary = await asyncio.shield(summary_jobs.request(message.channel.id))
+    if summary:
+        await interaction.followup.send(f"Updated Summary:\n{summary.text}", ephemeral=True)
     else:
         await interaction.followup.send("Summary could not be generated.", ephemeral=True)
 
@@ -679,142 +854,283 @@ def trim_to_limit(text: str, limit: int) -> str:
         return text
     return text[:limit-3] + "..."
 
+async def archive_closed_cases() -> int:
+    """Moves cases closed for longer than `archive_after` to the archive and returns how many moved."""
+    now = time.time()
+    moved = 0
+    for case in list(cases.values()):
+        if not case.closed or not ownership.owns_case(case):
+            continue
+        if case.closed_at is None:
+            # closed before closing times were recorded; start counting from now
+            case.closed_at = now
+            store.case_updated(case.case_id, closed_at=case.closed_at)
+            continue
+        if case.closed_at > now - archive_after:
+            continue
+        # the archived copy is on disk before the case leaves the store, so a crash in between only archives it twice
+        await archive.put(await store.log_cache.snapshot(case))
+        if cases.get(case.case_id) is not case or not case.closed:
+            # reopened while it was being written; lookups prefer the live case over the stale archived copy
+            continue
+        store.case_removed(case.case_id)
+        del cases[case.case_id]
+        case_index.remove(case.case_id)
+        prompt_builder.forget(case.case_id)
+        case_headers.forget(case.case_id)
+        # its evidence files stay on disk until the quota needs the space
+        await blobs.release_case(case.case_id)
+        moved += 1
+    if moved:
+        log.info("Archived closed cases", extra={"fields": {"cases": moved}})
+    return moved
+
+async def archive_periodically() -> None:
+    while True:
+        try:
+            await archive_closed_cases()
+        except Exception:
+            log.exception("Archiving closed cases failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+search_backfill: asyncio.Task | None = None
+archiver: asyncio.Task | None = None
+# set once setup is done and the gateway is connecting, cleared by the first on_ready
+gateway_connecting: float | None = None
+
 @dbot.event
 async def on_ready():
-    load_cases()
-    print("Cases loaded.")
-    print("Syncing commands...")
-    sync = await dbot.tree.sync()
-    print(f'Synced {len(sync)} command(s)')
-    print(f'Logged in as {dbot.user}')
-    dbot.add_view(FileACaseView())
-    dbot.add_view(CaseView())
+    # fires again after every reconnect; everything that has to happen once is in setup_hook
+    global gateway_connecting
+    if gateway_connecting is None:
+        log.info("Gateway ready after reconnecting")
+        return
+    startup.add("gateway", time.perf_counter() - gateway_connecting)
+    gateway_connecting = None
+    # needs the gateway's channel cache, so it can't run in setup_hook
+    with startup.stage("guild_backfill"):
+        for case in cases.values():
+            if case.guild_id is None and isinstance(thread := dbot.get_channel(case.case_id), discord.Thread):
+                record_guild(case, thread.guild.id)
+    log.info(f"Logged in as {dbot.user}", extra={"fields": {"cases": len(cases), "courts": len(courts), **startup.fields()}})
 
 @dbot.event
 async def on_disconnect():
-    save_cases()
+    await save_cases()
 
-@dbot.event
-async def on_message(message: discord.Message):
-    if message.author == dbot.user:
+async def generate_summary_text(guild_id: int | None, contents: str) -> str | None:
+    async def summarize(call: LLMCall):
+        response = await google_client.aio.models.generate_content(
+            model="gemini-2.5-flash-lite",
+            contents=contents,
+        )
+        call.record(response)
+        return response
+
+    response = await llm.run("summary", guild_id, summarize, tokens=estimate_tokens(contents))
+    if response and response.text:
+        return response.text.strip()
+    return None
+
+def save_summary_checkpoint(case_id: int, checkpoint: dict):
+    case = cases.get(case_id)
+    if not case:
         return
-    
-    print(f"Received message in channel {message.channel}: {message.channel.id} by {message.author.name}: {message.content}")
-    print(f"Current cases: {cases.keys()}")
+    case.summary_checkpoint = checkpoint
+    store.case_updated(case_id, summary_checkpoint=checkpoint)
 
-    if message.channel and isinstance(message.channel, discord.Thread) and message.channel.id in cases:
-        case: dict = cases[message.channel.id]
+async def generate_case_summary(case_id: int) -> CaseSummary | None:
+    case = cases.get(case_id)
+    if not case:
+        return None
+    started = time.perf_counter()
+    summarizer = CaseSummarizer(lambda contents: generate_summary_text(case.guild_id, contents), SUMMARIZE, on_checkpoint=save_summary_checkpoint)
+    result = await summarizer.summarize(case)
+    log.info("Generated case summary", extra={"fields": {
+        "case_id": case_id, "log_entries": result.checkpoint["summarized"] if result is not None else None, "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "ok": result is not None, "memoized": result is not None and not result.changed,
+    }})
+    return result
+
+async def apply_case_summary(case_id: int, summary: CaseSummary):
+    case = cases.get(case_id)
+    if not case or not summary.changed:
+        return
+    case.summary = summary.text
+    case.summary_checkpoint = summary.checkpoint
+    store.case_updated(case_id, summary=summary.text, summary_checkpoint=summary.checkpoint)
+    search.case_updated(case_id, summary=summary.text)
 
-        print(f"Processing message in case thread {message.channel.id} by {message.author.name}: {message.content}")
-        if case['status'] == "closed":
-            return
-        
-        logs: list = case.get('logs', [])
-        
-        async def summarize_logs(logs: list, cur_summary: str) -> str:
-            if len(logs) % 6 >= 1:
-                return cur_summary
-            print("Summarizing logs...", len(logs))
-            conversation = "\n".join(f"{log['speaker']}: {log['message']}" for log in logs[-24:])
-            print("Generating summary with Google Gemini...")
-            response = await google_client.aio.models.generate_content(
-                model="gemini-2.5-flash-lite",
-                contents=SUMMARIZE + f"\n\nLast 24 logs of Conversation:\n{conversation}\n\nCurrent Summary:\n{cur_summary if cur_summary else "Use the conversation to generate a new summary instead."}\n\nUpdated Summary:",
-            )
-            print("Summary generation complete.")
-            if response and response.text:
-                print("Updating case summary...")
-                case_og_msg = await message.channel.fetch_message(case['og_message_id'])
-                
-                accused = [await dbot.fetch_user(user_id) for user_id in case['accused']]
-                accused_mentions = ', '.join(user.mention for user in accused)
-                accused_names = ', '.join(user.name for user in accused)
+    # whoever closes a case refreshes its header before locking the thread; edits after that would fail
+    if case.closed:
+        return
+    case_headers.request(case_id)
 
+summary_jobs = SummaryJobs(generate_case_summary, apply_case_summary)
 
-                await case_og_msg.edit(content=trim_to_limit(CASE_DETAILS.format(user=message.author, accused=accused_mentions, reason=case['reason'], case_type=case['case_type'], status=case['status'], summary=response.text.strip(), accused_names=accused_names), 1950), view=CaseView())
-                print("Case summary updated.")
-                return response.text.strip()
-            
-            return "Summary could not be generated."
-        
-        # run the summary process in parallel
-        
+async def judge_messages(case_id: int, messages: list[discord.Message]):
+    case = cases.get(case_id)
+    if not case or case.closed:
+        return
 
-        prompt = PROMPT + f"\n\nCase Details:\nAccuser: <@{case['accuser']}>\nAccused: {', '.join(f'<@{user_id}>' for user_id in case['accused'])}\nReason: {case['reason']}\n\n"
-        prompt += "Evidence Summaries:\n"
-        for evidence in case.get('evidences', []):
-            prompt += f"{evidence.get('file_name', 'Unknown file')} - Summary: {evidence.get('summary', 'No summary available.')}\n"
-        prompt += "Dialogue:\n"
-        for log in case['logs']:
-            prompt += f"{log['speaker']}: {log['message']}\n"
-        prompt += f"{message.author.name}: {message.content}\nJudgeBot:"
-        print(prompt)
-        print("Generating response...")
+    timer = StageTimer()
+    # time the first message of the batch spent in the actor's queue and batching window
+    timer.add("queued", (discord.utils.utcnow() - messages[0].created_at).total_seconds())
+    outcome = "error"
+    try:
+        outcome = await judge_case(case_id, case, messages, timer)
+    finally:
+        log.info("Judged case messages", extra={"fields": {"case_id": case_id, "messages": len(messages), "outcome": outcome, **timer.fields()}})
+        finished = discord.utils.utcnow()
+        for batched in messages:
+            message_latency.observe((finished - batched.created_at).total_seconds())
+
+async def judge_case(case_id: int, case: Case, messages: list[discord.Message], timer: StageTimer) -> str:
+    message = messages[-1]
+    assert isinstance(message.channel, discord.Thread)
+    log.debug("Processing case messages", extra={"fields": {"case_id": case_id, "messages": len(messages), "author": message.author.name}})
+
+    logs = await case.load_logs()
+
+    with timer.stage("prompt_build"):
+        built_prompt = prompt_builder.build(message.channel.id, case, "\n".join(f"{batched.author.name}: {batched.content}" for batched in messages))
+        prompt = built_prompt.text
+    prompt_log.debug(prompt, extra={"fields": {"case_id": case_id}})
+    log.debug("Built prompt", extra={"fields": {"case_id": case_id, "tokens": built_prompt.usage, "turns": built_prompt.turns, "log_entries": len(logs)}})
+
+    with timer.stage("placeholder_send"):
         judge_message = await message.channel.send("Order! The court is deliberating... Please hold.", reference=message)
-        async with message.channel.typing():
-            print("Sending prompt to Google Gemini...")
-            response = await timeout_callable(google_client.aio.models.generate_content(
-                model="gemini-2.5-flash-lite",
-                contents=prompt,
-            ), timeout=30.0)
-            print("Response generation complete.")
-            if not response or not response.text:
+    async with message.channel.typing():
+        if STREAM_REPLIES:
+            reply = await stream_judge_reply(judge_message, prompt, timer)
+        else:
+            async def generate(call: LLMCall):
+                response = await google_client.aio.models.generate_content(
+                    model="gemini-2.5-flash-lite",
+                    contents=prompt,
+                )
+                call.record(response)
+                return response
+
+            with timer.stage("llm"):
+                response = await timeout_callable(llm.run("reply", case.guild_id, generate, tokens=estimate_tokens(prompt)), timeout=30.0)
+            reply = response.text if response and response.text else None
+            if reply:
+                with timer.stage("edit"):
+                    await judge_message.edit(content=trim_to_limit(reply.strip(), 1950), allowed_mentions=discord.AllowedMentions.all())
+        if not reply:
+            with timer.stage("edit"):
                 await judge_message.edit(content="Order! There seems to be a disruption in the court's communication system. Please try again later.")
-                return
-
-            print("Response received.")
-            reply = response.text.strip()
-            await judge_message.edit(content=trim_to_limit(reply, 1950), allowed_mentions=discord.AllowedMentions.all())
-        
-
-        if "court is adjourned" in reply.lower() or "case is closed" in reply.lower():
-            case['status'] = "closed"
-            case_og_msg = await message.channel.fetch_message(case['og_message_id'])
-            
-            accused = [await dbot.fetch_user(user_id) for user_id in case['accused']]
-            accused_mentions = ', '.join(user.mention for user in accused)
-            accused_names = ', '.join(user.name for user in accused)
-
-            # find the verdict line in the reply
-            result_lines = strip_markdown.strip_markdown(reply).splitlines()
-            print("Extracting verdict from response...", result_lines)
-            for line in result_lines:
-                if line.lower().startswith("verdict:"): 
-                    case['verdict'] = line[len("verdict:"):].strip()
-                    break
-            case['summary'] = await summarize_logs(logs, case.get('summary', ''))
-            print("Verdict extracted:", case.get('verdict'))
-            accuser = await dbot.fetch_user(case['accuser'])
-            await case_og_msg.edit(content=trim_to_limit(CASE_DETAILS.format(user=accuser, accused=accused_mentions, reason=case['reason'], case_type=case['case_type'], status=case['status'], summary=case['summary'], accused_names=accused_names) + "\n\n## VERDICT:\n" + (case['verdict'] if case.get('verdict') else ""), 1950), view=CaseView())
+            return "no_reply"
+
+        reply = reply.strip()
+
+    new_logs = [
+        LogEntry(batched.id, batched.reference.message_id if batched.reference else None, batched.author.name, batched.content)
+        for batched in messages
+    ] + [
+        LogEntry(judge_message.id, judge_message.reference.message_id if judge_message.reference else None, JUDGE_SPEAKER, reply)
+    ]
+    # read the logs again: they may have been evicted while the reply was generated
+    logs = await case.load_logs()
+    previous_length = len(logs)
+    logs.extend(new_logs)
+
+    cases[message.channel.id] = case
+
+    with timer.stage("persistence"):
+        store.logs_appended(message.channel.id, new_logs)
+        search.logs_appended(message.channel.id, new_logs)
+
+    if "court is adjourned" in reply.lower() or "case is closed" in reply.lower():
+        case.status = CaseStatus.CLOSED
+        case.closed_at = time.time()
+
+        # find the verdict line in the reply
+        result_lines = strip_markdown.strip_markdown(reply).splitlines()
+        for line in result_lines:
+            if line.lower().startswith("verdict:"): 
+                case.verdict = line[len("verdict:"):].strip()
+                break
+        log.info("Case closed by verdict", extra={"fields": {"case_id": case_id, "verdict": case.verdict}})
+        with timer.stage("persistence"):
+            store.case_updated(message.channel.id, status=case.status, verdict=case.verdict, closed_at=case.closed_at)
+            search.case_updated(message.channel.id, verdict=case.verdict)
+        case_index.refresh(case)
+
+        # the reply is already out; wait for a final summary only so the header is complete before the thread is locked
+        with timer.stage("summarization"):
+            await asyncio.shield(summary_jobs.request(message.channel.id))
+        with timer.stage("edit"):
+            await case_headers.refresh(message.channel.id)
+            case_headers.forget(message.channel.id)
             await message.channel.edit(archived=True, locked=True)
-            print("Case closed.")
+        prompt_builder.forget(message.channel.id)
+        return "closed"
 
-        logs.append({
-            "message_id": message.id,
-            "message_reference_id": message.reference.message_id if message.reference else None,
-            "speaker": message.author.name,
-            "message": message.content
-        })
+    # summarize each time the log crosses another multiple of six entries, without holding up the thread
+    if len(logs) // 6 != previous_length // 6:
+        summary_jobs.request(message.channel.id)
+        return "replied_summary_scheduled"
+    return "replied"
 
-        logs.append({
-            "message_id": judge_message.id,
-            "message_reference_id": judge_message.reference.message_id if judge_message.reference else None,
-            "speaker": "JudgeBot",
-            "message": reply
-        })
+case_actors = CaseActors(judge_messages, batch_window=BATCH_WINDOW)
 
-        summary_task = await summarize_logs(logs, case.get('summary', ''))
-        case['summary'] = summary_task
-        print("Summary updated.")
+metrics.gauge("judgebot_open_cases", "Cases that are not closed.", lambda: sum(not case.closed for case in cases.values()))
+metrics.gauge("judgebot_log_entries", "Case log entries held in memory.", store.log_cache.entries)
+metrics.gauge("judgebot_resident_cases", "Cases whose logs are held in memory.", lambda: store.log_cache.stats()["resident"])
+metrics.gauge("judgebot_queued_messages", "Case messages waiting for their thread's actor.", case_actors.queued)
+cache_gauges(metrics, "evidence", "evidence summary", evidence_cache.stats)
+metrics.gauge("judgebot_evidence_blob_bytes", "Bytes of evidence files kept on disk.", lambda: blobs.bytes)
+metrics.gauge("judgebot_summary_jobs", "Case summaries being generated in the background.", summary_jobs.in_flight)
 
+@dbot.event
+async def setup_hook():
+    # runs once on the bot's own loop after login and before the gateway connects, unlike on_ready
+    global search_backfill, archiver, gateway_connecting
+    with startup.stage("load_cases"):
+        load_cases()
+    with startup.stage("evidence_cache"):
+        evidence_cache.load()
+    store.start()
+    search_backfill = asyncio.create_task(search.backfill(list(cases.values()), store.log_cache))
+    archiver = asyncio.create_task(archive_periodically())
+    dbot.add_view(FileACaseView())
+    dbot.add_view(CaseView())
+    if 0 in ownership.shard_ids:
+        # commands are global, so one worker syncs them for all
+        with startup.stage("command_sync"):
+            await sync_if_changed(dbot.tree, dbot.application_id, os.getenv("COMMAND_FINGERPRINT_PATH", COMMAND_FINGERPRINT_FILE))
+    if port := os.getenv("METRICS_PORT"):
+        await start_metrics_server(metrics, os.getenv("METRICS_HOST", "127.0.0.1"), int(port))
+    log.info("Setup finished", extra={"fields": {"shards": sorted(ownership.shard_ids), "cases": len(cases), "courts": len(courts), **startup.fields()}})
+    gateway_connecting = time.perf_counter()
 
+@dbot.event
+async def on_message(message: discord.Message):
+    if message.author == dbot.user:
+        return
+    
+    log.debug("Received message", extra={"fields": {"channel_id": message.channel.id, "author": message.author.name}})
 
-        case['logs'] = logs
-
-        cases[message.channel.id] = case
-
-        save_cases()
+    if message.channel and isinstance(message.channel, discord.Thread) and message.channel.id in cases:
+        if cases[message.channel.id].guild_id is None:
+            record_guild(cases[message.channel.id], message.channel.guild.id)
+        if not cases[message.channel.id].closed:
+            # the thread's actor answers this together with anything else posted in the same burst
+            case_actors.submit(message.channel.id, message)
 
     await dbot.process_commands(message)
 
-dbot.run(token)
\ No newline at end of file
+if __name__ == "__main__":
+    token = os.getenv("DISCORD_TOKEN")
+    if token is None:
+        raise ValueError("DISCORD_TOKEN environment variable not set")
+
+    dbot.run(token, log_handler=None)
+    # force out anything the background writer has not flushed yet
+    store.close()
+    search.close()
+    archive.close()
+    blobs.close()
+    log_listener.stop()
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import threading
+import time
+import typing as t
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is always added.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self.values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count); the last bucket is +Inf
+        self.values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, totals = self.values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = [(key, list(counts), list(totals)) for key, (counts, totals) in self.values.items()]
+        for key, counts, (total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket = _labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_number(count)}")
+        return lines
+
+
+class Gauge:
+    """A value read from `read()` whenever the metrics are scraped."""
+
+    def __init__(self, name: str, help: str, read: t.Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_number(self.read())}"]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Counter | Histogram | Gauge] = []
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        counter = Counter(name, help, labelnames)
+        self.metrics.append(counter)
+        return counter
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        histogram = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    def gauge(self, name: str, help: str, read: t.Callable[[], float]) -> Gauge:
+        gauge = Gauge(name, help, read)
+        self.metrics.append(gauge)
+        return gauge
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                log.exception("Failed to render metric", extra={"fields": {"metric": metric.name}})
+        return "\n".join(lines) + "\n"
+
+
+class LLMCall:
+    """Token usage of one Gemini call, filled in from the response (or the last streamed chunk)."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+
+    def record(self, response) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        # streamed chunks carry running totals, so the latest one wins
+        self.prompt_tokens = usage.prompt_token_count or self.prompt_tokens
+        self.response_tokens = usage.candidates_token_count or self.response_tokens
+
+
+class LLMMetrics:
+    """Counts, times and tallies the tokens of Gemini calls by purpose (reply, summary, evidence)."""
+
+    def __init__(self, registry: Registry):
+        self.requests = registry.counter("judgebot_llm_requests_total", "Gemini calls by purpose and result.", ("purpose", "result"))
+        self.tokens = registry.counter("judgebot_llm_tokens_total", "Gemini tokens by purpose and kind (prompt or response).", ("purpose", "kind"))
+        self.latency = registry.histogram("judgebot_llm_latency_seconds", "Duration of Gemini calls by purpose.", ("purpose",))
+        self.in_flight = 0
+        registry.gauge("judgebot_llm_in_flight", "Gemini calls currently waiting on a response.", lambda: self.in_flight)
+
+    @asynccontextmanager
+    async def call(self, purpose: str) -> t.AsyncIterator[LLMCall]:
+        call = LLMCall()
+        self.in_flight += 1
+        started = time.perf_counter()
+        result = "error"
+        try:
+            yield call
+            result = "ok"
+        except TimeoutError:
+            result = "timeout"
+            raise
+        except asyncio.CancelledError:
+            # also how an enclosing asyncio.timeout() ends the call
+            result = "cancelled"
+            raise
+        finally:
+            self.in_flight -= 1
+            self.latency.observe(time.perf_counter() - started, purpose=purpose)
+            self.requests.inc(purpose=purpose, result=result)
+            if call.prompt_tokens:
+                self.tokens.inc(call.prompt_tokens, purpose=purpose, kind="prompt")
+            if call.response_tokens:
+                self.tokens.inc(call.response_tokens, purpose=purpose, kind="response")
+
+
+def cache_gauges(registry: Registry, name: str, what: str, stats: t.Callable[[], dict[str, float]]) -> None:
+    """Exports a cache's `stats()`, with `entries`, `hits`, `misses` and `hit_rate`, as judgebot_<name>_cache_* gauges."""
+    registry.gauge(f"judgebot_{name}_cache_entries", f"Entries in the {what} cache.", lambda: stats()["entries"])
+    registry.gauge(f"judgebot_{name}_cache_hits", f"Lookups answered by the {what} cache since startup.", lambda: stats()["hits"])
+    registry.gauge(f"judgebot_{name}_cache_misses", f"Lookups the {what} cache could not answer since startup.", lambda: stats()["misses"])
+    registry.gauge(f"judgebot_{name}_cache_hit_rate", f"Share of {what} cache lookups that were hits since startup.", lambda: stats()["hit_rate"])
+
+
+def count_discord_requests(http, counter: Counter) -> None:
+    """Wraps the bot's REST client so that every request is counted by method and route template."""
+    request = http.request
+
+    async def counted_request(route, **kwargs):
+        counter.inc(route=f"{route.method} {getattr(route, 'path', '')}")
+        return await request(route, **kwargs)
+
+    http.request = counted_request
+
+
+async def start_metrics_server(registry: Registry, host: str, port: int) -> web.AppRunner:
+    """Serves `registry` at http://host:port/metrics from the running event loop."""
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("Serving metrics", extra={"fields": {"host": host, "port": port}})
+    return runner
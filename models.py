@@ -0,0 +1,268 @@
+import sys
+import typing as t
+from enum import StrEnum
+
+if t.TYPE_CHECKING:
+    from case_logs import CaseLogCache
+
+JUDGE_SPEAKER = "JudgeBot"
+
+
+class CaseType(StrEnum):
+    CIVIL = "Civil"
+    CRIMINAL = "Criminal"
+    COMMUNITY = "Community"
+    COUNTER_CASE = "Counter-case"
+    OTHER = "Other"
+    FAMILY = "Family"
+    TRAFFIC = "Traffic"
+    SMALL_CLAIMS = "Small Claims"
+
+
+class CaseStatus(StrEnum):
+    OPEN = "open"
+    CLOSED = "closed"
+    APPEALED = "appealed"
+
+
+class CaseRole(StrEnum):
+    JUDGE = "Judge"
+    PROSECUTOR = "Prosecutor"
+    DEFENSE = "Defense"
+    WITNESS = "Witness"
+
+
+E = t.TypeVar("E", bound=StrEnum)
+
+
+def _member(enum: type[E], value: str | None) -> E | str | None:
+    # enum members are singletons; anything unknown is kept as an interned string so it still round-trips
+    if value is None:
+        return None
+    try:
+        return enum(value)
+    except ValueError:
+        return sys.intern(value)
+
+
+class CaseParticipant:
+    __slots__ = ("user_id", "role")
+
+    def __init__(self, user_id: int, role: CaseRole):
+        self.user_id = user_id
+        self.role = role
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CaseParticipant) and (self.user_id, self.role) == (other.user_id, other.role)
+
+    def __repr__(self) -> str:
+        return f"CaseParticipant(user_id={self.user_id}, role={self.role!s})"
+
+    def to_dict(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "role": self.role.value
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'CaseParticipant':
+        return CaseParticipant(
+            user_id=data["user_id"],
+            role=CaseRole(data["role"])
+        )
+
+
+class LogEntry:
+    """One line of a case transcript.
+
+    Transcripts make up most of the bot's memory, so entries use slots and share one copy of
+    each speaker name. Entries are not modified once they are logged.
+    """
+
+    __slots__ = ("message_id", "message_reference_id", "speaker", "message")
+
+    def __init__(self, message_id: int | None, message_reference_id: int | None, speaker: str, message: str):
+        self.message_id = message_id
+        self.message_reference_id = message_reference_id
+        self.speaker = sys.intern(speaker) if speaker is not None else None
+        self.message = message
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, LogEntry) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"LogEntry(message_id={self.message_id}, speaker={self.speaker!r})"
+
+    @property
+    def is_judge(self) -> bool:
+        return self.speaker == JUDGE_SPEAKER
+
+    def to_dict(self) -> dict:
+        return {
+            "message_id": self.message_id,
+            "message_reference_id": self.message_reference_id,
+            "speaker": self.speaker,
+            "message": self.message,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'LogEntry':
+        return LogEntry(
+            message_id=data.get("message_id"),
+            message_reference_id=data.get("message_reference_id"),
+            speaker=data.get("speaker"),
+            message=data.get("message"),
+        )
+
+
+class Case:
+    """A case thread and its transcript, keyed by the thread's id.
+
+    `to_dict`/`from_dict` use the cases.json layout, in which the participants are stored as
+    `accuser` and `accused`. Cases loaded by a store may leave their logs on disk until
+    `load_logs` is awaited, see `case_logs.CaseLogCache`.
+    """
+
+    __slots__ = ("case_id", "case_type", "status", "reason", "participants", "associated_case_ids", "og_message_id", "verdict", "summary", "_logs", "evidences", "guild_id", "closed_at", "summary_checkpoint", "log_cache")
+
+    def __init__(self, case_id: int, case_type: CaseType | str, status: CaseStatus | str, reason: str, participants: list[CaseParticipant], *, associated_case_ids: list[int] | None = None, og_message_id: int | None = None, verdict: str | None = None, summary: str | None = None, logs: list[LogEntry] | None = None, evidences: list[dict] | None = None, guild_id: int | None = None, closed_at: float | None = None, summary_checkpoint: dict | None = None):
+        self.case_id = case_id
+        self.case_type = _member(CaseType, case_type)
+        self.status = _member(CaseStatus, status)
+        self.reason = reason
+        self.participants = participants
+        self.associated_case_ids = associated_case_ids if associated_case_ids is not None else []
+        self.og_message_id = og_message_id
+        self.verdict = verdict
+        self.summary = summary
+        self._logs: list[LogEntry] | None = logs if logs is not None else []
+        self.evidences: list[dict] = evidences if evidences is not None else []
+        self.guild_id = guild_id  # unknown for cases filed before it was recorded
+        self.closed_at = closed_at  # unix time the case was closed at
+        self.summary_checkpoint = summary_checkpoint  # what the summary was built from, see summarizer.CaseSummarizer
+        self.log_cache: 'CaseLogCache | None' = None
+
+    def __repr__(self) -> str:
+        logs = "unloaded" if self._logs is None else len(self._logs)
+        return f"Case(case_id={self.case_id}, status={self.status!s}, logs={logs})"
+
+    @property
+    def logs(self) -> list[LogEntry]:
+        """The logs, which have to be in memory; `await load_logs()` first if they may not be."""
+        if self._logs is None:
+            raise RuntimeError(f"Logs of case {self.case_id} are not loaded")
+        if self.log_cache is not None:
+            self.log_cache.touch(self)
+        return self._logs
+
+    async def load_logs(self) -> list[LogEntry]:
+        """The logs, read from the store first if they are not in memory."""
+        if self.log_cache is not None:
+            return await self.log_cache.ensure(self)
+        return self.logs
+
+    @logs.setter
+    def logs(self, logs: list[LogEntry]) -> None:
+        self._logs = logs
+
+    @property
+    def logs_if_loaded(self) -> list[LogEntry] | None:
+        """The logs if they are in memory, without loading them or marking them as used."""
+        return self._logs
+
+    def unload_logs(self) -> None:
+        self._logs = None
+
+    @property
+    def accuser(self) -> int | None:
+        return next((participant.user_id for participant in self.participants if participant.role == CaseRole.PROSECUTOR), None)
+
+    @property
+    def accused(self) -> list[int]:
+        return [participant.user_id for participant in self.participants if participant.role == CaseRole.DEFENSE]
+
+    @accused.setter
+    def accused(self, user_ids: list[int]) -> None:
+        self.participants = [participant for participant in self.participants if participant.role != CaseRole.DEFENSE]
+        self.participants.extend(CaseParticipant(user_id, CaseRole.DEFENSE) for user_id in user_ids)
+
+    @property
+    def closed(self) -> bool:
+        return self.status == CaseStatus.CLOSED
+
+    def update(self, **fields) -> None:
+        """Applies a `case_updated` change, as recorded by the stores."""
+        for name, value in fields.items():
+            if name == "accused":
+                self.accused = list(value)
+            elif name == "status":
+                self.status = _member(CaseStatus, value)
+            elif name == "case_type":
+                self.case_type = _member(CaseType, value)
+            elif name in Case.__slots__:
+                setattr(self, name, value)
+
+    def add_log_entry(self, log_entry: LogEntry):
+        self.logs.append(log_entry)
+
+    def copy(self) -> 'Case':
+        """A copy whose lists can be read by another thread while this case keeps changing.
+
+        Logs that are not in memory stay unloaded in the copy as well.
+        """
+        copied = Case(
+            self.case_id, self.case_type, self.status, self.reason, list(self.participants),
+            associated_case_ids=list(self.associated_case_ids), og_message_id=self.og_message_id,
+            verdict=self.verdict, summary=self.summary, logs=list(self._logs or ()), evidences=list(self.evidences),
+            guild_id=self.guild_id, closed_at=self.closed_at, summary_checkpoint=self.summary_checkpoint,
+        )
+        if self._logs is None:
+            copied.unload_logs()
+        return copied
+
+    def to_dict(self) -> dict:
+        data = {
+            "associated_case_ids": self.associated_case_ids,
+            "accuser": self.accuser,
+            "accused": self.accused,
+            "reason": self.reason,
+            "case_type": self.case_type,
+            "status": self.status,
+            "logs": [log.to_dict() for log in self.logs],
+            "og_message_id": self.og_message_id,
+            "verdict": self.verdict,
+        }
+        if self.summary is not None:
+            data["summary"] = self.summary
+        if self.guild_id is not None:
+            data["guild_id"] = self.guild_id
+        if self.closed_at is not None:
+            data["closed_at"] = self.closed_at
+        if self.summary_checkpoint is not None:
+            data["summary_checkpoint"] = self.summary_checkpoint
+        if self.evidences:
+            data["evidences"] = self.evidences
+        return data
+
+    @staticmethod
+    def from_dict(case_id: int, data: dict) -> 'Case':
+        participants = []
+        if data.get("accuser") is not None:
+            participants.append(CaseParticipant(data["accuser"], CaseRole.PROSECUTOR))
+        participants.extend(CaseParticipant(user_id, CaseRole.DEFENSE) for user_id in data.get("accused", []))
+        return Case(
+            case_id=case_id,
+            case_type=data.get("case_type"),
+            status=data.get("status"),
+            reason=data.get("reason"),
+            participants=participants,
+            associated_case_ids=data.get("associated_case_ids", []),
+            og_message_id=data.get("og_message_id"),
+            verdict=data.get("verdict"),
+            summary=data.get("summary"),
+            logs=[LogEntry.from_dict(log) for log in data.get("logs", [])],
+            evidences=data.get("evidences"),
+            guild_id=data.get("guild_id"),
+            closed_at=data.get("closed_at"),
+            summary_checkpoint=data.get("summary_checkpoint"),
+        )
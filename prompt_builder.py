@@ -0,0 +1,123 @@
+from collections import deque
+from dataclasses import dataclass
+
+from models import Case, LogEntry
+
+# Default number of tokens a judge prompt may use, including the static instructions.
+TOKEN_BUDGET = 8000
+
+
+def estimate_tokens(text: str) -> int:
+    # Gemini averages roughly four characters per token for English chat; good enough for budgeting
+    return len(text) // 4 + 1
+
+
+@dataclass
+class BuiltPrompt:
+    text: str
+    usage: dict[str, int]  # section name -> estimated tokens
+    turns: int  # number of past log entries that made it into the dialogue
+
+
+class Transcript:
+    """Pre-rendered dialogue lines for one case, appended to as the case's logs grow.
+
+    Only the most recent lines that could still fit in the budget are kept, so the buffer
+    stays bounded no matter how long the case runs.
+    """
+
+    def __init__(self, logs: list[LogEntry], keep_tokens: int):
+        self.logs = logs
+        self.keep_tokens = keep_tokens
+        self.synced = 0  # number of entries of `logs` already rendered
+        self.lines: deque[tuple[str, int]] = deque()
+        self.tokens = 0
+
+    def sync(self) -> None:
+        for log in self.logs[self.synced:]:
+            line = f"{log.speaker}: {log.message}\n"
+            cost = estimate_tokens(line)
+            self.lines.append((line, cost))
+            self.tokens += cost
+        self.synced = len(self.logs)
+
+        while self.lines and self.tokens - self.lines[0][1] >= self.keep_tokens:
+            _, cost = self.lines.popleft()
+            self.tokens -= cost
+
+    def tail(self, budget: int) -> tuple[list[str], int]:
+        """Returns the most recent lines (oldest first) whose total fits in `budget`."""
+        selected = []
+        used = 0
+        for line, cost in reversed(self.lines):
+            if used + cost > budget:
+                break
+            selected.append(line)
+            used += cost
+        selected.reverse()
+        return selected, used
+
+
+class PromptBuilder:
+    """Assembles judge prompts within a token budget.
+
+    The static prompt, case header and the incoming message are always included. Evidence
+    summaries and the running summary come next, and whatever budget is left is filled with
+    as many recent turns as fit, so the cost of building a prompt does not grow with the case.
+    """
+
+    def __init__(self, static_prompt: str, token_budget: int = TOKEN_BUDGET):
+        self.static_prompt = static_prompt
+        self.static_tokens = estimate_tokens(static_prompt)
+        self.token_budget = token_budget
+        self.transcripts: dict[int, Transcript] = {}
+
+    def transcript(self, case_id: int, case: Case) -> Transcript:
+        logs = case.logs
+        transcript = self.transcripts.get(case_id)
+        # logs are only ever appended to; a different or shorter list means the case was reloaded
+        if transcript is None or transcript.logs is not logs or transcript.synced > len(logs):
+            transcript = Transcript(logs, self.token_budget)
+            self.transcripts[case_id] = transcript
+        transcript.sync()
+        return transcript
+
+    def forget(self, case_id: int) -> None:
+        self.transcripts.pop(case_id, None)
+
+    def build(self, case_id: int, case: Case, current_message: str) -> BuiltPrompt:
+        header = f"\n\nCase Details:\nAccuser: <@{case.accuser}>\nAccused: {', '.join(f'<@{user_id}>' for user_id in case.accused)}\nReason: {case.reason}\n\n"
+        closing = f"{current_message}\nJudgeBot:"
+        usage = {
+            "static": self.static_tokens,
+            "header": estimate_tokens(header),
+            "message": estimate_tokens(closing),
+        }
+        remaining = self.token_budget - sum(usage.values())
+
+        evidence = "Evidence Summaries:\n" + "".join(
+            f"{evidence.get('file_name', 'Unknown file')} - Summary: {evidence.get('summary', 'No summary available.')}\n"
+            for evidence in case.evidences
+        )
+        evidence = _fit(evidence, remaining)
+        usage["evidence"] = estimate_tokens(evidence)
+        remaining -= usage["evidence"]
+
+        summary = ""
+        if case.summary:
+            summary = _fit(f"Summary of Proceedings So Far:\n{case.summary}\n\n", remaining)
+        usage["summary"] = estimate_tokens(summary) if summary else 0
+        remaining -= usage["summary"]
+
+        lines, usage["dialogue"] = self.transcript(case_id, case).tail(max(remaining, 0))
+
+        text = "".join([self.static_prompt, header, evidence, summary, "Dialogue:\n", *lines, closing])
+        return BuiltPrompt(text=text, usage=usage, turns=len(lines))
+
+
+def _fit(text: str, budget: int) -> str:
+    if estimate_tokens(text) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    return text[:budget * 4 - 4] + "...\n"
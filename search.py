@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import re
+import typing as t
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from case_logs import CaseLogCache
+from models import Case, LogEntry
+from sqlite_worker import SqliteWorker
+
+log = logging.getLogger(__name__)
+
+SEARCH_PATH = "search.db"
+
+# Number of matching cases a search returns, best first.
+MAX_RESULTS = 50
+
+# Single-valued case fields that are searchable; logs and evidence summaries are added one row at a time.
+SEARCH_FIELDS = ("reason", "summary", "verdict")
+
+
+@dataclass
+class SearchHit:
+    case_id: int
+    score: float  # bm25 of the best matching text in the case; lower is better
+    snippet: str
+
+
+def match_expression(query: str) -> str:
+    """Turns free text into an FTS5 query for text containing any of its words.
+
+    bm25 ranks text that contains more of the words, and rarer ones, first.
+    """
+    # quoting each word keeps operators and stray punctuation from being parsed as query syntax
+    return " OR ".join(f'"{word}"' for word in re.findall(r"\w+", query))
+
+
+class CaseSearch(SqliteWorker):
+    """Full-text index over case logs, reasons, summaries, verdicts and evidence summaries.
+
+    The index is an SQLite FTS5 table in its own database, whichever backend stores the cases.
+    Every piece of text is one row; `search_docs` records the case and field it came from, so a
+    single field can be replaced and results can be scoped to a guild.
+
+    Cases missing from the index, such as every case when the index is first created, are added
+    by `backfill`. Changes to a case that is not indexed yet are skipped: the snapshot its
+    backfill takes already contains them.
+    """
+
+    thread_name = "case-search"
+    failure_message = "Search index update failed"
+    # the index can always be rebuilt from the cases
+    synchronous = "NORMAL"
+
+    def connect(self, db_path: str = SEARCH_PATH) -> None:
+        super().connect(db_path)
+
+    def _setup(self) -> None:
+        assert self.conn is not None
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS search_cases (case_id INTEGER PRIMARY KEY, guild_id INTEGER)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS search_docs (doc_id INTEGER PRIMARY KEY AUTOINCREMENT, case_id INTEGER, field TEXT)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_search_docs_case ON search_docs(case_id, field)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cases_guild ON search_cases(guild_id)")
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_text USING fts5(content, tokenize='porter unicode61')")
+
+    def _submit(self, fn: t.Callable[..., None], *args) -> Future:
+        # every index update is a transaction of its own
+        return super()._submit(self._in_transaction, fn, *args)
+
+    def _indexed(self, case_id: int) -> bool:
+        assert self.conn is not None
+        return self.conn.execute("SELECT 1 FROM search_cases WHERE case_id = ?", (case_id,)).fetchone() is not None
+
+    def _add(self, case_id: int, field: str, content: str | None) -> None:
+        assert self.conn is not None
+        if not content:
+            return
+        doc_id = self.conn.execute("INSERT INTO search_docs (case_id, field) VALUES (?, ?)", (case_id, field)).lastrowid
+        self.conn.execute("INSERT INTO search_text (rowid, content) VALUES (?, ?)", (doc_id, content))
+
+    def _set(self, case_id: int, field: str, content: str | None) -> None:
+        assert self.conn is not None
+        row = self.conn.execute("SELECT doc_id FROM search_docs WHERE case_id = ? AND field = ?", (case_id, field)).fetchone()
+        if row is None:
+            self._add(case_id, field, content)
+        elif content:
+            self.conn.execute("UPDATE search_text SET content = ? WHERE rowid = ?", (content, row[0]))
+        else:
+            self.conn.execute("DELETE FROM search_text WHERE rowid = ?", (row[0],))
+            self.conn.execute("DELETE FROM search_docs WHERE doc_id = ?", (row[0],))
+
+    def _index_case(self, case: Case) -> None:
+        assert self.conn is not None
+        # ignoring an existing row also covers another worker process indexing the same case first
+        if self.conn.execute("INSERT OR IGNORE INTO search_cases (case_id, guild_id) VALUES (?, ?)", (case.case_id, case.guild_id)).rowcount == 0:
+            return
+        for field in SEARCH_FIELDS:
+            self._add(case.case_id, field, getattr(case, field))
+        for evidence in case.evidences:
+            self._add(case.case_id, "evidence", evidence.get("summary"))
+        for entry in case.logs:
+            self._add(case.case_id, "log", entry.message)
+
+    def case_filed(self, case_id: int, case: Case) -> Future:
+        return self._submit(self._index_case, case.copy())
+
+    def case_updated(self, case_id: int, **fields) -> Future | None:
+        changed = {name: value for name, value in fields.items() if name in SEARCH_FIELDS or name == "guild_id"}
+        if not changed:
+            return None
+        return self._submit(self._update_case, case_id, changed)
+
+    def _update_case(self, case_id: int, fields: dict) -> None:
+        assert self.conn is not None
+        if not self._indexed(case_id):
+            return
+        for name, value in fields.items():
+            if name == "guild_id":
+                self.conn.execute("UPDATE search_cases SET guild_id = ? WHERE case_id = ?", (value, case_id))
+            else:
+                self._set(case_id, name, value)
+
+    def logs_appended(self, case_id: int, entries: list[LogEntry]) -> Future:
+        return self._submit(self._add_many, case_id, "log", [entry.message for entry in entries])
+
+    def evidence_added(self, case_id: int, evidence: dict) -> Future:
+        return self._submit(self._add_many, case_id, "evidence", [evidence.get("summary")])
+
+    def _add_many(self, case_id: int, field: str, contents: list[str | None]) -> None:
+        if not self._indexed(case_id):
+            return
+        for content in contents:
+            self._add(case_id, field, content)
+
+    async def backfill(self, cases: t.Iterable[Case], log_cache: CaseLogCache) -> int:
+        """Indexes every case that is not in the index yet and returns how many were added."""
+        indexed = await self._call(self._indexed_ids)
+        added = 0
+        for case in cases:
+            if case.case_id in indexed:
+                continue
+            # one case at a time, so only one snapshot of logs is held in memory
+            await asyncio.wrap_future(self._submit(self._index_case, await log_cache.snapshot(case)))
+            added += 1
+        if added:
+            log.info("Indexed cases for search", extra={"fields": {"cases": added}})
+        return added
+
+    def _indexed_ids(self) -> set[int]:
+        assert self.conn is not None
+        return {case_id for case_id, in self.conn.execute("SELECT case_id FROM search_cases")}
+
+    async def search(self, guild_id: int, query: str, limit: int = MAX_RESULTS) -> list[SearchHit]:
+        """The guild's cases matching `query`, best match first."""
+        expression = match_expression(query)
+        if not expression:
+            return []
+        return await self._call(self._search, guild_id, expression, limit)
+
+    def _search(self, guild_id: int, expression: str, limit: int) -> list[SearchHit]:
+        assert self.conn is not None
+        ranked = self.conn.execute(
+            "SELECT docs.case_id, min(search_text.rank) AS score FROM search_text"
+            " JOIN search_docs AS docs ON docs.doc_id = search_text.rowid"
+            " JOIN search_cases AS cases ON cases.case_id = docs.case_id"
+            " WHERE search_text MATCH ? AND cases.guild_id = ?"
+            " GROUP BY docs.case_id ORDER BY score LIMIT ?",
+            (expression, guild_id, limit),
+        ).fetchall()
+        hits = []
+        for case_id, score in ranked:
+            # snippet() can't be used in the grouped query, so take it from the case's best row
+            snippet, = self.conn.execute(
+                "SELECT snippet(search_text, 0, '**', '**', '...', 16) FROM search_text"
+                " WHERE search_text MATCH ? AND rowid IN (SELECT doc_id FROM search_docs WHERE case_id = ?)"
+                " ORDER BY rank LIMIT 1",
+                (expression, case_id),
+            ).fetchone()
+            hits.append(SearchHit(case_id, score, snippet))
+        return hits
@@ -0,0 +1,70 @@
+import os
+import typing as t
+
+from models import Case
+
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    """The gateway shard Discord delivers a guild's events on."""
+    return (guild_id >> 22) % shard_count
+
+
+def split_shards(shard_count: int, workers: int) -> list[list[int]]:
+    """Splits shards 0..shard_count-1 into `workers` contiguous ranges of nearly equal size."""
+    if not 0 < workers <= shard_count:
+        raise ValueError(f"Cannot split {shard_count} shards between {workers} workers.")
+    size, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for worker in range(workers):
+        end = start + size + (worker < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def parse_shard_ids(value: str | None, shard_count: int) -> list[int]:
+    """Shard ids from a "0,1,2" or "0-2" list; every shard when unset."""
+    if not value:
+        return list(range(shard_count))
+    shard_ids: list[int] = []
+    for part in value.split(","):
+        first, _, last = part.strip().partition("-")
+        shard_ids.extend(range(int(first), int(last or first) + 1))
+    if not all(0 <= shard_id < shard_count for shard_id in shard_ids):
+        raise ValueError(f"Shard ids {value} are outside 0..{shard_count - 1}.")
+    return shard_ids
+
+
+class ShardOwnership:
+    """Which guilds, and so which cases, one worker process is responsible for.
+
+    Discord routes every guild to one shard, and each worker connects a range of shards, so a
+    case thread's events only ever reach the worker owning its guild's shard. That worker is
+    the only one that loads and writes the case. Cases whose guild is not known yet are loaded
+    by every worker, since any of them may be the one that sees the thread next.
+    """
+
+    def __init__(self, shard_count: int = 1, shard_ids: t.Iterable[int] | None = None):
+        self.shard_count = shard_count
+        self.shard_ids = frozenset(shard_ids if shard_ids is not None else range(shard_count))
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.shard_ids) < self.shard_count
+
+    def owns_guild(self, guild_id: int | None) -> bool:
+        return guild_id is None or shard_for_guild(guild_id, self.shard_count) in self.shard_ids
+
+    def worker_path(self, path: str) -> str:
+        """`path` for a file that each worker process keeps for itself, marked with its first shard."""
+        if not self.sharded:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}.shard{min(self.shard_ids)}{ext}"
+
+    def owns_case(self, case: Case) -> bool:
+        """Whether this worker is the one to run background work on the case, such as archiving it."""
+        if case.guild_id is None:
+            # loaded by every worker, so pick one of them
+            return 0 in self.shard_ids
+        return self.owns_guild(case.guild_id)
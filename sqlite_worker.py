@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import sqlite3
+import typing as t
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# seconds a statement waits for another process's write lock before it fails
+BUSY_TIMEOUT = 30.0
+
+
+class SqliteWorker:
+    """An SQLite connection owned by a single worker thread.
+
+    Every statement runs on that thread in the order it was issued, so callers on the event
+    loop never block on disk and writes are applied in order. The database is in WAL mode and
+    waits up to `BUSY_TIMEOUT` for the write lock, since sharded worker processes share the
+    same files.
+
+    Subclasses create their tables in `_setup`. Writes handed over with `_submit` are not
+    awaited by anyone, so when one fails it is logged with `failure_message`.
+    """
+
+    thread_name = "sqlite"
+    failure_message = "SQLite write failed"
+    # NORMAL only risks the last transactions on power loss; stores that must be durable before going on keep FULL
+    synchronous = "FULL"
+
+    def __init__(self) -> None:
+        self.conn: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.thread_name)
+
+    def connect(self, db_path: str) -> None:
+        self._executor.submit(self._connect, db_path).result()
+
+    def _connect(self, db_path: str) -> None:
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        self._setup()
+
+    def _setup(self) -> None:
+        pass
+
+    async def _call[T](self, fn: t.Callable[..., T], *args) -> T:
+        """Runs `fn(*args)` on the worker thread and returns its result."""
+        return await asyncio.wrap_future(self._executor.submit(fn, *args))
+
+    def _submit(self, fn: t.Callable[..., None], *args) -> Future:
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._report_failure)
+        return future
+
+    def _in_transaction(self, fn: t.Callable[..., None], *args) -> None:
+        assert self.conn is not None
+        with self.conn:
+            fn(*args)
+
+    def _report_failure(self, future: Future) -> None:
+        if (exc := future.exception()) is not None:
+            logging.getLogger(type(self).__module__).error(self.failure_message, exc_info=exc)
+
+    def close(self) -> None:
+        self._executor.submit(self._close).result()
+        self._executor.shutdown()
+
+    def _close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,76 @@
+import time
+
+import discord
+
+# Same cap as trim_to_limit() uses for judge replies.
+MESSAGE_LIMIT = 1950
+
+# Discord allows about five edits per five seconds per channel; stay comfortably below that.
+EDIT_INTERVAL = 1.2
+
+
+class StreamingReply:
+    """Progressively shows a streamed reply in a Discord message.
+
+    Edits are throttled to one per `edit_interval` seconds. Once the text outgrows `limit`
+    characters, the current message is finalized at a line or word boundary and the rest
+    continues in a follow-up message.
+    """
+
+    def __init__(self, message: discord.Message, *, limit: int = MESSAGE_LIMIT, edit_interval: float = EDIT_INTERVAL):
+        self.messages = [message]
+        self.limit = limit
+        self.edit_interval = edit_interval
+        self.text = ""
+        self._offset = 0  # index in `text` where the current message's segment starts
+        self._shown = ""  # content most recently sent for the current message
+        self._follow_up = False  # the current message was finalized; the next non-blank segment starts a new one
+        self._last_edit = 0.0
+        self.edit_seconds = 0.0  # time spent waiting on Discord rather than on the model
+
+    @property
+    def message(self) -> discord.Message:
+        return self.messages[-1]
+
+    def _split_point(self) -> int:
+        end = self._offset + self.limit
+        window = self.text[self._offset:end]
+        for separator in ("\n", " "):
+            cut = window.rfind(separator)
+            if cut > self.limit // 2:
+                return self._offset + cut + 1
+        return end
+
+    async def _edit(self, content: str) -> None:
+        content = content.strip()
+        if content and content != self._shown:
+            started = time.monotonic()
+            if self._follow_up:
+                follow_up = await self.message.channel.send(content, reference=self.message, allowed_mentions=discord.AllowedMentions.all())
+                self.messages.append(follow_up)
+                self._follow_up = False
+            else:
+                await self.message.edit(content=content, allowed_mentions=discord.AllowedMentions.all())
+            self.edit_seconds += time.monotonic() - started
+            self._shown = content
+        self._last_edit = time.monotonic()
+
+    async def feed(self, chunk: str) -> None:
+        self.text += chunk
+
+        while len(self.text) - self._offset > self.limit:
+            cut = self._split_point()
+            await self._edit(self.text[self._offset:cut])
+            self._offset = cut
+            # blank text after the cut doesn't get a message of its own, so the follow-up waits for real text
+            self._follow_up = True
+            self._shown = ""
+            await self._edit(self.text[self._offset:self._offset + self.limit])
+
+        if time.monotonic() - self._last_edit >= self.edit_interval:
+            await self._edit(self.text[self._offset:])
+
+    async def finish(self) -> str:
+        """Shows whatever is still pending and returns the full reply text."""
+        await self._edit(self.text[self._offset:])
+        return self.text.strip()
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import typing as t
+from dataclasses import dataclass
+
+from models import Case, LogEntry
+
+log = logging.getLogger(__name__)
+
+# Log entries summarized together at the bottom of the hierarchy, and how many summaries of one
+# level are merged into one of the next level up.
+CHUNK_SIZE = 24
+FAN_IN = 4
+
+
+@dataclass
+class CaseSummary:
+    text: str
+    checkpoint: dict
+    changed: bool = True  # False when the logs had not moved since the stored summary
+
+
+class CaseSummarizer:
+    """Summarizes a case hierarchically, reading every log entry once.
+
+    The logs are split into chunks of `chunk_size` entries. Each full chunk is summarized once,
+    and whenever `fan_in` summaries of one level have piled up they are merged into a single
+    summary of the next level, so a case of any length is covered by a handful of them. The
+    case summary rolls those up together with the entries after the last full chunk.
+
+    What has been summarized so far is kept in the case's `summary_checkpoint`:
+
+        {"start": first log index the chunks cover, "prior": summary of the logs before it,
+         "covered": log index the chunk summaries reach, "chunks": [[level, text], ...],
+         "summarized": number of logs the case summary was rolled up from}
+
+    Logs are only ever appended, so a chunk summary never goes stale; each one is handed to
+    `on_checkpoint` as soon as it exists and survives a failed or superseded run. A case whose
+    logs have not changed since its summary gets the stored summary back without any call.
+    """
+
+    def __init__(
+        self, generate: t.Callable[[str], t.Awaitable[str | None]], instructions: str, *,
+        chunk_size: int = CHUNK_SIZE, fan_in: int = FAN_IN, on_checkpoint: t.Callable[[int, dict], None] | None = None,
+    ):
+        self.generate = generate
+        self.instructions = instructions
+        self.chunk_size = chunk_size
+        self.fan_in = fan_in
+        self.on_checkpoint = on_checkpoint
+
+    def initial_checkpoint(self, case: Case, logs: list[LogEntry]) -> dict:
+        if case.summary_checkpoint is not None:
+            return case.summary_checkpoint
+        # summaries from before checkpoints were rolling, built from the last chunk of logs and
+        # the summary before them; keep that one for the older logs and read the last chunk again
+        start = max(0, len(logs) - self.chunk_size) if case.summary else 0
+        return {"start": start, "prior": case.summary if start else None, "covered": start, "chunks": [], "summarized": -1}
+
+    async def summarize(self, case: Case) -> CaseSummary | None:
+        logs = await case.load_logs()
+        # entries appended while Gemini is working are left for the next run
+        n = len(logs)
+        checkpoint = self.initial_checkpoint(case, logs)
+        if checkpoint["summarized"] == n and case.summary:
+            return CaseSummary(case.summary, checkpoint, changed=False)
+
+        while n - checkpoint["covered"] >= self.chunk_size:
+            covered = checkpoint["covered"]
+            text = await self.generate(self._chunk_prompt(logs[covered:covered + self.chunk_size]))
+            if not text:
+                return None
+            chunks = await self._merge(checkpoint["chunks"] + [[0, text]])
+            if chunks is None:
+                return None
+            checkpoint = dict(checkpoint, covered=covered + self.chunk_size, chunks=chunks)
+            if self.on_checkpoint is not None:
+                self.on_checkpoint(case.case_id, checkpoint)
+
+        text = await self.generate(self._rollup_prompt(checkpoint, logs[checkpoint["covered"]:n]))
+        if not text:
+            return None
+        return CaseSummary(text, dict(checkpoint, summarized=n))
+
+    async def _merge(self, chunks: list[list]) -> list[list] | None:
+        # like carrying in a counter: `fan_in` summaries of one level become one of the next
+        while len(chunks) >= self.fan_in and len({level for level, _ in chunks[-self.fan_in:]}) == 1:
+            level = chunks[-1][0]
+            text = await self.generate(self._merge_prompt([text for _, text in chunks[-self.fan_in:]]))
+            if not text:
+                return None
+            chunks = chunks[:-self.fan_in] + [[level + 1, text]]
+        return chunks
+
+    def _chunk_prompt(self, logs: list[LogEntry]) -> str:
+        return self.instructions + f"\n\nPart of the Conversation:\n{conversation(logs)}\n\nSummary:"
+
+    def _merge_prompt(self, summaries: list[str]) -> str:
+        return self.instructions + f"\n\nSummaries of consecutive parts of the Conversation, oldest first:\n\n{"\n\n".join(summaries)}\n\nCombined Summary:"
+
+    def _rollup_prompt(self, checkpoint: dict, tail: list[LogEntry]) -> str:
+        earlier = [checkpoint["prior"]] if checkpoint["prior"] else []
+        earlier += [text for _, text in checkpoint["chunks"]]
+        contents = self.instructions
+        if earlier:
+            contents += f"\n\nSummaries of the earlier Conversation, oldest first:\n\n{"\n\n".join(earlier)}"
+        if tail:
+            contents += f"\n\nLatest logs of Conversation:\n{conversation(tail)}"
+        if not earlier and not tail:
+            contents += "\n\nThere is no Conversation yet."
+        return contents + "\n\nUpdated Summary:"
+
+
+def conversation(logs: list[LogEntry]) -> str:
+    return "\n".join(f"{log.speaker}: {log.message}" for log in logs)
+
+
+class SummaryJobs:
+    """Runs case summarization in the background, at most one job per case.
+
+    `summarize(case_id)` produces a new summary from the case's current logs and
+    `apply(case_id, summary)` stores it and refreshes the header. A request that arrives
+    while a job is running marks the in-flight result as stale: it is discarded and the job
+    runs again on the newer logs, so only the latest summary is ever applied.
+    """
+
+    def __init__(self, summarize: t.Callable[[int], t.Awaitable[CaseSummary | None]], apply: t.Callable[[int, CaseSummary], t.Awaitable[None]]):
+        self.summarize = summarize
+        self.apply = apply
+        self.tasks: dict[int, asyncio.Task[CaseSummary | None]] = {}
+        self.generations: dict[int, int] = {}
+
+    def request(self, case_id: int) -> asyncio.Task[CaseSummary | None]:
+        """Schedules a summary for the case and returns the job that will produce it.
+
+        The task is not tied to the caller; await it through `asyncio.shield` if the caller
+        needs the result but should not take the job down with it when cancelled.
+        """
+        self.generations[case_id] = self.generations.get(case_id, 0) + 1
+        task = self.tasks.get(case_id)
+        if task is None or task.done():
+            task = self.tasks[case_id] = asyncio.create_task(self._run(case_id))
+        return task
+
+    def in_flight(self) -> int:
+        return sum(not task.done() for task in self.tasks.values())
+
+    async def _run(self, case_id: int) -> CaseSummary | None:
+        try:
+            while True:
+                generation = self.generations[case_id]
+                try:
+                    summary = await self.summarize(case_id)
+                except Exception:
+                    log.exception("Failed to summarize case", extra={"fields": {"case_id": case_id}})
+                    summary = None
+
+                if self.generations[case_id] != generation:
+                    continue
+
+                if summary:
+                    try:
+                        await self.apply(case_id, summary)
+                    except Exception:
+                        log.exception("Failed to apply case summary", extra={"fields": {"case_id": case_id}})
+
+                # a request that came in while the summary was being applied needs another pass
+                if self.generations[case_id] == generation:
+                    return summary
+        finally:
+            if self.tasks.get(case_id) is asyncio.current_task():
+                del self.tasks[case_id]
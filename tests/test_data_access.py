@@ -0,0 +1,102 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from data_access import CaseJournal, apply_record
+from models import Case, CaseParticipant, CaseRole, LogEntry
+
+
+def make_case(case_id: int = 1) -> Case:
+    return Case(case_id, "Civil", "open", "Stole the last cookie", [CaseParticipant(10, CaseRole.PROSECUTOR), CaseParticipant(20, CaseRole.DEFENSE)])
+
+
+class JournalReplayTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.paths = {name: os.path.join(self.workdir.name, name) for name in ("cases.json", "courts.json", "cases.journal")}
+
+    def tearDown(self) -> None:
+        self.workdir.cleanup()
+
+    def journal(self, cases: dict[int, Case]) -> CaseJournal:
+        return CaseJournal(cases, {}, cases_path=self.paths["cases.json"], courts_path=self.paths["courts.json"], journal_path=self.paths["cases.journal"])
+
+    def message_ids(self, case: Case) -> list[int | None]:
+        return [entry.message_id for entry in case.logs]
+
+    def test_replay_keeps_entries_with_lower_ids_than_the_tail(self) -> None:
+        cases: dict[int, Case] = {}
+        store = self.journal(cases)
+        cases[1] = make_case()
+        store.case_filed(1, cases[1])
+        # a message posted while the previous reply was still being sent has a lower id than that reply
+        for message_ids in ([100, 300], [200, 400]):
+            entries = [LogEntry(message_id, None, "user", "text") for message_id in message_ids]
+            cases[1].logs.extend(entries)
+            store.logs_appended(1, entries)
+        asyncio.run(store.flush())
+        store._file.close()
+
+        replayed: dict[int, Case] = {}
+        self.journal(replayed).load()
+        self.assertEqual(self.message_ids(replayed[1]), [100, 300, 200, 400])
+
+    def test_replay_on_top_of_the_snapshot_is_idempotent(self) -> None:
+        cases = {1: make_case()}
+        record = {"op": "logs_appended", "case_id": 1, "entries": [LogEntry(message_id, None, "user", "text").to_dict() for message_id in (300, 200)]}
+        seen: dict[int, set[int]] = {}
+        apply_record(cases, {}, record, seen)
+        apply_record(cases, {}, record, seen)
+        apply_record(cases, {}, record)
+        self.assertEqual(self.message_ids(cases[1]), [300, 200])
+
+
+class ColdLogsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.paths = {name: os.path.join(self.workdir.name, name) for name in ("cases.json", "courts.json", "cases.journal")}
+        cases = {case_id: make_case(case_id) for case_id in (1, 2)}
+        for case in cases.values():
+            case.logs = [LogEntry(case.case_id * 100 + index, None, "user", "text") for index in range(3)]
+        store = self.journal(cases)
+        for case_id, case in cases.items():
+            store.case_filed(case_id, case)
+        store.close()
+
+    def tearDown(self) -> None:
+        self.workdir.cleanup()
+
+    def journal(self, cases: dict[int, Case]) -> CaseJournal:
+        return CaseJournal(cases, {}, cases_path=self.paths["cases.json"], courts_path=self.paths["courts.json"], journal_path=self.paths["cases.journal"])
+
+    def test_logs_are_loaded_off_the_event_loop_only_when_awaited(self) -> None:
+        cases: dict[int, Case] = {}
+        self.journal(cases).load()
+        with self.assertRaises(RuntimeError):
+            cases[1].logs
+
+        async def load_twice() -> tuple[list[LogEntry], list[LogEntry]]:
+            return await asyncio.gather(cases[1].load_logs(), cases[1].load_logs())
+
+        first, second = asyncio.run(load_twice())
+        self.assertIs(first, second)
+        self.assertEqual([entry.message_id for entry in cases[1].logs], [100, 101, 102])
+
+    def test_snapshot_keeps_the_logs_of_a_case_changed_while_unloaded(self) -> None:
+        cases: dict[int, Case] = {}
+        store = self.journal(cases)
+        store.load()
+        cases[2].verdict = "Guilty"
+        store.case_updated(2, verdict="Guilty")
+        store.compact()
+
+        reloaded: dict[int, Case] = {}
+        self.journal(reloaded).load()
+        logs = asyncio.run(reloaded[2].load_logs())
+        self.assertEqual(reloaded[2].verdict, "Guilty")
+        self.assertEqual([entry.message_id for entry in logs], [200, 201, 202])
+
+
+if __name__ == "__main__":
+    unittest.main()
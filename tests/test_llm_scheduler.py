@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+
+try:
+    from llm_scheduler import LLMScheduler
+    from metrics import LLMMetrics, Registry
+except ModuleNotFoundError as exc:
+    raise unittest.SkipTest(f"{exc.name} is not installed")
+
+
+def make_scheduler(**limits) -> LLMScheduler:
+    registry = Registry()
+    limits = {"max_concurrent": 1, "requests_per_minute": 0, "tokens_per_minute": 0} | limits
+    return LLMScheduler(LLMMetrics(registry), registry, **limits)
+
+
+class LLMSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.scheduler = make_scheduler()
+        self.started: list[str] = []
+        self.gate = asyncio.Event()
+
+    async def hold_slot(self) -> asyncio.Task:
+        """Starts a call that keeps the only slot until `gate` is set, so later calls queue up."""
+        async def blocker(call) -> None:
+            await self.gate.wait()
+
+        task = asyncio.create_task(self.scheduler.run("reply", 0, blocker))
+        await asyncio.sleep(0)
+        self.assertEqual(self.scheduler.in_flight, 1)
+        return task
+
+    def queue(self, name: str, purpose: str, guild_id: int) -> asyncio.Task:
+        async def attempt(call) -> None:
+            self.started.append(name)
+
+        return asyncio.create_task(self.scheduler.run(purpose, guild_id, attempt, tokens=100))
+
+    async def drain(self, blocker: asyncio.Task, tasks: list[asyncio.Task]) -> None:
+        await asyncio.sleep(0)
+        self.gate.set()
+        await asyncio.gather(blocker, *tasks, return_exceptions=True)
+
+    async def test_higher_priority_runs_first(self) -> None:
+        blocker = await self.hold_slot()
+        tasks = [self.queue("summary", "summary", 1), self.queue("evidence", "evidence", 1), self.queue("reply", "reply", 1)]
+        await self.drain(blocker, tasks)
+        self.assertEqual(self.started, ["reply", "evidence", "summary"])
+
+    async def test_guilds_take_turns_within_a_class(self) -> None:
+        blocker = await self.hold_slot()
+        tasks = [self.queue(f"busy {index}", "reply", 1) for index in range(3)]
+        tasks.append(self.queue("quiet", "reply", 2))
+        await self.drain(blocker, tasks)
+        self.assertEqual(self.started, ["busy 0", "quiet", "busy 1", "busy 2"])
+
+    async def test_weights_give_a_guild_more_turns(self) -> None:
+        self.scheduler.weights = {1: 2.0}
+        blocker = await self.hold_slot()
+        tasks = [self.queue(f"heavy {index}", "reply", 1) for index in range(4)]
+        tasks += [self.queue(f"light {index}", "reply", 2) for index in range(2)]
+        await self.drain(blocker, tasks)
+        self.assertEqual(self.started, ["heavy 0", "heavy 1", "light 0", "heavy 2", "heavy 3", "light 1"])
+
+    async def test_cancelled_while_queued_never_runs(self) -> None:
+        blocker = await self.hold_slot()
+        cancelled = self.queue("cancelled", "reply", 1)
+        waiting = self.queue("waiting", "reply", 2)
+        await asyncio.sleep(0)
+        self.assertEqual(self.scheduler.queued["reply"], 2)
+        cancelled.cancel()
+        await self.drain(blocker, [cancelled, waiting])
+        self.assertTrue(cancelled.cancelled())
+        self.assertEqual(self.started, ["waiting"])
+        self.assertEqual(self.scheduler.queued["reply"], 0)
+        self.assertEqual(self.scheduler.in_flight, 0)
+
+    async def test_cancelled_after_grant_refunds_both_buckets(self) -> None:
+        self.scheduler = make_scheduler(requests_per_minute=60, tokens_per_minute=60_000)
+        await self.scheduler._acquire("reply", 0, 1, 1000)
+        granted = asyncio.create_task(self.scheduler._acquire("reply", 1, 1, 1000))
+        await asyncio.sleep(0)
+        self.assertEqual(self.scheduler.queued["reply"], 1)
+
+        # the running call finishes and hands its slot on, and the next caller gives up before it resumes
+        self.scheduler._release(0)
+        self.assertEqual(self.scheduler.in_flight, 1)
+        granted.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await granted
+
+        self.assertEqual(self.scheduler.in_flight, 0)
+        self.assertEqual(self.scheduler.queued["reply"], 0)
+        # only the call that ran is charged
+        self.assertAlmostEqual(self.scheduler.requests.level, 59, delta=0.1)
+        self.assertAlmostEqual(self.scheduler.tokens.level, 59_000, delta=100)
+
+
+if __name__ == "__main__":
+    unittest.main()
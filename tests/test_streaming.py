@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+
+try:
+    from streaming import StreamingReply
+except ModuleNotFoundError as exc:
+    raise unittest.SkipTest(f"{exc.name} is not installed")
+
+
+class FakeChannel:
+    def __init__(self) -> None:
+        self.sent: list["FakeMessage"] = []
+
+    async def send(self, content: str, **kwargs) -> "FakeMessage":
+        message = FakeMessage(self, content)
+        self.sent.append(message)
+        return message
+
+
+class FakeMessage:
+    def __init__(self, channel: FakeChannel, content: str = "") -> None:
+        self.channel = channel
+        self.content = content
+
+    async def edit(self, *, content: str, **kwargs) -> None:
+        self.content = content
+
+
+class StreamingReplyTest(unittest.TestCase):
+    def stream(self, chunks: list[str], limit: int = 10) -> tuple[StreamingReply, list[str]]:
+        channel = FakeChannel()
+        reply = StreamingReply(FakeMessage(channel, "Thinking..."), limit=limit, edit_interval=0.0)
+
+        async def run() -> None:
+            for chunk in chunks:
+                await reply.feed(chunk)
+            await reply.finish()
+
+        asyncio.run(run())
+        return reply, [message.content for message in reply.messages]
+
+    def test_long_reply_continues_in_follow_up_messages(self) -> None:
+        reply, contents = self.stream(["aaaa bbbb ", "cccc dddd"])
+        self.assertEqual(contents, ["aaaa bbbb", "cccc dddd"])
+        self.assertEqual(reply.text, "aaaa bbbb cccc dddd")
+
+    def test_blank_text_after_a_cut_keeps_the_finished_message(self) -> None:
+        _, contents = self.stream(["aaaaaaaaa \n\nhello"])
+        self.assertEqual(contents, ["aaaaaaaaa", "hello"])
+
+    def test_blank_text_streamed_after_a_cut_keeps_the_finished_message(self) -> None:
+        _, contents = self.stream(["aaaaaaaaa \n", "\n", "          ", "hello"])
+        self.assertEqual(contents, ["aaaaaaaaa", "hello"])
+
+
+if __name__ == "__main__":
+    unittest.main()
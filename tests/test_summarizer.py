@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+
+from models import Case, CaseParticipant, CaseRole, LogEntry
+from summarizer import CaseSummarizer
+
+
+def make_case(entries: int) -> Case:
+    case = Case(1, "Civil", "open", "Stole the last cookie", [CaseParticipant(10, CaseRole.PROSECUTOR), CaseParticipant(20, CaseRole.DEFENSE)])
+    case.logs = [LogEntry(index, None, "user", f"line {index}") for index in range(entries)]
+    return case
+
+
+class FakeGemini:
+    """Answers every prompt with a numbered summary and remembers the prompts."""
+
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+        self.during_call: list[LogEntry] = []  # appended to the case while the next call is running
+        self.case: Case | None = None
+
+    async def __call__(self, contents: str) -> str:
+        self.prompts.append(contents)
+        if self.during_call and self.case is not None:
+            self.case.logs.extend(self.during_call)
+            self.during_call = []
+        await asyncio.sleep(0)
+        return f"summary {len(self.prompts)}"
+
+    def kinds(self) -> list[str]:
+        return [prompt.rsplit("\n\n", 1)[-1] for prompt in self.prompts]
+
+
+class CaseSummarizerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.gemini = FakeGemini()
+        self.checkpoints: list[dict] = []
+        self.summarizer = CaseSummarizer(self.gemini, "Summarize.", chunk_size=2, fan_in=2, on_checkpoint=lambda case_id, checkpoint: self.checkpoints.append(checkpoint))
+
+    def summarize(self, case: Case):
+        summary = asyncio.run(self.summarizer.summarize(case))
+        if summary is not None:
+            case.summary = summary.text
+            case.summary_checkpoint = summary.checkpoint
+        return summary
+
+    def test_chunks_merge_and_roll_up_with_the_tail(self) -> None:
+        case = make_case(9)
+        summary = self.summarize(case)
+        # four chunks of two entries, merged pairwise twice, then the rollup with the last entry
+        self.assertEqual(self.gemini.kinds(), ["Summary:", "Summary:", "Combined Summary:", "Summary:", "Summary:", "Combined Summary:", "Combined Summary:", "Updated Summary:"])
+        self.assertEqual(summary.checkpoint["covered"], 8)
+        self.assertEqual(summary.checkpoint["summarized"], 9)
+        self.assertEqual(summary.checkpoint["chunks"], [[2, "summary 7"]])
+        self.assertIn("user: line 8", self.gemini.prompts[-1])
+        self.assertNotIn("user: line 7", self.gemini.prompts[-1])
+        self.assertEqual([checkpoint["covered"] for checkpoint in self.checkpoints], [2, 4, 6, 8])
+
+    def test_unchanged_logs_return_the_stored_summary_without_a_call(self) -> None:
+        case = make_case(5)
+        self.summarize(case)
+        calls = len(self.gemini.prompts)
+        summary = self.summarize(case)
+        self.assertFalse(summary.changed)
+        self.assertEqual(summary.text, case.summary)
+        self.assertEqual(len(self.gemini.prompts), calls)
+
+    def test_only_new_entries_are_read_on_the_next_run(self) -> None:
+        case = make_case(5)
+        self.summarize(case)
+        case.logs.append(LogEntry(5, None, "user", "line 5"))
+        self.gemini.prompts.clear()
+        summary = self.summarize(case)
+        self.assertEqual(self.gemini.kinds(), ["Summary:", "Updated Summary:"])
+        self.assertIn("user: line 4", self.gemini.prompts[0])
+        self.assertEqual(summary.checkpoint["summarized"], 6)
+
+    def test_entries_appended_during_a_call_are_left_for_the_next_run(self) -> None:
+        case = make_case(3)
+        self.gemini.case = case
+        self.gemini.during_call = [LogEntry(3, None, "user", "line 3")]
+        summary = self.summarize(case)
+        self.assertEqual(summary.checkpoint["summarized"], 3)
+        self.assertNotIn("user: line 3", self.gemini.prompts[-1])
+
+        self.gemini.prompts.clear()
+        summary = self.summarize(case)
+        self.assertTrue(summary.changed)
+        self.assertEqual(self.gemini.kinds(), ["Summary:", "Combined Summary:", "Updated Summary:"])
+        self.assertIn("user: line 3", self.gemini.prompts[0])
+        self.assertEqual(summary.checkpoint["summarized"], 4)
+
+    def test_legacy_summary_is_kept_for_the_logs_before_the_last_chunk(self) -> None:
+        case = make_case(5)
+        case.summary = "old rolling summary"
+        self.summarize(case)
+        self.assertEqual(self.gemini.kinds(), ["Summary:", "Updated Summary:"])
+        self.assertIn("old rolling summary", self.gemini.prompts[-1])
+        self.assertIn("user: line 3", self.gemini.prompts[0])
+        self.assertNotIn("user: line 2", self.gemini.prompts[0])
+
+    def test_failed_call_returns_none_but_keeps_finished_chunks(self) -> None:
+        async def fail_rollup(contents: str) -> str | None:
+            return None if contents.endswith("Updated Summary:") else "chunk"
+
+        summarizer = CaseSummarizer(fail_rollup, "Summarize.", chunk_size=2, fan_in=4, on_checkpoint=lambda case_id, checkpoint: self.checkpoints.append(checkpoint))
+        self.assertIsNone(asyncio.run(summarizer.summarize(make_case(4))))
+        self.assertEqual(self.checkpoints[-1]["chunks"], [[0, "chunk"], [0, "chunk"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
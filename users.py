@@ -0,0 +1,88 @@
+import asyncio
+import time
+import typing as t
+from collections import OrderedDict
+
+import discord
+
+# How long a user fetched over REST is trusted before it is fetched again.
+USER_TTL = 600.0
+USER_CACHE_SIZE = 2048
+
+
+class UserResolver:
+    """Resolves user ids to users with as few REST calls as possible.
+
+    Lookups check the gateway cache first, then a TTL'd LRU of users that had to be fetched.
+    Remaining misses are fetched concurrently, and concurrent lookups of the same id share one
+    request.
+    """
+
+    def __init__(self, client: discord.Client, *, ttl: float = USER_TTL, max_size: int = USER_CACHE_SIZE):
+        self.client = client
+        self.ttl = ttl
+        self.max_size = max_size
+        self._cache: OrderedDict[int, tuple[float, discord.User]] = OrderedDict()
+        self._pending: dict[int, asyncio.Future[discord.User]] = {}
+        self.gateway_hits = 0
+        self.cache_hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"gateway_hits": self.gateway_hits, "cache_hits": self.cache_hits, "misses": self.misses, "cached": len(self._cache)}
+
+    def _cached(self, user_id: int) -> discord.User | None:
+        user = self.client.get_user(user_id)
+        if user is not None:
+            self.gateway_hits += 1
+            return user
+
+        entry = self._cache.get(user_id)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(user_id)
+                self.cache_hits += 1
+                return user
+            del self._cache[user_id]
+        return None
+
+    async def _fetch(self, user_id: int) -> discord.User:
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            return await pending
+
+        self.misses += 1
+        future = self._pending[user_id] = asyncio.get_running_loop().create_future()
+        try:
+            user = await self.client.fetch_user(user_id)
+        except Exception as e:
+            future.set_exception(e)
+            # mark it retrieved so a lookup nobody shared does not log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._pending[user_id]
+
+        future.set_result(user)
+        self._cache[user_id] = (time.monotonic() + self.ttl, user)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return user
+
+    async def resolve(self, user_id: int) -> discord.User:
+        user = self._cached(user_id)
+        if user is not None:
+            return user
+        return await self._fetch(user_id)
+
+    async def resolve_many(self, user_ids: list[int]) -> list[discord.User]:
+        """Resolves all ids, fetching the uncached ones concurrently. Keeps the input order."""
+        resolved = [self._cached(user_id) for user_id in user_ids]
+        missing = [user_id for user_id, user in zip(user_ids, resolved) if user is None]
+        if missing:
+            unique = list(dict.fromkeys(missing))
+            fetched = dict(zip(unique, await asyncio.gather(*(self._fetch(user_id) for user_id in unique))))
+            resolved = [user if user is not None else fetched[user_id] for user_id, user in zip(user_ids, resolved)]
+        return t.cast(list[discord.User], resolved)